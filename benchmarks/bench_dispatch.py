@@ -0,0 +1,59 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Per-call overhead of the ``PassThru`` method checks before and after resolving them in ``__init__``
+
+Both variants call the real ``PassThru.readversion`` and a zero-timeout ``PassThru.poll`` on a
+``SimulatedPassThruLibrary`` device (the ``Rig`` of ``benchmarks.suite``). ``legacy`` puts the per-call
+checks used before back around the class methods: ``api_required`` (``hasattr`` on the DLL) around
+``ver_required`` (parsing both version strings). ``resolved`` calls the methods ``PassThru.__bind`` stored
+on the instance, which only keep ``open_required``.
+
+Run using ``python -m benchmarks.bench_dispatch``
+"""
+
+from benchmarks.suite import Rig, _best
+from j2534.errors import PassThruApiNotSupportedException, PassThruInterfaceException
+from j2534.interface import PassThru
+
+import types
+
+
+def _legacy(passthru: PassThru, name: str):
+    """ Returns the method ``name`` of ``passthru`` with the checks done on every call, as before """
+    func = getattr(PassThru, name)
+    proc = getattr(func, '__j2534_api__', None)
+    version = getattr(func, '__j2534_version__', None)
+    # the library the old ``api_required`` ran ``hasattr`` on
+    dll = passthru._PassThru__dll
+
+    def legacy(self, *args, **kwargs):
+        if proc is not None and not hasattr(dll, proc):
+            raise PassThruApiNotSupportedException(f'{proc} is not supported by {self.dll}')
+        if version is not None:
+            exact = not version.endswith('+')
+            major = int(version.split('.')[0])
+            minor = int(version.split('.')[1] if exact else version.split('.')[1][:-1])
+            usingmajor = int(self.apiversion.split('.')[0])
+            usingminor = int(self.apiversion.split('.')[1])
+            if exact and ((usingmajor != major) or (usingminor != minor)):
+                raise PassThruInterfaceException(f'API call requires version {version}')
+            elif not exact and (usingmajor, usingminor) < (major, minor):
+                raise PassThruInterfaceException(f'API call requires version {version}')
+        return func(self, *args, **kwargs)
+    return types.MethodType(legacy, passthru)
+
+
+def main(number: int = 20000) -> dict:
+    rig = Rig()
+    results = {}
+    for name, args in (('readversion', (rig.rxdev,)), ('poll', (rig.rxch, 1, 0))):
+        for variant, method in (('legacy', _legacy(rig.rx, name)), ('resolved', getattr(rig.rx, name))):
+            results[f'{variant}[{name}]'] = _best(lambda: method(*args), number)
+    rig.close()
+    return results
+
+
+if __name__ == "__main__":
+    for name, ns in main().items():
+        print(f'{name:>21}: {ns:8.1f} ns/call')
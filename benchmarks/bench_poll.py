@@ -0,0 +1,42 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Compare the raising ``PassThru.read`` with the status based ``PassThru.poll``
+
+Both are called on a ``SimulatedPassThruLibrary`` channel (the ``Rig`` of ``benchmarks.suite``), once with
+an empty receive queue, which is what a tight polling loop sees most of the time, and once with a full
+batch waiting.
+
+Run using ``python -m benchmarks.bench_poll``
+"""
+
+from benchmarks.suite import Rig, _best
+from j2534.errors import PassThruInterfaceException
+
+
+def main(number: int = 20000, size: int = 16) -> dict:
+    rig = Rig()
+
+    def raising():
+        try:
+            rig.rx.read(rig.rxch, size, 0)
+        except PassThruInterfaceException:
+            pass
+
+    def polling():
+        rig.rx.poll(rig.rxch, size, 0)
+
+    results = {}
+    for func in (raising, polling):
+        results[f'{func.__name__}[empty]'] = _best(func, number)
+        # every call finds a full batch: queue exactly the frames one timing run reads
+        calls = number // 10
+        rig.fill(size * calls)
+        results[f'{func.__name__}[{size}]'] = _best(func, calls, repeat=1)
+    rig.close()
+    return results
+
+
+if __name__ == "__main__":
+    for name, ns in main().items():
+        print(f'{name:>14}: {ns:8.1f} ns/call')
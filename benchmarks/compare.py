@@ -0,0 +1,50 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Compare two ``benchmarks.suite`` result files
+
+Metrics named ``ns_per_call``/ ``bytes_*`` are better when lower, all others when higher. The exit status
+is 1 if any metric regressed by more than the threshold.
+
+Run using ``python -m benchmarks.compare base.json new.json [--threshold 10]``
+"""
+
+import argparse
+import json
+import sys
+
+
+def lower_is_better(metric: str) -> bool:
+    return metric.startswith(('ns_', 'bytes_'))
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[tuple[str, float, float, float, bool]]:
+    """ Returns ``(name, base, new, change %, regressed)`` for every metric present in both files """
+    rows = []
+    for case, metrics in new['results'].items():
+        for metric, value in metrics.items():
+            old = base['results'].get(case, {}).get(metric)
+            if old is None:
+                continue
+            change = (value - old) / old * 100 if old else 0.0
+            worse = change > threshold if lower_is_better(metric) else change < -threshold
+            rows.append((f'{case}.{metric}', old, value, change, worse))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed regression in percent')
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    rows = compare(base, new, args.threshold)
+    for name, old, value, change, worse in rows:
+        print(f'{"REGRESSION" if worse else "":>10} {name:<45} {old:>14.1f} {value:>14.1f} {change:+7.1f}%')
+    sys.exit(1 if any(row[4] for row in rows) else 0)
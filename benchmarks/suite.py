@@ -0,0 +1,247 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Throughput and latency benchmarks for the ``PassThru`` API surface
+
+All cases run against ``SimulatedPassThruLibrary`` with frame timing disabled, so they measure the host
+side (Python, ``ctypes`` and the library wrapper) rather than the bus. Results are written as JSON and can
+be compared between commits with ``benchmarks.compare``.
+
+Run using ``python -m benchmarks.suite -o results.json [-k read]``
+"""
+
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+from j2534.filter import FlowCtrlFilter, PassFilter, BlockFilter
+from j2534.enums import ProtocolId
+from j2534.softfilter import FilterEngine
+from j2534.connection import Message
+from j2534.structs import PASSTHRU_MSG4
+from j2534.errors import PassThruInterfaceException
+from j2534.capture import CaptureWriter, CaptureReader
+
+import argparse
+import ctypes
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+BATCH_SIZES = (1, 16, 64, 256)
+
+CASES = {}
+
+
+def case(name: str):
+    """ Register a benchmark case; the function returns ``{metric: value}`` """
+    def _case(func):
+        CASES[name] = func
+        return func
+    return _case
+
+
+class Rig(object):
+    """ Two simulated devices on one bus with a connected CAN channel each """
+
+    def __init__(self, **kwargs) -> None:
+        self.bus = SimulatedBus(frame_timing=False, filters=False, rx_depth=1 << 20, tx_depth=1 << 20)
+        self.tx = PassThru(SimulatedPassThruLibrary, bus=self.bus, **kwargs)
+        self.rx = PassThru(SimulatedPassThruLibrary, bus=self.bus, **kwargs)
+        self.txdev = self.tx.open('tx')
+        self.rxdev = self.rx.open('rx')
+        self.txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        self.rxch = self.rx.connect(self.rxdev, Protocol.CAN(500000))
+
+    def fill(self, frames: int) -> None:
+        """ Queue ``frames`` frames in the receive queue """
+        payload = b'\x00\x00\x01\x00' + bytes(8)
+        self.tx.write(self.txch, [payload] * frames)
+
+    def close(self) -> None:
+        self.tx.close(self.txdev)
+        self.rx.close(self.rxdev)
+
+
+def _best(func, number: int, repeat: int = 5) -> float:
+    """ Returns the best time per call in nanoseconds """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e9
+
+
+@case('read')
+def bench_read(frames: int = 20000) -> dict:
+    results = {}
+    rig = Rig()
+    for size in BATCH_SIZES:
+        total = frames if size > 1 else frames // 4
+        rig.fill(total)
+        start = time.perf_counter()
+        for _ in range(total // size):
+            rig.rx.read(rig.rxch, size, 0)
+        results[f'frames_per_s[{size}]'] = total / (time.perf_counter() - start)
+    rig.close()
+    return results
+
+
+@case('write')
+def bench_write(frames: int = 20000) -> dict:
+    results = {}
+    rig = Rig()
+    payloads = [b'\x00\x00\x01\x00' + bytes(8)] * frames
+    for size in BATCH_SIZES:
+        total = frames if size > 1 else frames // 4
+        start = time.perf_counter()
+        for i in range(0, total, size):
+            rig.tx.write(rig.txch, payloads[i:i + size])
+        results[f'frames_per_s[{size}]'] = total / (time.perf_counter() - start)
+        rig.rx.poll(rig.rxch, total)
+    rig.close()
+    return results
+
+
+@case('calls')
+def bench_calls(number: int = 2000) -> dict:
+    rig = Rig()
+    frame = [b'\x00\x00\x01\x00\x01']
+
+    def read_empty():
+        try:
+            rig.rx.read(rig.rxch, 1, 0)
+        except PassThruInterfaceException:
+            pass
+
+    calls = {
+        'readversion': lambda: rig.tx.readversion(rig.txdev),
+        'read_empty_raising': read_empty,
+        'poll_empty': lambda: rig.rx.poll(rig.rxch, 1, 0),
+        'write_1': lambda: rig.tx.write(rig.txch, frame),
+        'connect_disconnect': lambda: rig.tx.disconnect(rig.tx.connect(rig.txdev, Protocol.CAN(500000))),
+    }
+    results = {f'ns_per_call[{name}]': _best(func, number) for name, func in calls.items()}
+    rig.close()
+    return results
+
+
+@case('filter')
+def bench_filter(number: int = 2000) -> dict:
+    fcfilter = FlowCtrlFilter(pattern=0x7e8, mask=0xFFFFFFFF, flow=0x7e0)
+    return {'ns_per_call[FlowCtrlFilter.msg4]': _best(lambda: fcfilter.msg4, number)}
+
+
+@case('message')
+def bench_message(number: int = 20000) -> dict:
+    msg = PASSTHRU_MSG4(ProtocolID=5, DataSize=12, ExtraDataIndex=12)
+    ctypes.memmove(msg.Data, b'\x00\x00\x07\xe8' + bytes(range(8)), 12)
+    return {'ns_per_call[Message.from_ptmsg]': _best(lambda: Message.from_ptmsg(msg), number)}
+
+
+@case('memory')
+def bench_memory(frames: int = 10000, size: int = 64) -> dict:
+    rig = Rig()
+    # warm up the pools so only the steady state is measured
+    rig.fill(size * 2)
+    rig.rx.read(rig.rxch, size, 0)
+    rig.rx.read(rig.rxch, size, 0)
+    rig.fill(frames)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for _ in range(frames // size):
+        rig.rx.read(rig.rxch, size, 0)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(s.size_diff for s in after.compare_to(before, 'filename') if s.size_diff > 0)
+    rig.close()
+    return {
+        # transient allocations show up in the peak, leaks in the retained size
+        'bytes_peak_per_10k_frames': (peak - base) * 10000 // frames,
+        'bytes_retained_per_10k_frames': retained * 10000 // frames,
+    }
+
+
+@case('capture')
+def bench_capture(frames: int = 200000, size: int = 256) -> dict:
+    rig = Rig()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.cap')
+        rig.fill(size)
+        batch = rig.rx.read(rig.rxch, size, 0)
+        start = time.perf_counter()
+        with CaptureWriter(path) as writer:
+            for _ in range(frames // size):
+                writer.write_batch(batch)
+        write = time.perf_counter() - start
+        start = time.perf_counter()
+        with CaptureReader(path) as reader:
+            count = sum(1 for _ in reader)
+        read = time.perf_counter() - start
+    rig.close()
+    return {'frames_per_s[write]': frames / write, 'frames_per_s[scan]': count / read}
+
+
+@case('softfilter')
+def bench_softfilter(frames: int = 100000, size: int = 256, rules: int = 1000) -> dict:
+    rig = Rig()
+    engine = FilterEngine(PassFilter(ProtocolId.CAN, 0x7FF, arbid) for arbid in range(rules))
+    engine.add(BlockFilter(ProtocolId.CAN, 0x7F0, 0x100))
+    rig.tx.write(rig.txch, [(i % 0x800).to_bytes(4, 'big') + bytes(8) for i in range(size)])
+    batch = rig.rx.read(rig.rxch, size, 0)
+    start = time.perf_counter()
+    for _ in range(frames // size):
+        engine.apply(batch)
+    apply = time.perf_counter() - start
+    payloads = [bytes(payload) for payload in batch.payloads]
+    start = time.perf_counter()
+    for _ in range(frames // size):
+        for payload in payloads:
+            engine.matches(payload)
+    matches = time.perf_counter() - start
+    rig.close()
+    return {'frames_per_s[apply]': frames / apply, 'frames_per_s[matches]': frames / matches}
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(selected: list[str] = None) -> dict:
+    """ Run the selected cases (all by default) and return the JSON document """
+    results = {}
+    for name, func in CASES.items():
+        if selected and not any(s in name for s in selected):
+            continue
+        print(f'{name}...', file=sys.stderr)
+        results[name] = func()
+    return {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', help='JSON file to write, stdout if omitted')
+    parser.add_argument('-k', dest='selected', action='append', help='only run cases containing this string')
+    args = parser.parse_args()
+
+    document = run(args.selected)
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
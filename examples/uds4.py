@@ -7,6 +7,8 @@ from j2534.connection import Configuration as ConnCfg
 from j2534.connection import  Message
 from j2534.protocols import Protocol
 from j2534.filter import FlowCtrlFilter
+from j2534.isotp import Iso15765Transport
+from j2534.uds import UdsClient
 from j2534 import VectorPassThruXLLibrary
 
 import logging
@@ -35,10 +37,19 @@ message with additional headers.
         self.pt.read(self.channel, 3, 0)
 
     def setup_conversation(self) -> None:
-        pass
+        """ Enter the extended diagnostic session and keep it alive with TesterPresent
+        """
+        transport = Iso15765Transport(self.pt, self.channel, txid=0x000000F1, rxid=0x000000ED)
+        self.uds = UdsClient(transport, keepalive=2.0, loglevel=logging.DEBUG)
+        self.uds.diagnostic_session_control(0x03)
 
     def send_uds_message(self) -> None:
-        pass
+        """ Read the VIN (DID 0xF190)
+        """
+        self.setup_conversation()
+        vin = self.uds.read_data_by_identifier(0xF190)
+        logging.info(f'VIN: {vin.decode("ascii", "replace")}')
+        self.uds.stop_keepalive()
 
     def __def__(self) -> None:
         self.pt.disconnect(self.channel)
@@ -2,5 +2,26 @@
 # -*- coding: utf-8 -*-
 
 from .errors import PassThruInterfaceException
-from .vector import VectorPassThruXLLibrary
-from .api import V4 as APIV4, V5 as APIV5
\ No newline at end of file
+from .api import V4 as APIV4, V5 as APIV5
+
+import importlib
+
+# vendor libraries are imported on first use, ``import j2534`` stays cheap
+_LAZY = {
+    'VectorPassThruXLLibrary': '.vector',
+    'IntrepidCsPassthruLibrary': '.intrepid',
+    'SimulatedPassThruLibrary': '.simulated',
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,172 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" asyncio front-end for ``PassThru``
+
+Every DLL call of an ``AsyncPassThru`` runs on one dedicated worker thread, so calls into the vendor
+library never overlap (which some DLLs report as ``Err_ConcurrentApiCall``) and the event loop is never
+blocked. Reads poll the receive queue without blocking the worker, so other coroutines sharing the
+device get their calls through while a read waits for data.
+
+Available Classes:
+    AsyncPassThru: awaitable wrapper around a ``PassThru`` instance
+"""
+
+from .interface import PassThru
+from .buffer import MessageBatch, MessagePool, ReadResult
+from .structs import PASSTHRU_MSG4, PASSTHRU_MSG5
+from .errors import PassThruInterfaceException
+from .enums import ErrorCode
+from .protocols import Protocol
+from .filter import Filter
+from . import api
+
+import asyncio
+import concurrent.futures
+import functools
+import time
+
+
+class AsyncPassThru(object):
+    """ Awaitable ``PassThru`` running all DLL calls on a single worker thread per device
+
+    Attributes:
+        passthru: the wrapped ``PassThru`` instance (only call it from the worker)
+    """
+
+    def __init__(self, lib: str, **kwargs) -> None:
+        """ Start the worker and create the ``PassThru`` on it
+
+        Args:
+            self (AsyncPassThru): the ``AsyncPassThru`` instance
+            lib: library passed on to ``PassThru``
+
+        Keyword Args:
+            poll_interval (float): longest pause in seconds between two polls of a waiting read (default
+                0.001, the idle slice of ``ReceivePump``)
+            rxdepth (int): number of receive batches kept per channel by ``poll`` and ``read`` (default 8)
+            any keyword argument of ``PassThru``
+        """
+        self.poll_interval = kwargs.pop('poll_interval', 0.001)
+        self.__worker = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='j2534')
+        self.passthru = self.__worker.submit(PassThru, lib, **kwargs).result()
+        # own ring, the pool of ``PassThru`` is sized for one reader per channel
+        self.__rxpool = MessagePool(PASSTHRU_MSG5 if self.passthru.apiversion == api.V5 else PASSTHRU_MSG4,
+                                    kwargs.get('rxdepth', 8))
+
+    async def __call(self, func, *args, **kwargs):
+        """ Run ``func`` on the worker and wait for its result """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__worker, functools.partial(func, *args, **kwargs))
+
+    async def open(self, name: str) -> int:
+        """ See ``PassThru.open`` """
+        return await self.__call(self.passthru.open, name)
+
+    async def close(self, device_id: int) -> None:
+        """ See ``PassThru.close`` """
+        return await self.__call(self.passthru.close, device_id)
+
+    async def connect(self, device_id: int, protocol: Protocol) -> int:
+        """ See ``PassThru.connect`` """
+        return await self.__call(self.passthru.connect, device_id, protocol)
+
+    async def disconnect(self, channel: int) -> None:
+        """ See ``PassThru.disconnect`` """
+        await self.__call(self.passthru.disconnect, channel)
+        self.__rxpool.release(channel)
+
+    async def set_filter(self, channel: int, filter: Filter) -> int:
+        """ See ``PassThru.set_filter`` """
+        return await self.__call(self.passthru.set_filter, channel, filter)
+
+    async def start_periodic_msg(self, channel: int, data, interval: int, **kwargs) -> int:
+        """ See ``PassThru.start_periodic_msg`` """
+        return await self.__call(self.passthru.start_periodic_msg, channel, data, interval, **kwargs)
+
+    async def stop_periodic_msg(self, channel: int, msg_id: int) -> None:
+        """ See ``PassThru.stop_periodic_msg`` """
+        return await self.__call(self.passthru.stop_periodic_msg, channel, msg_id)
+
+    async def stop_msg_filter(self, channel: int, filter_id: int) -> None:
+        """ See ``PassThru.stop_msg_filter`` """
+        return await self.__call(self.passthru.stop_msg_filter, channel, filter_id)
+
+    async def readversion(self, device_id: int) -> tuple[str, str, str]:
+        """ See ``PassThru.readversion`` """
+        return await self.__call(self.passthru.readversion, device_id)
+
+    async def ioctl(self, *args, **kwargs):
+        """ See ``PassThru.ioctl`` """
+        return await self.__call(self.passthru.ioctl, *args, **kwargs)
+
+    async def get_config(self, channel: int, params, refresh: bool = False) -> dict[int, int]:
+        """ See ``PassThru.get_config`` """
+        return await self.__call(self.passthru.get_config, channel, list(params), refresh)
+
+    async def set_config(self, channel: int, config: dict[int, int], force: bool = False) -> int:
+        """ See ``PassThru.set_config`` """
+        return await self.__call(self.passthru.set_config, channel, dict(config), force)
+
+    async def write(self, channel: int, msgs, timeout: int = 0, **kwargs) -> int:
+        """ See ``PassThru.write``
+
+        ``msgs`` is materialized before it is handed to the worker, generators are not consumed there.
+        """
+        return await self.__call(self.passthru.write, channel, list(msgs), timeout, **kwargs)
+
+    async def poll(self, channel: int, msgs: int, timeout: int = 0) -> ReadResult:
+        """ Wait up to ``timeout`` milliseconds for messages without holding the worker
+
+        The receive queue is polled with a zero timeout; between polls the coroutine sleeps for up to
+        ``poll_interval`` seconds. Batches come from a per-channel ring of ``rxdepth`` arrays: a returned
+        batch stays valid for the next ``rxdepth - 1`` reads on the channel, and at most ``rxdepth`` reads
+        may be in flight on one channel at a time. Copy the messages out to keep them longer.
+
+        Args:
+            self (AsyncPassThru): the ``AsyncPassThru`` instance
+            channel (int): the channel id returned by ``connect``
+            msgs (int): maximum number of messages to read
+            timeout (int): time to wait for the first message in milliseconds
+
+        Returns:
+            the ``ReadResult`` of the last poll; ``Err_Timeout`` if nothing arrived in time, the status of
+            the DLL (usually ``Err_BufferEmpty``) if ``timeout`` is 0
+
+        Raises:
+            PassThruInterfaceException: if the DLL reports a fault
+        """
+        deadline = time.monotonic() + timeout / 1000
+        delay = min(0.001, self.poll_interval)
+        batch = self.__rxpool.batch(channel, msgs)
+        while True:
+            result = await self.__call(self.passthru.poll, channel, msgs, 0, batch)
+            if result.count or timeout <= 0:
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                result.status = ErrorCode.Err_Timeout
+                return result
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.poll_interval)
+
+    async def read(self, channel: int, msgs: int, timeout: int) -> MessageBatch:
+        """ Like ``PassThru.read``: waits up to ``timeout`` milliseconds and raises if nothing arrived
+
+        Raises:
+            PassThruInterfaceException: with ``Err_Timeout`` if no message arrived in time
+        """
+        result = await self.poll(channel, msgs, timeout)
+        if not result.count:
+            raise PassThruInterfaceException(result.status)
+        return result.messages
+
+    def shutdown(self) -> None:
+        """ Stop the worker thread once the pending calls are done """
+        self.__worker.shutdown(wait=True)
+
+    async def __aenter__(self) -> 'AsyncPassThru':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
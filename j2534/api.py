@@ -235,5 +235,22 @@ def get_defs_for_version(version: str) -> list:
         case _:
             raise ValueError(f'API version {version} is not supported')
 
+def version_satisfies(using: str, required: str) -> bool:
+    """ Check whether the API version ``using`` satisfies the requirement ``required``
+
+    Args:
+        using (str): the API version in use, e.g. ``'04.04'``
+        required (str): ``major.minor`` for an exact version, ``major.minor+`` for a minimum version
+
+    Returns:
+        ``True`` if the requirement is met
+    """
+    exact = not required.endswith('+')
+    major, minor = (int(x) for x in required.rstrip('+').split('.'))
+    usingmajor, usingminor = (int(x) for x in using.split('.'))
+    if exact:
+        return (usingmajor, usingminor) == (major, minor)
+    return (usingmajor, usingminor) >= (major, minor)
+
 if __name__ == "__main__":
     pass
\ No newline at end of file
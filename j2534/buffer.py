@@ -0,0 +1,387 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Reusable message buffers for the ``PassThruReadMsgs``/ ``PassThruWriteMsgs`` hot paths
+
+Every ``PASSTHRU_MSG4`` carries a 4128 byte ``Data`` field, so allocating a fresh array for every call
+quickly dominates the cost of a busy receive loop. The classes here keep preallocated arrays around and
+hand out views into them instead of copies.
+
+Available Functions:
+    msg_array_type: cached ``PASSTHRU_MSG * n`` array types
+    pack_msg4: fill a pooled ``PASSTHRU_MSG4`` array from payloads or ``Message`` objects
+
+Available Classes:
+    MessagePool: per-channel ring of preallocated message arrays
+    MessageBatch: zero-copy view over the filled slots of a message array
+    ReadResult: status and messages of a non-raising ``PassThru.poll``
+"""
+
+from .structs import PASSTHRU_MSG4, PASSTHRU_MSG5, PASSTHRU_HDR
+from .enums import ErrorCode
+from .connection import Message
+
+import ctypes
+import functools
+
+# largest payload a single J2534 message may carry
+MAX_DATA_SIZE = 4128
+
+# return codes of ``PassThruReadMsgs`` that are a normal outcome of polling rather than a fault
+READ_STATUS_OK = frozenset((
+    ErrorCode.Status_NoError,
+    ErrorCode.Err_BufferEmpty,
+    ErrorCode.Err_Timeout,
+    ErrorCode.Err_BufferOverflow,
+))
+
+
+@functools.lru_cache(maxsize=None)
+def msg_array_type(struct: type, count: int) -> type:
+    """ Returns the ctypes array type ``struct * count``, creating it only once
+
+    Args:
+        struct (type): ``PASSTHRU_MSG4`` or ``PASSTHRU_MSG5``
+        count (int): number of elements in the array
+
+    Returns:
+        the cached array type
+    """
+    return struct * count
+
+
+def _capacity(count: int) -> int:
+    """ Round ``count`` up to a power of two so only a handful of array types are ever created """
+    return 1 << max(count - 1, 0).bit_length()
+
+
+def pack_msg4(slot: '_Slot', msgs, limit: int, protocol: int, txflags: int = 0) -> int:
+    """ Fill ``slot`` with up to ``limit`` messages taken from the iterator ``msgs``
+
+    Args:
+        slot (_Slot): pooled ``PASSTHRU_MSG4`` slot to fill
+        msgs: iterator of bytes-like payloads or ``connection.Message`` objects
+        limit (int): maximum number of messages to take
+        protocol (int): ``ProtocolID`` for raw payloads
+        txflags (int): ``TxFlags`` for raw payloads
+
+    Returns:
+        the number of messages packed
+
+    Raises:
+        ValueError: if a payload is larger than ``MAX_DATA_SIZE``
+    """
+    array = slot.array
+    view = slot.view
+    stride = ctypes.sizeof(PASSTHRU_MSG4)
+    offset = PASSTHRU_MSG4.Data.offset
+    count = 0
+    for item in msgs:
+        msg = array[count]
+        if isinstance(item, Message):
+            msg.ProtocolID = item.protocol
+            msg.TxFlags = item.flags
+            item = item.data
+        else:
+            msg.ProtocolID = protocol
+            msg.TxFlags = txflags
+        size = len(item)
+        if size > MAX_DATA_SIZE:
+            raise ValueError(f'Message of {size} bytes exceeds {MAX_DATA_SIZE} bytes')
+        start = count * stride + offset
+        view[start:start + size] = item
+        msg.DataSize = size
+        msg.ExtraDataIndex = size
+        count += 1
+        if count == limit:
+            break
+    return count
+
+
+class _Slot(object):
+    """ One preallocated message array (and for API v05.00 its data arena) """
+
+    __slots__ = ('array', 'arena', 'capacity', 'view')
+
+    def __init__(self, struct: type, capacity: int) -> None:
+        self.capacity = capacity
+        self.array = msg_array_type(struct, capacity)()
+        self.arena = None
+        self.view = memoryview(self.array).cast('B')
+        if struct is PASSTHRU_MSG5:
+            # API v05.00 messages point to caller-owned data buffers
+            self.arena = (ctypes.c_uint8 * (MAX_DATA_SIZE * capacity))()
+            base = ctypes.addressof(self.arena)
+            for i, msg in enumerate(self.array):
+                msg.DataBuffer = ctypes.cast(base + i * MAX_DATA_SIZE, ctypes.POINTER(ctypes.c_char))
+                msg.DataBufferSize = MAX_DATA_SIZE
+            self.view = memoryview(self.arena)
+
+
+class MessageBatch(object):
+    """ Lightweight view over the first ``count`` messages of a pooled array
+
+    Nothing is copied: headers and payloads are views into the array the DLL wrote to. A batch stays
+    valid until its pool slot comes around again, i.e. for ``depth - 1`` further reads on the same channel.
+    Copy anything that has to live longer (``bytes(batch.payload(i))``).
+
+    Attributes:
+        array: the underlying ``PASSTHRU_MSG`` array
+        count: number of valid messages in the batch
+        timeline: the device ``Timeline`` of the channel read, if any
+        anchor: 64 bit device time of the last message, set together with ``timeline``
+    """
+
+    __slots__ = ('array', 'count', 'timeline', 'anchor', '_view', '_stride', '_offset', '_arena')
+
+    def __init__(self, array: ctypes.Array, count: int, arena: ctypes.Array = None, view: memoryview = None) -> None:
+        self.array = array
+        self.count = count
+        self.timeline = None
+        self.anchor = None
+        self._arena = arena
+        self._stride = ctypes.sizeof(array._type_)
+        if arena is None:
+            self._view = memoryview(array).cast('B') if view is None else view
+            self._offset = PASSTHRU_MSG4.Data.offset
+        else:
+            self._view = memoryview(arena) if view is None else view
+            self._offset = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def __getitem__(self, index: int) -> PASSTHRU_MSG4 | PASSTHRU_MSG5:
+        """ Returns the ``PASSTHRU_MSG`` structure at ``index`` (shares memory with the pool) """
+        if not -self.count <= index < self.count:
+            raise IndexError(f'{index} out of range for batch of {self.count}')
+        return self.array[index % self.count]
+
+    def __iter__(self):
+        """ Iterate over ``(header, payload)`` pairs of the batch """
+        for i in range(self.count):
+            yield self.header(i), self.payload(i)
+
+    def header(self, index: int) -> PASSTHRU_HDR | PASSTHRU_MSG5:
+        """ Returns the message header at ``index`` without the data field
+
+        Args:
+            self (MessageBatch): the ``MessageBatch`` instance
+            index (int): message index in the batch
+
+        Returns:
+            a ``PASSTHRU_HDR`` view for v04.04 messages, the ``PASSTHRU_MSG5`` itself for v05.00
+        """
+        if self._arena is not None:
+            return self.array[index]
+        return PASSTHRU_HDR.from_buffer(self.array, index * self._stride)
+
+    def payload(self, index: int) -> memoryview:
+        """ Returns the message data at ``index`` trimmed to its ``DataSize``
+
+        Args:
+            self (MessageBatch): the ``MessageBatch`` instance
+            index (int): message index in the batch
+
+        Returns:
+            a ``memoryview`` into the pooled buffer
+        """
+        msg = self.array[index]
+        if self._arena is not None:
+            start = index * MAX_DATA_SIZE
+            return self._view[start:start + msg.DataLength]
+        start = index * self._stride + self._offset
+        return self._view[start:start + msg.DataSize]
+
+    def arbid(self, index: int) -> int:
+        """ Returns the CAN identifier (first four data bytes, big endian) of the message at ``index``
+
+        Args:
+            self (MessageBatch): the ``MessageBatch`` instance
+            index (int): message index in the batch
+
+        Returns:
+            the arbitration id
+        """
+        start = index * MAX_DATA_SIZE if self._arena is not None else index * self._stride + self._offset
+        return int.from_bytes(self._view[start:start + 4], 'big')
+
+    def arbids(self) -> list[int]:
+        """ Returns the CAN identifiers of all messages (see ``arbid``) in one pass
+
+        The four identifier bytes are gathered with strided slices over the whole array instead of
+        slicing every message, which is several times faster for large batches. Messages shorter than four
+        bytes yield meaningless identifiers; check ``sizes``.
+        """
+        count = self.count
+        if not count:
+            return []
+        stride = MAX_DATA_SIZE if self._arena is not None else self._stride
+        start = 0 if self._arena is not None else self._offset
+        end = start + (count - 1) * stride + 1
+        view = self._view
+        b0, b1, b2, b3 = (view[start + k:end + k:stride] for k in range(4))
+        return [a << 24 | b << 16 | c << 8 | d for a, b, c, d in zip(b0, b1, b2, b3)]
+
+    def sizes(self) -> list[int]:
+        """ Returns the data sizes of all messages """
+        if self._arena is not None:
+            return [msg.DataLength for msg in self.array[:self.count]]
+        # DataSize is the fifth ``unsigned long`` of every message
+        words = self._view.cast('L')
+        stride = self._stride // words.itemsize
+        return words[4:4 + self.count * stride:stride].tolist()
+
+    def device_time(self, index: int) -> int:
+        """ Returns the unwrapped 64 bit device time in microseconds of the message at ``index``
+
+        Args:
+            self (MessageBatch): the ``MessageBatch`` instance
+            index (int): message index in the batch
+
+        Returns:
+            the device time, the raw 32 bit ``Timestamp`` if the batch has no timeline
+        """
+        timestamp = self.array[index].Timestamp
+        if self.anchor is None:
+            return timestamp
+        return self.timeline.relative(timestamp, self.anchor)
+
+    def host_time(self, index: int) -> int | None:
+        """ Returns the estimated ``time.monotonic_ns`` at which the message at ``index`` was received
+
+        Args:
+            self (MessageBatch): the ``MessageBatch`` instance
+            index (int): message index in the batch
+
+        Returns:
+            the host time in nanoseconds, ``None`` if the batch has no timeline
+        """
+        if self.anchor is None:
+            return None
+        return self.timeline.host_ns(self.device_time(index))
+
+    @property
+    def headers(self):
+        """ Generator over all headers of the batch """
+        return (self.header(i) for i in range(self.count))
+
+    @property
+    def payloads(self):
+        """ Generator over all payloads of the batch """
+        return (self.payload(i) for i in range(self.count))
+
+
+class MessagePool(object):
+    """ Per-channel ring of preallocated ``PASSTHRU_MSG`` arrays
+
+    Each channel owns ``depth`` arrays which are handed out round-robin, so the batch returned by a read
+    is not overwritten by the next ``depth - 1`` reads on the same channel. Arrays only grow (in powers of
+    two) when a caller asks for more messages than they hold.
+    """
+
+    def __init__(self, struct: type = PASSTHRU_MSG4, depth: int = 2) -> None:
+        """ Create an empty pool
+
+        Args:
+            self (MessagePool): the ``MessagePool`` instance
+            struct (type): ``PASSTHRU_MSG4`` or ``PASSTHRU_MSG5``
+            depth (int): number of arrays kept per channel
+        """
+        if depth < 1:
+            raise ValueError(f'Pool depth must be at least 1 (got {depth})')
+        self.struct = struct
+        self.depth = depth
+        self.__rings = {}
+
+    def acquire(self, channel: int, count: int) -> _Slot:
+        """ Returns the next slot of ``channel`` able to hold at least ``count`` messages
+
+        Args:
+            self (MessagePool): the ``MessagePool`` instance
+            channel (int): the channel id owning the ring
+            count (int): number of messages the caller needs
+
+        Returns:
+            the pooled slot
+        """
+        ring = self.__rings.get(channel)
+        if ring is None:
+            ring = self.__rings[channel] = [0, [None] * self.depth]
+        index = ring[0]
+        ring[0] = (index + 1) % self.depth
+        slot = ring[1][index]
+        if slot is None or slot.capacity < count:
+            slot = ring[1][index] = _Slot(self.struct, _capacity(count))
+        return slot
+
+    def batch(self, channel: int, count: int) -> MessageBatch:
+        """ Acquire a slot and wrap it in an empty ``MessageBatch`` for the DLL to fill
+
+        Args:
+            self (MessagePool): the ``MessagePool`` instance
+            channel (int): the channel id owning the ring
+            count (int): number of messages to read
+
+        Returns:
+            a ``MessageBatch`` with ``count`` set to 0
+        """
+        slot = self.acquire(channel, count)
+        return MessageBatch(slot.array, 0, slot.arena, slot.view)
+
+    def release(self, channel: int) -> None:
+        """ Free all arrays held for ``channel`` (e.g. after ``PassThruDisconnect``)
+
+        Args:
+            self (MessagePool): the ``MessagePool`` instance
+            channel (int): the channel id owning the ring
+        """
+        self.__rings.pop(channel, None)
+
+    def clear(self) -> None:
+        """ Free all arrays held by the pool """
+        self.__rings.clear()
+
+
+class ReadResult(object):
+    """ Outcome of a ``PassThruReadMsgs`` call that did not fault
+
+    Attributes:
+        status: the return code from the DLL (one of ``READ_STATUS_OK``)
+        count: number of messages read, also valid with ``Err_Timeout``/ ``Err_BufferOverflow``
+        messages: the ``MessageBatch`` holding the messages read
+    """
+
+    __slots__ = ('status', 'count', 'messages')
+
+    def __init__(self, status: int, messages: MessageBatch) -> None:
+        self.status = status
+        self.count = messages.count
+        self.messages = messages
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}(status=0x{self.status:02x}, count={self.count})'
+
+    @property
+    def empty(self) -> bool:
+        """ ``True`` if the receive queue had nothing to offer """
+        return self.status == ErrorCode.Err_BufferEmpty
+
+    @property
+    def timedout(self) -> bool:
+        """ ``True`` if the read timed out before all requested messages arrived """
+        return self.status == ErrorCode.Err_Timeout
+
+    @property
+    def overflow(self) -> bool:
+        """ ``True`` if the device reported lost messages """
+        return self.status == ErrorCode.Err_BufferOverflow
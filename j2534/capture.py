@@ -0,0 +1,361 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Append-only binary capture files
+
+A capture stores every message as a fixed ``CAPTURE_HDR`` (the ``PASSTHRU_HDR`` fields with fixed 32 bit
+little endian widths plus 64 bit capture and host times) followed by its ``DataSize`` data bytes, padded
+to 8 bytes, instead of the full 4128 byte ``Data`` field::
+
+    file header   magic ``J2534CAP``, version, record header size, index interval (32 bytes)
+    record        CAPTURE_HDR (40 bytes), data, padding to a multiple of 8 bytes
+    ...
+
+The capture time is the device ``Timestamp`` unwrapped to 64 bits (microseconds), taken from the
+batch's device ``Timeline`` when there is one; the host time is the ``Timeline`` estimate of
+``time.monotonic_ns`` (0 if unknown), which lines up captures of several devices. Every ``index_interval``
+microseconds of capture time the writer appends ``(time, offset)`` to the sidecar index ``<path>.idx``, so
+the reader finds any point in time with a binary search and a short scan. A missing index is rebuilt in
+memory by skipping from header to header.
+
+Writes are collected in a large buffer and issued in chunks; the reader maps the file and hands out
+headers and payloads as views into the mapping.
+
+Available Classes:
+    CAPTURE_HDR: on-disk record header
+    CaptureWriter: buffered capture writer
+    CaptureReader: memory-mapped capture reader
+"""
+
+from .buffer import MessageBatch
+from .timeline import Timeline
+
+import array
+import bisect
+import ctypes
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'J2534CAP'
+VERSION = 2
+
+# magic, version, record header size, index interval in microseconds, reserved
+_FILE_HDR = struct.Struct('<8sIIQQ')
+# Time, HostTime, ProtocolID, RxStatus, TxFlags, Timestamp, DataSize, ExtraDataIndex
+_RECORD = struct.Struct('<QQ6I')
+# Time and DataSize only, for skipping through the records
+_SKIP = struct.Struct('<Q24xI4x')
+# the leading fields of a PASSTHRU_MSG4 in native layout
+_NATIVE_HDR = struct.Struct('@6L')
+_INDEX_ENTRY = struct.Struct('<QQ')
+_PADDING = bytes(8)
+
+
+class CAPTURE_HDR(ctypes.LittleEndianStructure):
+    _fields_ = [
+        ('Time', ctypes.c_uint64),
+        ('HostTime', ctypes.c_uint64),
+        ('ProtocolID', ctypes.c_uint32),
+        ('RxStatus', ctypes.c_uint32),
+        ('TxFlags', ctypes.c_uint32),
+        ('Timestamp', ctypes.c_uint32),
+        ('DataSize', ctypes.c_uint32),
+        ('ExtraDataIndex', ctypes.c_uint32),
+    ]
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def __str__(self) -> str:
+        return f'{self.Time}:{self.HostTime}:{self.ProtocolID}:{self.RxStatus}:{self.TxFlags}:{self.Timestamp}:{self.DataSize}:{self.ExtraDataIndex}'
+
+
+RECORD_SIZE = ctypes.sizeof(CAPTURE_HDR)
+
+
+def _aligned(size: int) -> int:
+    return (size + 7) & ~7
+
+
+class CaptureWriter(object):
+    """ Buffered writer of a capture file (not thread safe)
+
+    Attributes:
+        frames: number of frames written
+        index_interval: capture time in microseconds between index entries
+    """
+
+    def __init__(self, path: str, **kwargs) -> None:
+        """ Create (or truncate) the capture file ``path`` and its index
+
+        Args:
+            self (CaptureWriter): the ``CaptureWriter`` instance
+            path (str): the capture file
+
+        Keyword Args:
+            chunk (int): write buffer size in bytes (default 4 MiB)
+            index_interval (int): microseconds of capture time between index entries (default 1 s)
+        """
+        self.path = path
+        self.index_interval = kwargs.get('index_interval', 1000000)
+        self.frames = 0
+        self.__chunk = max(kwargs.get('chunk', 4 << 20), 1 << 16)
+        self.__buffer = bytearray(self.__chunk)
+        self.__pos = 0
+        self.__index = bytearray()
+        self.__file = open(path, 'wb', buffering=0)
+        self.__idx = open(path + '.idx', 'wb', buffering=0)
+        self.__file.write(_FILE_HDR.pack(MAGIC, VERSION, RECORD_SIZE, self.index_interval, 0))
+        self.__offset = _FILE_HDR.size
+        self.__next_index = None
+        # unwraps timestamps of messages written without a device timeline
+        self.__timeline = Timeline()
+
+    def __enter__(self) -> 'CaptureWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __record(self, time: int, host_time: int, fields: tuple, payload) -> None:
+        """ Append one record to the write buffer """
+        size = len(payload)
+        length = RECORD_SIZE + _aligned(size)
+        if self.__pos + length > self.__chunk:
+            self.flush()
+            if length > self.__chunk:
+                self.__buffer = bytearray(length)
+                self.__chunk = length
+        if self.__next_index is None or time >= self.__next_index:
+            self.__index += _INDEX_ENTRY.pack(time, self.__offset + self.__pos)
+            self.__next_index = time + self.index_interval
+        buffer = self.__buffer
+        pos = self.__pos
+        _RECORD.pack_into(buffer, pos, time, host_time, fields[0], fields[1], fields[2], fields[3], size, fields[5])
+        pos += RECORD_SIZE
+        buffer[pos:pos + size] = payload
+        pos += size
+        end = pos + (-size & 7)
+        buffer[pos:end] = _PADDING[:end - pos]
+        self.__pos = end
+        self.frames += 1
+
+    def write(self, header, payload, time: int = None, host_time: int = None) -> None:
+        """ Append one message
+
+        Args:
+            self (CaptureWriter): the ``CaptureWriter`` instance
+            header: ``PASSTHRU_HDR``, ``PASSTHRU_MSG4``/ ``PASSTHRU_MSG5`` or ``CAPTURE_HDR`` of the message
+            payload: the message data (bytes-like)
+            time (int): capture time in microseconds, defaults to the unwrapped ``header.Timestamp``
+            host_time (int): estimated ``time.monotonic_ns`` of the message, 0 if unknown
+        """
+        if time is None:
+            time = self.__timeline.unwrap(header.Timestamp)
+        fields = (header.ProtocolID, header.RxStatus, header.TxFlags, header.Timestamp, 0, header.ExtraDataIndex)
+        self.__record(time, host_time or 0, fields, payload)
+
+    def write_batch(self, batch: MessageBatch, indices=None) -> None:
+        """ Append the messages of a batch (all or those at ``indices``)
+
+        The signature matches ``ReceivePump.subscribe`` callbacks.
+
+        Args:
+            self (CaptureWriter): the ``CaptureWriter`` instance
+            batch (MessageBatch): the received messages
+            indices: positions in ``batch`` to write, all by default
+        """
+        if indices is None:
+            indices = range(batch.count)
+        timeline = batch.timeline if batch.anchor is not None else None
+        if batch._arena is not None:
+            for i in indices:
+                if timeline is None:
+                    self.write(batch.header(i), batch.payload(i))
+                else:
+                    time = batch.device_time(i)
+                    self.write(batch.header(i), batch.payload(i), time, timeline.host_ns(time))
+            return
+        # v04.04 arrays: read the native header fields in one go instead of attribute by attribute
+        view = batch._view
+        stride = batch._stride
+        offset = batch._offset
+        unpack = _NATIVE_HDR.unpack_from
+        record = self.__record
+        if timeline is None:
+            unwrap = self.__timeline.unwrap
+            for i in indices:
+                start = i * stride
+                fields = unpack(view, start)
+                start += offset
+                record(unwrap(fields[3]), 0, fields, view[start:start + fields[4]])
+            return
+        anchor = batch.anchor
+        relative = timeline.relative
+        host_ns = timeline.host_ns
+        for i in indices:
+            start = i * stride
+            fields = unpack(view, start)
+            start += offset
+            time = relative(fields[3], anchor)
+            record(time, host_ns(time), fields, view[start:start + fields[4]])
+
+    def flush(self) -> None:
+        """ Write the buffered records and index entries to disk """
+        if self.__pos:
+            self.__file.write(memoryview(self.__buffer)[:self.__pos])
+            self.__offset += self.__pos
+            self.__pos = 0
+        # the index only ever points at records already on disk
+        if self.__index:
+            self.__idx.write(self.__index)
+            self.__index.clear()
+
+    def close(self) -> None:
+        """ Flush and close the files """
+        if self.__file.closed:
+            return
+        self.flush()
+        self.__file.close()
+        self.__idx.close()
+
+
+class CaptureReader(object):
+    """ Memory-mapped reader of a capture file
+
+    Headers and payloads are views into the mapping: they are only valid until ``close``. Frames are
+    expected in capture time order for ``find``/ ``frames(start=...)`` to be exact.
+
+    Attributes:
+        index_interval: capture time in microseconds between index entries
+        size: file size in bytes
+    """
+
+    def __init__(self, path: str) -> None:
+        """ Map the capture file ``path`` and load (or rebuild) its index
+
+        Args:
+            self (CaptureReader): the ``CaptureReader`` instance
+            path (str): the capture file
+
+        Raises:
+            ValueError: if the file is not a capture file
+        """
+        self.path = path
+        self.__file = open(path, 'rb')
+        self.size = os.fstat(self.__file.fileno()).st_size
+        if self.size < _FILE_HDR.size:
+            self.__file.close()
+            raise ValueError(f'{path} is not a capture file')
+        # a private copy-on-write mapping is writable, which ``ctypes.from_buffer`` insists on
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_COPY)
+        self.__view = memoryview(self.__map)
+        magic, version, record_size, self.index_interval, _ = _FILE_HDR.unpack_from(self.__view)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self.close()
+            raise ValueError(f'{path} is not a version {VERSION} capture file')
+        self.__times, self.__offsets = self.__load_index(path + '.idx')
+
+    def __enter__(self) -> 'CaptureReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ Unmap the file; the mapping stays alive while headers or payloads are still referenced """
+        try:
+            self.__view.release()
+            self.__map.close()
+        except BufferError:
+            pass
+        self.__file.close()
+
+    def __load_index(self, path: str) -> tuple[array.array, array.array]:
+        """ Returns the index times and offsets, read from ``path`` or rebuilt from the records """
+        entries = array.array('Q')
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            entries.frombytes(data[:len(data) - len(data) % _INDEX_ENTRY.size])
+            if sys.byteorder == 'big':
+                entries.byteswap()
+        except FileNotFoundError:
+            times, offsets = array.array('Q'), array.array('Q')
+            next_index = None
+            for time, offset in self.__records(_FILE_HDR.size):
+                if next_index is None or time >= next_index:
+                    times.append(time)
+                    offsets.append(offset)
+                    next_index = time + self.index_interval
+            return times, offsets
+        times, offsets = entries[0::2], entries[1::2]
+        # entries of a writer that died before flushing its records
+        while offsets and offsets[-1] + RECORD_SIZE > self.size:
+            times.pop()
+            offsets.pop()
+        return times, offsets
+
+    def __records(self, pos: int):
+        """ Generator of ``(time, offset)`` of the complete records from ``pos`` on """
+        view = self.__view
+        end = self.size
+        skip = _SKIP.unpack_from
+        while pos + RECORD_SIZE <= end:
+            time, size = skip(view, pos)
+            if pos + RECORD_SIZE + size > end:
+                return
+            yield time, pos
+            pos += RECORD_SIZE + _aligned(size)
+
+    @property
+    def start_time(self) -> int | None:
+        """ Capture time of the first frame, ``None`` for an empty capture """
+        for time, _ in self.__records(_FILE_HDR.size):
+            return time
+        return None
+
+    def find(self, time: int) -> int:
+        """ Returns the file offset of the first frame at or after capture time ``time``
+
+        Args:
+            self (CaptureReader): the ``CaptureReader`` instance
+            time (int): capture time in microseconds
+
+        Returns:
+            the offset, ``size`` if every frame is older
+        """
+        i = bisect.bisect_right(self.__times, time) - 1
+        pos = self.__offsets[i] if i >= 0 else _FILE_HDR.size
+        for record_time, offset in self.__records(pos):
+            if record_time >= time:
+                return offset
+        return self.size
+
+    def frames(self, start: int = None, stop: int = None):
+        """ Generator of ``(header, payload)`` views of the frames in ``[start, stop)``
+
+        Args:
+            self (CaptureReader): the ``CaptureReader`` instance
+            start (int): capture time in microseconds of the first frame, the beginning by default
+            stop (int): capture time in microseconds to stop at, the end by default
+        """
+        view = self.__view
+        end = self.size
+        from_buffer = CAPTURE_HDR.from_buffer
+        pos = _FILE_HDR.size if start is None else self.find(start)
+        while pos + RECORD_SIZE <= end:
+            header = from_buffer(view, pos)
+            size = header.DataSize
+            data = pos + RECORD_SIZE
+            if data + size > end:
+                return
+            if stop is not None and header.Time >= stop:
+                return
+            yield header, view[data:data + size]
+            pos = data + _aligned(size)
+
+    def __iter__(self):
+        return self.frames()
@@ -0,0 +1,323 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Call serialization for PassThru libraries
+
+Most J2534 DLLs are not reentrant and either corrupt their state or fail with ``Err_ConcurrentApiCall``
+when two threads call into them at once. A ``CallGate`` serializes the calls of one device; libraries that
+declare ``CONCURRENT_CHANNELS = True`` only serialize calls per channel, so threads working on different
+channels do not wait for each other. Device-wide calls (``PassThruClose``, ``PassThruConnect``, device
+ioctls, ...) still exclude every channel call: they hold the device lock and all channel locks.
+
+Available Classes:
+    CallGate: per-device set of locks with wait-time metrics
+    GuardedLibrary: ``ctypes.CDLL`` proxy routing every exported function through a ``CallGate``
+    LockStats: wait-time metrics of one lock
+"""
+
+from .enums import ErrorCode
+from .errors import PassThruApiConcurrentCallException
+
+import contextlib
+import dataclasses
+import threading
+import time
+
+# procedures whose first argument is a channel id; everything else is serialized per device
+CHANNEL_PROCS = frozenset((
+    'PassThruDisconnect',
+    'PassThruLogicalConnect',
+    'PassThruLogicalDisconnect',
+    'PassThruReadMsgs',
+    'PassThruWriteMsgs',
+    'PassThruQueueMsgs',
+    'PassThruStartPeriodicMsg',
+    'PassThruStopPeriodicMsg',
+    'PassThruStartMsgFilter',
+    'PassThruStopMsgFilter',
+))
+
+# procedures taking a channel or a device id (``READ_PROG_VOLTAGE``), serialized per channel for known channels
+CHANNEL_OR_DEVICE_PROCS = frozenset((
+    'PassThruIoctl',
+))
+
+
+@dataclasses.dataclass
+class LockStats:
+    """ Wait-time metrics of one ``CallGate`` lock
+
+    Fields:
+        acquired: number of acquisitions
+        contended: acquisitions that had to wait
+        wait_ns: total time spent waiting in nanoseconds
+        max_wait_ns: longest single wait in nanoseconds
+        timeouts: acquisitions abandoned after ``CallGate.timeout``
+    """
+    acquired: int = 0
+    contended: int = 0
+    wait_ns: int = 0
+    max_wait_ns: int = 0
+    timeouts: int = 0
+
+
+class _MeteredLock(object):
+    """ Reentrant lock recording how long callers waited for it """
+
+    __slots__ = ('lock', 'stats', 'timeout', 'name', 'channel', 'observer')
+
+    def __init__(self, name: str, timeout: float, channel: int = -1, observer=None) -> None:
+        self.name = name
+        self.lock = threading.RLock()
+        self.stats = LockStats()
+        self.timeout = timeout
+        self.channel = channel
+        self.observer = observer
+
+    def acquire(self, what: str) -> None:
+        """ Acquire the lock for the call ``what``
+
+        Raises:
+            PassThruApiConcurrentCallException: if the lock is not free within the gate timeout
+        """
+        stats = self.stats
+        if not self.lock.acquire(False):
+            start = time.perf_counter_ns()
+            acquired = self.lock.acquire(timeout=self.timeout)
+            waited = time.perf_counter_ns() - start
+            stats.wait_ns += waited
+            stats.contended += 1
+            if waited > stats.max_wait_ns:
+                stats.max_wait_ns = waited
+            if self.observer is not None:
+                self.observer.lock_wait(what, self.channel, start, start + waited, acquired)
+            if not acquired:
+                stats.timeouts += 1
+                raise PassThruApiConcurrentCallException(
+                    f'{what}: {self.name} is busy (waited {waited / 1e6:.1f} ms)')
+        stats.acquired += 1
+
+    def release(self) -> None:
+        self.lock.release()
+
+    def __enter__(self) -> '_MeteredLock':
+        self.acquire('caller')
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.lock.release()
+
+
+class CallGate(object):
+    """ Locks serializing the calls into one PassThru device
+
+    Attributes:
+        concurrent_channels: ``True`` if calls on different channels may overlap
+        timeout: seconds to wait for a lock before raising, negative waits forever
+        observer: object told about every contended acquisition as
+            ``observer.lock_wait(what, channel, start_ns, end_ns, acquired)`` (channel -1 for the device lock)
+    """
+
+    def __init__(self, concurrent_channels: bool = False, timeout: float = -1, observer=None) -> None:
+        self.concurrent_channels = concurrent_channels
+        self.timeout = timeout
+        self.observer = observer
+        self.__device = _MeteredLock('device', timeout, observer=observer)
+        self.__channels = {}
+        # channel ids handed out by ``PassThruConnect``, told apart from device ids in ``PassThruIoctl``
+        self.__known = set()
+        self.__lock = threading.Lock()
+
+    def device(self) -> _MeteredLock:
+        """ Returns the lock serializing device-wide calls """
+        return self.__device
+
+    def channel(self, channel: int) -> _MeteredLock:
+        """ Returns the lock serializing calls on ``channel`` (the device lock unless channels are concurrent)
+
+        Args:
+            self (CallGate): the ``CallGate`` instance
+            channel (int): the channel id
+        """
+        if not self.concurrent_channels:
+            return self.__device
+        lock = self.__channels.get(channel)
+        if lock is None:
+            lock = self.__create(channel)
+        return lock
+
+    def __create(self, channel: int) -> _MeteredLock:
+        """ Create the lock of ``channel`` once no device-wide call is in flight
+
+        A device-wide call only holds the channel locks that existed when it started, a new one must not
+        let a channel call in next to it.
+
+        Raises:
+            PassThruApiConcurrentCallException: if the device lock is not free within the gate timeout
+        """
+        if not self.__device.lock.acquire(timeout=self.timeout):
+            self.__device.stats.timeouts += 1
+            raise PassThruApiConcurrentCallException(f'channel {channel}: device is busy')
+        try:
+            with self.__lock:
+                return self.__channels.setdefault(channel, _MeteredLock(f'channel {channel}', self.timeout,
+                                                                            channel, self.observer))
+        finally:
+            self.__device.lock.release()
+
+    def acquire_device(self, what: str) -> list[_MeteredLock]:
+        """ Acquire the device lock and, with concurrent channels, every channel lock for ``what``
+
+        Channel locks are taken in channel id order after the device lock, so two device-wide calls cannot
+        deadlock on them.
+
+        Args:
+            self (CallGate): the ``CallGate`` instance
+            what (str): name of the call, reported with contended waits
+
+        Returns:
+            the acquired locks, to be passed to ``release_device``
+
+        Raises:
+            PassThruApiConcurrentCallException: if a lock cannot be acquired in time
+        """
+        self.__device.acquire(what)
+        held = [self.__device]
+        if self.concurrent_channels:
+            with self.__lock:
+                locks = [self.__channels[channel] for channel in sorted(self.__channels)]
+            try:
+                for lock in locks:
+                    lock.acquire(what)
+                    held.append(lock)
+            except BaseException:
+                self.release_device(held)
+                raise
+        return held
+
+    @staticmethod
+    def release_device(held: list[_MeteredLock]) -> None:
+        """ Release the locks returned by ``acquire_device`` """
+        for lock in reversed(held):
+            lock.release()
+
+    def add_channel(self, channel: int) -> None:
+        """ Register a connected channel, its ioctls are serialized on the channel lock """
+        self.__known.add(channel)
+        self.channel(channel)
+
+    def remove_channel(self, channel: int) -> None:
+        """ Forget a disconnected channel """
+        self.__known.discard(channel)
+
+    @contextlib.contextmanager
+    def hold(self, channel: int, what: str):
+        """ Hold the lock of ``channel`` for a sequence of calls made by ``what``
+
+        Args:
+            self (CallGate): the ``CallGate`` instance
+            channel (int): the channel id
+            what (str): name of the operation, reported with contended waits
+
+        Raises:
+            PassThruApiConcurrentCallException: if the lock cannot be acquired in time
+        """
+        lock = self.channel(channel)
+        lock.acquire(what)
+        try:
+            yield lock
+        finally:
+            lock.release()
+
+    def stats(self) -> dict:
+        """ Returns a copy of the metrics of all locks keyed by ``'device'`` or channel id """
+        stats = {'device': dataclasses.replace(self.__device.stats)}
+        for channel, lock in list(self.__channels.items()):
+            stats[channel] = dataclasses.replace(lock.stats)
+        return stats
+
+    def guard(self, name: str, proc):
+        """ Wrap the exported function ``proc`` so it is called under the appropriate lock
+
+        Args:
+            self (CallGate): the ``CallGate`` instance
+            name (str): name of the exported function
+            proc: the ``ctypes`` function
+
+        Returns:
+            the wrapped function
+
+        Raises:
+            PassThruApiConcurrentCallException: (from the wrapper) if the lock cannot be acquired in time
+            or the DLL reports ``Err_ConcurrentApiCall``
+        """
+        if name in CHANNEL_PROCS:
+            lookup = self.channel
+
+            def guarded(channel, *args):
+                lock = lookup(getattr(channel, 'value', channel))
+                lock.acquire(name)
+                try:
+                    rv = proc(channel, *args)
+                finally:
+                    lock.release()
+                if rv == ErrorCode.Err_ConcurrentApiCall:
+                    raise PassThruApiConcurrentCallException(ErrorCode.to_string(rv))
+                return rv
+        elif name in CHANNEL_OR_DEVICE_PROCS:
+            lookup, known, acquire, release = self.channel, self.__known, self.acquire_device, self.release_device
+
+            def guarded(channel, *args):
+                channel_id = getattr(channel, 'value', channel)
+                if channel_id in known:
+                    held = [lookup(channel_id)]
+                    held[0].acquire(name)
+                else:
+                    held = acquire(name)
+                try:
+                    rv = proc(channel, *args)
+                finally:
+                    release(held)
+                if rv == ErrorCode.Err_ConcurrentApiCall:
+                    raise PassThruApiConcurrentCallException(ErrorCode.to_string(rv))
+                return rv
+        else:
+            acquire, release = self.acquire_device, self.release_device
+
+            def guarded(*args):
+                held = acquire(name)
+                try:
+                    rv = proc(*args)
+                finally:
+                    release(held)
+                if rv == ErrorCode.Err_ConcurrentApiCall:
+                    raise PassThruApiConcurrentCallException(ErrorCode.to_string(rv))
+                return rv
+        guarded.__name__ = name
+        return guarded
+
+
+class GuardedLibrary(object):
+    """ Proxy for a loaded ``ctypes.CDLL`` that routes every exported function through a ``CallGate``
+
+    Prototypes (``argtypes``/ ``restype``) must be set on the underlying library before use. With an
+    ``Instrumentation`` the DLL call itself (inside the lock) is measured.
+    """
+
+    def __init__(self, dll, gate: CallGate, instrumentation=None) -> None:
+        self.__dll = dll
+        self.__gate = gate
+        self.__instrumentation = instrumentation
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        proc = getattr(self.__dll, name)
+        if self.__instrumentation is not None:
+            proc = self.__instrumentation.wrap(name, proc)
+        guarded = self.__gate.guard(name, proc)
+        setattr(self, name, guarded)
+        return guarded
+
+    def __getitem__(self, name: str):
+        return getattr(self, name)
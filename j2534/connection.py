@@ -5,6 +5,7 @@ from .enums import Connector
 from .structs import PASSTHRU_MSG4, PASSTHRU_MSG5
 from .protocols import __Protocol as Protocol
 
+import ctypes
 import dataclasses
 
 
@@ -14,19 +15,33 @@ class Message(object):
     status: int
     flags: int
     timestamp: int
-    data: list[bytes]
-    extra: list[bytes]
+    data: bytes
+    extra: bytes
 
     @staticmethod
     def from_ptmsg(msg: PASSTHRU_MSG5 | PASSTHRU_MSG4) -> 'Message':
+        """ Copy a ``PASSTHRU_MSG`` structure into a ``Message``
+
+        Args:
+            msg: the ``PASSTHRU_MSG4`` or ``PASSTHRU_MSG5`` to convert
+
+        Returns:
+            the ``Message``, ``extra`` holding the data from ``ExtraDataIndex`` onwards
+
+        Raises:
+            TypeError: if ``msg`` is not a ``PASSTHRU_MSG`` structure
+        """
         if isinstance(msg, PASSTHRU_MSG4):
-            return Message(msg.ProtocolID)
+            data = ctypes.string_at(ctypes.addressof(msg.Data), msg.DataSize)
+            return Message(msg.ProtocolID, msg.RxStatus, msg.TxFlags, msg.Timestamp, data,
+                           data[msg.ExtraDataIndex:])
         elif isinstance(msg, PASSTHRU_MSG5):
-            pass
+            data = ctypes.string_at(msg.DataBuffer, msg.DataLength) if msg.DataBuffer else b''
+            return Message(msg.ProtocolID, msg.RxStatus, msg.TxFlags, msg.Timestamp, data,
+                           data[msg.ExtraDataIndex:])
         else:
             raise TypeError(
                 f'{msg} must be {PASSTHRU_MSG5} or {PASSTHRU_MSG4}')
-        return Message(0, 0, 0, 0, 0, 0)
 
 
 @dataclasses.dataclass
@@ -0,0 +1,296 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Locating installed PassThru libraries
+
+Libraries are found through providers, each listing the libraries it knows for an API version:
+
+* ``RegistryProvider``: the ``PassThruSupport.<version>`` keys of the Windows registry,
+* ``CatalogProvider``: a JSON or INI catalog file, for Linux hosts or to pin a library per station.
+
+A JSON catalog is a list (or ``{"libraries": [...]}``) of entries, an INI catalog has one section per entry
+named like the registry key::
+
+    [{"name": "Vector XL", "vendor": "Vector", "api_version": "04.04", "path": "/opt/vector/libpassthru.so"}]
+
+    [Vector XL]
+    vendor = Vector
+    api_version = 04.04
+    path = /opt/vector/libpassthru.so
+
+``find_library`` asks the providers in order and remembers the result in a ``DiscoveryCache`` on disk,
+keyed by API version and vendor, so later processes neither walk the registry nor parse catalogs. Every
+entry is stamped with the catalogs it was resolved from and their modification times: pinning another
+catalog with ``J2534_CATALOG`` or editing one makes the entry stale. Cached entries are dropped when their
+library file is gone.
+
+Environment:
+    J2534_CATALOG: catalog files (``os.pathsep`` separated) searched before the default locations
+    J2534_CACHE: path of the cache file, an empty value disables the cache
+
+Available Classes:
+    LibraryInfo: one installed library
+    RegistryProvider: Windows registry provider
+    CatalogProvider: JSON/ INI catalog provider
+    DiscoveryCache: on-disk cache of resolved library paths
+
+Available Functions:
+    default_providers: the providers used when none are given
+    find_library: path of the library of a vendor implementing an API version
+"""
+
+from .errors import PassThruLibraryException
+
+import configparser
+import dataclasses
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+_log = logging.getLogger(__name__)
+
+# catalogs looked for when ``J2534_CATALOG`` is not set
+CATALOG_PATHS = (
+    os.path.join('~', '.config', 'j2534', 'catalog.json'),
+    os.path.join('~', '.config', 'j2534', 'catalog.ini'),
+    os.path.join(os.sep, 'etc', 'j2534', 'catalog.json'),
+    os.path.join(os.sep, 'etc', 'j2534', 'catalog.ini'),
+)
+CACHE_PATH = os.path.join('~', '.cache', 'j2534', 'libraries.json')
+
+
+@dataclasses.dataclass(frozen=True)
+class LibraryInfo:
+    """ One installed library
+
+    Fields:
+        name: registry key/ catalog entry name, e.g. ``'Vector XL'``
+        vendor: vendor name, ``name`` if the source has none
+        api_version: the API version implemented
+        path: path of the shared library
+    """
+    name: str
+    vendor: str
+    api_version: str
+    path: str
+
+    def matches(self, vendor: str) -> bool:
+        """ ``True`` if the entry name or vendor starts with ``vendor`` (case insensitive) """
+        vendor = vendor.lower()
+        return self.name.lower().startswith(vendor) or self.vendor.lower().startswith(vendor)
+
+
+class RegistryProvider(object):
+    """ Libraries registered under ``HKLM\\SOFTWARE\\PassThruSupport.<version>`` """
+
+    def libraries(self, api_version: str) -> list[LibraryInfo]:
+        """ Returns the registered libraries, empty where there is no registry """
+        try:
+            import winreg
+        except ImportError:
+            return []
+        libraries = []
+        try:
+            with winreg.OpenKeyEx(winreg.HKEY_LOCAL_MACHINE, f'SOFTWARE\\PassThruSupport.{api_version}') as root:
+                for i in range(winreg.QueryInfoKey(root)[0]):
+                    name = winreg.EnumKey(root, i)
+                    with winreg.OpenKeyEx(root, name) as key:
+                        try:
+                            path = winreg.QueryValueEx(key, 'FunctionLibrary')[0]
+                        except OSError:
+                            continue
+                        try:
+                            vendor = winreg.QueryValueEx(key, 'Vendor')[0]
+                        except OSError:
+                            vendor = name
+                    libraries.append(LibraryInfo(name, vendor, api_version, path))
+        except OSError:
+            pass
+        return libraries
+
+    def stamp(self) -> str:
+        """ Returns the part of the cache stamp for this provider; registry edits are not tracked """
+        return 'registry'
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}()'
+
+
+class CatalogProvider(object):
+    """ Libraries listed in a JSON (``.json``) or INI catalog file """
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.expanduser(path)
+
+    def libraries(self, api_version: str) -> list[LibraryInfo]:
+        """ Returns the catalog entries for ``api_version``, empty if the file does not exist
+
+        Raises:
+            PassThruLibraryException: if the catalog cannot be parsed
+        """
+        try:
+            entries = self.__load()
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, configparser.Error, KeyError, TypeError) as e:
+            raise PassThruLibraryException(f'Invalid library catalog {self.path}: {e}') from e
+        return [entry for entry in entries if entry.api_version == api_version]
+
+    def stamp(self) -> str:
+        """ Returns the part of the cache stamp for this provider: its path and modification time """
+        try:
+            return f'{self.path}@{os.stat(self.path).st_mtime_ns}'
+        except OSError:
+            return f'{self.path}@-'
+
+    def __load(self) -> list[LibraryInfo]:
+        if self.path.lower().endswith('.json'):
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                data = data['libraries']
+            return [LibraryInfo(item['name'], item.get('vendor', item['name']), item['api_version'],
+                                item['path']) for item in data]
+        parser = configparser.ConfigParser(interpolation=None)
+        with open(self.path, encoding='utf-8') as f:
+            parser.read_file(f)
+        return [LibraryInfo(name, section.get('vendor', name), section['api_version'], section['path'])
+                for name, section in parser.items() if name != parser.default_section]
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.path!r})'
+
+
+class DiscoveryCache(object):
+    """ Resolved library paths keyed by API version and vendor, kept in a JSON file
+
+    The file is read once per process and rewritten atomically on every change. Entries carry the stamp of
+    the providers they were resolved with (see ``find_library``).
+    """
+
+    def __init__(self, path: str = None) -> None:
+        self.path = os.path.expanduser(path or CACHE_PATH)
+        self.__lock = threading.Lock()
+        self.__entries = None
+
+    @staticmethod
+    def key(api_version: str, vendor: str) -> str:
+        return f'{api_version}/{vendor.lower()}'
+
+    def __load(self) -> dict:
+        if self.__entries is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    entries = json.load(f)
+                self.__entries = entries if isinstance(entries, dict) else {}
+            except (OSError, ValueError):
+                self.__entries = {}
+        return self.__entries
+
+    def get(self, api_version: str, vendor: str, stamp: str = None) -> str | None:
+        """ Returns the cached path, ``None`` if unknown, stamped differently or the library file is gone """
+        with self.__lock:
+            entries = self.__load()
+            key = self.key(api_version, vendor)
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            # entries written before stamps were added are plain paths
+            path, stamped = (entry, None) if isinstance(entry, str) else (entry.get('path'), entry.get('stamp'))
+            if stamp is not None and stamped != stamp:
+                return None
+            if path is not None and os.path.exists(path):
+                return path
+            del entries[key]
+            self.__save()
+        return None
+
+    def put(self, api_version: str, vendor: str, path: str, stamp: str = None) -> None:
+        with self.__lock:
+            entries = self.__load()
+            entry = {'path': path, 'stamp': stamp}
+            if entries.get(self.key(api_version, vendor)) != entry:
+                entries[self.key(api_version, vendor)] = entry
+                self.__save()
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries = {}
+            self.__save()
+
+    def __save(self) -> None:
+        # a read-only home must not break discovery, the cache is an optimization
+        try:
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.__entries, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            _log.debug(f'Cannot write discovery cache {self.path}: {e}')
+
+
+def _stamp(providers: list) -> str:
+    """ Returns the cache stamp of ``providers``, providers without ``stamp`` count by class name """
+    return '|'.join(provider.stamp() if hasattr(provider, 'stamp') else type(provider).__name__
+                    for provider in providers)
+
+
+def default_providers() -> list:
+    """ Returns the catalogs of ``J2534_CATALOG`` and the default locations, then the registry on Windows """
+    paths = [path for path in os.environ.get('J2534_CATALOG', '').split(os.pathsep) if path]
+    providers = [CatalogProvider(path) for path in paths + list(CATALOG_PATHS)]
+    if sys.platform == 'win32':
+        providers.append(RegistryProvider())
+    return providers
+
+
+__default_cache = None
+
+
+def _default_cache() -> DiscoveryCache | None:
+    global __default_cache
+    path = os.environ.get('J2534_CACHE')
+    if path == '':
+        return None
+    if __default_cache is None or (path is not None and __default_cache.path != os.path.expanduser(path)):
+        __default_cache = DiscoveryCache(path)
+    return __default_cache
+
+
+def find_library(api_version: str, vendor: str, providers: list = None, cache: DiscoveryCache | bool = True) -> str:
+    """ Returns the path of the first library of ``vendor`` implementing ``api_version``
+
+    Args:
+        api_version (str): the API version, e.g. ``'04.04'``
+        vendor (str): prefix of the vendor or entry name (case insensitive)
+        providers (list): providers asked in order, ``default_providers()`` if omitted
+        cache (DiscoveryCache | bool): the cache to use, ``True`` for the default one, ``False`` for none
+
+    Returns:
+        path to the library
+
+    Raises:
+        PassThruLibraryException: if no provider knows a matching library
+    """
+    if cache is True:
+        cache = _default_cache()
+    if providers is None:
+        providers = default_providers()
+    if cache:
+        stamp = _stamp(providers)
+        path = cache.get(api_version, vendor, stamp)
+        if path is not None:
+            return path
+    for provider in providers:
+        for library in provider.libraries(api_version):
+            if library.matches(vendor):
+                _log.info(f'Found {library.name} ({library.path}) through {provider!r}')
+                if cache:
+                    cache.put(api_version, vendor, library.path, stamp)
+                return library.path
+    raise PassThruLibraryException(f'No {vendor} library implementing API {api_version} found')
@@ -159,6 +159,26 @@ class Flags(object):
     CHKSM_DISABLE = 0x00000200
     CAN_ID_29BIT = 0x00000100
 
+class RxStatus(object):
+    """ RxStatus bits of received messages (J2534-1 v04.04 7.3.3.1)
+    """
+    TX_MSG_TYPE = 0x00000001
+    START_OF_MESSAGE = 0x00000002
+    ISO15765_FIRST_FRAME = 0x00000002
+    RX_BREAK = 0x00000004
+    TX_INDICATION = 0x00000008
+    ISO15765_PADDING_ERROR = 0x00000010
+    ISO15765_ADDR_TYPE = 0x00000080
+    CAN_29BIT_ID = 0x00000100
+
+class TxFlags(object):
+    """ TxFlags bits of transmitted messages (J2534-1 v04.04 7.3.3.1)
+    """
+    ISO15765_FRAME_PAD = 0x00000040
+    ISO15765_ADDR_TYPE = 0x00000080
+    CAN_29BIT_ID = 0x00000100
+    WAIT_P3_MIN_ONLY = 0x00000200
+
 class Connector(object):
     """ Connector specified in Figure 87
     """
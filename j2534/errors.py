@@ -41,4 +41,22 @@ class PassThruApiConcurrentCallException(Exception):
     pass
 
 class PassThruLibraryException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class IsoTpException(J2534Exception):
+    pass
+
+class UdsException(J2534Exception):
+    pass
+
+class UdsNegativeResponseException(UdsException):
+    """ Negative response (0x7F) from the ECU
+    """
+
+    def __init__(self, service: int, nrc: int) -> None:
+        self.service = service
+        self.nrc = nrc
+        super(UdsNegativeResponseException, self).__init__(f'Service 0x{service:02x}: negative response 0x{nrc:02x}')
+
+class FleetException(J2534Exception):
+    pass
@@ -19,33 +19,79 @@ class Filter(abc.ABC):
         """
         pass
 
+    # compiled ``msg4`` triple, built on first use and dropped when one of ``_MSG4_FIELDS`` is assigned
+    __msg4 = None
+    _MSG4_FIELDS = frozenset(('protocol', 'rxstat', 'txflags', 'size', 'mask', 'patt', 'flow'))
+
+    def __setattr__(self, name: str, value) -> None:
+        super().__setattr__(name, value)
+        if name in self._MSG4_FIELDS:
+            self.__msg4 = None
+
+    @staticmethod
+    def to_msg4(protocol: int, rxstatus: int, txflags: int, size: int, *data) -> tuple[PASSTHRU_MSG4, ...]:
+        """ Build one ``PASSTHRU_MSG4`` of ``size`` data bytes for each of ``data``
+
+        Args:
+            protocol (int): ``ProtocolID`` of the messages
+            rxstatus (int): ``RxStatus`` of the messages
+            txflags (int): ``TxFlags`` of the messages
+            size (int): ``DataSize`` of the messages
+            data: bytes-like data of each message, zero padded/ truncated to ``size``
+
+        Returns:
+            the messages in the order of ``data``
+        """
+        msgs = []
+        for item in data:
+            raw = bytes(item)[:size]
+            msg = PASSTHRU_MSG4(ProtocolID=protocol, RxStatus=rxstatus, TxFlags=txflags, DataSize=size,
+                                ExtraDataIndex=size)
+            ctypes.memmove(msg.Data, raw, len(raw))
+            msgs.append(msg)
+        return tuple(msgs)
+
     @property
-    def msg4(self) -> tuple[PASSTHRU_MSG4, PASSTHRU_MSG4, PASSTHRU_MSG4]:
-        mask = PASSTHRU_MSG4()
-        mask.ProtocolID = ProtocolId.ISO15765
-        mask.RxStatus       = ctypes.c_ulong(self.rxstat)
-        mask.TxFlags        = ctypes.c_ulong(self.txflags)
-        mask.DataSize       = ctypes.c_ulong(self.size)
-        mask.ExtraDataIndex = ctypes.c_ulong(self.size)
-        ctypes.memmove(mask.Data, ctypes.byref(self.mask), self.size)
-
-        patt = PASSTHRU_MSG4()
-        patt.ProtocolID = ProtocolId.ISO15765
-        patt.RxStatus = ctypes.c_ulong(self.rxstat)
-        patt.TxFlags = ctypes.c_ulong(self.txflags)
-        patt.DataSize = ctypes.c_ulong(self.size)
-        patt.ExtraDataIndex = ctypes.c_ulong(self.size)
-        ctypes.memmove(patt.Data, ctypes.byref(self.patt), self.size)
-
-        flow = PASSTHRU_MSG4()
-        flow.ProtocolID = ProtocolId.ISO15765
-        flow.RxStatus = ctypes.c_ulong(self.rxstat)
-        flow.TxFlags = ctypes.c_ulong(self.txflags)
-        flow.DataSize = ctypes.c_ulong(self.size)
-        flow.ExtraDataIndex = ctypes.c_ulong(self.size)
-        ctypes.memmove(flow.Data, ctypes.byref(self.flow), self.size)
-
-        return mask, patt, flow
+    def msg4(self) -> tuple[PASSTHRU_MSG4, PASSTHRU_MSG4, PASSTHRU_MSG4 | None]:
+        """ Returns copies of the ``(mask, pattern, flow control)`` messages of the filter
+
+        The flow control message is ``None`` for pass and block filters. Changing the returned messages
+        does not change the filter.
+        """
+        return tuple(None if msg is None else PASSTHRU_MSG4.from_buffer_copy(msg) for msg in self._cached_msg4())
+
+    def _cached_msg4(self) -> tuple[PASSTHRU_MSG4, PASSTHRU_MSG4, PASSTHRU_MSG4 | None]:
+        """ Returns the ``msg4`` messages compiled on first use and shared by every ``set_filter`` call
+
+        The messages are passed to the DLL as they are, on any channel and after reconnects; they must not
+        be modified. Assigning a field (e.g. ``filter.mask = ...``) rebuilds them on the next call, changing
+        the bytes of a field in place does not.
+        """
+        if self.__msg4 is None:
+            flow = getattr(self, 'flow', None)
+            if flow is None:
+                mask, patt = self.to_msg4(self.protocol, self.rxstat, self.txflags, self.size, self.mask, self.patt)
+            else:
+                mask, patt, flow = self.to_msg4(self.protocol, self.rxstat, self.txflags, self.size,
+                                                self.mask, self.patt, flow)
+            self.__msg4 = (mask, patt, flow)
+        return self.__msg4
+
+    def __repr__(self) -> str:
+        flow = getattr(self, 'flow', None)
+        return (f'{self.__class__.__name__}(mask={bytes(self.mask).hex()}, pattern={bytes(self.patt).hex()}'
+                + (f', flow={bytes(flow).hex()})' if flow is not None else ')'))
+
+    def __getstate__(self) -> dict:
+        # ctypes arrays do not pickle, send the raw bytes and rebuild the compiled messages on first use
+        return {key: bytes(value) if isinstance(value, ctypes.Array) else value
+                for key, value in self.__dict__.items() if key != '_Filter__msg4'}
+
+    def __setstate__(self, state: dict) -> None:
+        for key, value in state.items():
+            if key in ('mask', 'patt', 'flow'):
+                value = _field(value, len(value))
+            setattr(self, key, value)
 
     @property
     def type(self):
@@ -62,25 +108,47 @@ class Filter(abc.ABC):
     def msg5(cls):
         raise NotImplementedError("Filter API v5 is not implemented.")
 
-class BlockFilter(Filter):
-    """ ``BlockFilter`` keeps the matching messages out of the receive queue.
-    This filter type is only valid for non-logical channels
+def _field(value: int | bytes, size: int) -> ctypes.Array:
+    """ Returns ``value`` (an integer in ``size`` big endian bytes, or bytes) as a ``c_uint8`` array """
+    raw = value.to_bytes(size, 'big') if isinstance(value, int) else bytes(value)
+    return (ctypes.c_uint8 * len(raw)).from_buffer_copy(raw)
+
+class _MaskFilter(Filter):
+    """ Common part of the pass and block filters
     """
 
-    def __init__(self, protocol: int, mask: int, pattern: int):
-        """
+    def __init__(self, protocol: int, mask: int | bytes, pattern: int | bytes, **kwargs) -> None:
+        """ Create the filter
+
+        Args:
+            self (_MaskFilter): the ``PassFilter``/ ``BlockFilter`` instance
+            protocol (int): ``ProtocolID`` of the filter messages
+            mask (int | bytes): mask of the leading data bytes (integers are ``size`` bytes big endian)
+            pattern (int | bytes): pattern the masked bytes are compared with
+
+        Keyword Args:
+            size (int): number of data bytes compared for integer masks/ patterns (default 4)
+            rxstat (int): ``RxStatus`` of the filter messages
+            txflags (int): ``TxFlags`` of the filter messages
         """
-        raise NotImplementedError('Block Filters are not implemented')
+        self.protocol = protocol
+        self.size = kwargs.get('size', 4) if isinstance(mask, int) else len(mask)
+        self.rxstat = kwargs.get('rxstat', 0)
+        self.txflags = kwargs.get('txflags', 0)
+        self.mask = _field(mask, self.size)
+        self.patt = _field(pattern, self.size)
+        if len(self.patt) != self.size:
+            raise ValueError(f'Mask and pattern lengths differ ({self.size} != {len(self.patt)})')
 
-class PassFilter(Filter):
-    """ ``PassFilter`` allows the matching messages into the receiving queue.
+class BlockFilter(_MaskFilter):
+    """ ``BlockFilter`` keeps the matching messages out of the receiving queue.
     This filter type is only valid for non-logical channels
     """
 
-    def __init__(self) -> None:
-        """
-        """
-        raise NotImplementedError('Pass Filters are not implemented')
+class PassFilter(_MaskFilter):
+    """ ``PassFilter`` allows the matching messages into the receiving queue.
+    This filter type is only valid for non-logical channels
+    """
 
 class FlowCtrlFilter(Filter):
     """
@@ -101,6 +169,7 @@ class FlowCtrlFilter(Filter):
         raise NotImplementedError()
 
     def __v4_init(self, **kwargs):
+        self.protocol = kwargs.get('protocol', ProtocolId.ISO15765)
         self.size = kwargs.get('size', 4)
         self.rxstat = kwargs.get('rxstat', 0)
         self.txflags = kwargs.get('txflags', 0)
@@ -0,0 +1,236 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Hardware filter slot allocation for CAN identifiers
+
+A device offers a few filter slots per channel (J2534 guarantees ten), far fewer than the identifiers an
+application usually wants. A ``FilterManager`` turns the wanted identifiers and ranges into at most
+``slots`` mask/ pattern pass filters:
+
+1. the wanted set is split into aligned power-of-two blocks, each one an exact mask/ pattern term,
+2. terms differing in a single pattern bit are combined while that stays exact,
+3. while there are more terms than slots, the two neighbouring terms whose combination admits the fewest
+   unwanted identifiers are merged.
+
+The device then drops everything outside the cover, and the few unwanted identifiers it still lets through
+are removed on the host by a ``FilterEngine`` holding the exact terms (``accepts_id``/ ``apply``). When the
+wanted set changes only the filters that differ are stopped and started, so a small change costs a couple of
+calls and the identifiers covered before and after never stop being received.
+
+Available Classes:
+    FilterManager: hardware filter allocator of one channel with software spill
+"""
+
+from .enums import ErrorCode, ProtocolId
+from .errors import PassThruInterfaceException
+from .filter import PassFilter
+from .softfilter import FilterEngine
+from . import util
+
+import bisect
+import heapq
+import logging
+import threading
+
+# mask bits above the identifier are kept so frames of the other identifier length never match
+MASK = 0xFFFFFFFF
+
+
+def _blocks(low: int, high: int, width: int):
+    """ Yields the aligned ``(mask, pattern)`` blocks exactly covering the identifiers ``low..high`` """
+    while low <= high:
+        size = low & -low if low else 1 << width
+        while low + size - 1 > high:
+            size >>= 1
+        yield MASK & ~(size - 1), low
+        low += size
+
+
+def _combine(terms: set) -> set:
+    """ Combine terms differing in a single pattern bit into one term (the union stays exact) """
+    changed = True
+    while changed:
+        changed = False
+        for mask, pattern in sorted(terms):
+            if (mask, pattern) not in terms:
+                continue
+            bits = mask
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                other = (mask, pattern ^ bit)
+                if other in terms:
+                    terms -= {(mask, pattern), other}
+                    terms.add((mask & ~bit, pattern & ~bit))
+                    changed = True
+                    break
+    return terms
+
+
+@util.setup_logging
+class FilterManager(object):
+    """ Covers the wanted identifiers of one channel with the hardware filter slots
+
+    ``accepts_id`` stays valid until the next ``update``; a ``ReceivePump`` memoises its predicates, so
+    subscribe again after changing the wanted set.
+
+    Attributes:
+        slots: hardware filter slots the manager may use
+        overhead: about how many unwanted identifiers the installed filters admit (removed on the host)
+    """
+
+    def __init__(self, passthru, channel: int, **kwargs) -> None:
+        """ Create the manager; no filter is installed before the first ``update``
+
+        Args:
+            self (FilterManager): the ``FilterManager`` instance
+            passthru (PassThru): the ``PassThru`` instance owning ``channel``
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+
+        Keyword Args:
+            slots (int): filter slots available, leave room for filters installed elsewhere (default 10)
+            extended (bool): 29 bit identifiers instead of 11 bit
+            protocol (int): ``ProtocolID`` of the filter messages (default ``CAN``)
+            loglevel (int): logging level for the logger instance
+        """
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        self.slots = kwargs.get('slots', 10)
+        if self.slots < 1:
+            raise ValueError(f'At least one filter slot is required, got {self.slots}')
+        self.__passthru = passthru
+        self.__channel = channel
+        self.__width = 29 if kwargs.get('extended', False) else 11
+        self.__protocol = kwargs.get('protocol', ProtocolId.CAN)
+        self.__lock = threading.Lock()
+        self.__installed = {}
+        self.__engine = FilterEngine()
+        self.__exact = True
+        self.overhead = 0
+
+    @property
+    def filters(self) -> list[tuple[int, int]]:
+        """ Returns the installed ``(mask, pattern)`` pairs """
+        return sorted(self.__installed)
+
+    @property
+    def exact(self) -> bool:
+        """ ``True`` if the device filters admit exactly the wanted identifiers """
+        return self.__exact
+
+    def update(self, ids=(), ranges=()) -> None:
+        """ Make the channel receive exactly ``ids`` and ``ranges``, reinstalling only what changed
+
+        Args:
+            self (FilterManager): the ``FilterManager`` instance
+            ids: wanted identifiers
+            ranges: wanted ``(low, high)`` identifier ranges, both ends included
+
+        Raises:
+            ValueError: if an identifier does not fit the identifier length
+            PassThruInterfaceException: if the DLL returns an error code
+        """
+        limit = (1 << self.__width) - 1
+        wanted = sorted([(id, id) for id in ids] + [tuple(r) for r in ranges])
+        for low, high in wanted:
+            if not 0 <= low <= high <= limit:
+                raise ValueError(f'Invalid identifier range 0x{low:x}..0x{high:x}')
+        terms = set()
+        end = -1
+        for low, high in wanted:
+            low = max(low, end + 1)
+            if low <= high:
+                terms.update(_blocks(low, high, self.__width))
+            end = max(end, high)
+        terms = _combine(terms)
+        with self.__lock:
+            cover = self.__cover(terms)
+            while True:
+                try:
+                    self.__install(cover)
+                    break
+                except PassThruInterfaceException as e:
+                    # the device has fewer slots than configured, use what it accepted
+                    if e.code != ErrorCode.Err_ExceededLimit or len(self.__installed) < 1:
+                        raise
+                    self.__log.warning(f'Device accepts {len(self.__installed)} filters, not {self.slots}')
+                    self.slots = len(self.__installed)
+                    cover = self.__cover(terms)
+            self.__exact = cover == terms
+            wanted = sum(self.__size(mask) for mask, _ in terms)
+            # overlapping cover terms are counted twice, hence the bound
+            self.overhead = min(sum(self.__size(mask) for mask, _ in cover), limit + 1) - wanted
+            self.__engine = FilterEngine(PassFilter(self.__protocol, mask, pattern) for mask, pattern in terms)
+
+    def clear(self) -> None:
+        """ Stop all filters installed by the manager (nothing is received afterwards) """
+        self.update()
+
+    def __size(self, mask: int) -> int:
+        """ Returns the number of identifiers matched by ``mask`` """
+        return 1 << (self.__width - (mask & ((1 << self.__width) - 1)).bit_count())
+
+    def __merge(self, a: tuple[int, int], b: tuple[int, int]) -> tuple[int, tuple[int, int]]:
+        """ Returns the cost (unwanted identifiers added) and the ``(pattern, mask)`` term covering ``a`` and ``b`` """
+        (apatt, amask), (bpatt, bmask) = a, b
+        mask = amask & bmask & ~(apatt ^ bpatt)
+        return self.__size(mask) - self.__size(amask) - self.__size(bmask), (apatt & mask, mask)
+
+    def __cover(self, terms: set) -> set:
+        """ Returns at most ``slots`` terms covering ``terms`` with the fewest unwanted identifiers
+
+        Neighbours in pattern order are merged cheapest first from a heap; entries whose terms were merged
+        away since are skipped when they come up.
+        """
+        cover = sorted((pattern, mask) for mask, pattern in terms)
+        live = set(cover)
+        heap = [(*self.__merge(a, b), a, b) for a, b in zip(cover, cover[1:])]
+        heapq.heapify(heap)
+        free = (1 << self.__width) - 1
+        while len(cover) > self.slots:
+            _, merged, a, b = heapq.heappop(heap)
+            if a not in live or b not in live:
+                continue
+            pattern, mask = merged
+            # the merged term swallows the pair and any other term inside its pattern range
+            low = bisect.bisect_left(cover, (pattern, 0))
+            high = bisect.bisect_right(cover, (pattern | (free & ~mask), MASK))
+            swallowed = [(p, m) for p, m in cover[low:high] if m & mask == mask and p & mask == pattern]
+            for term in swallowed:
+                live.discard(term)
+            cover[low:high] = [term for term in cover[low:high] if term in live]
+            i = bisect.bisect_left(cover, merged)
+            cover.insert(i, merged)
+            live.add(merged)
+            for neighbour in cover[max(i - 1, 0):i] + cover[i + 1:i + 2]:
+                heapq.heappush(heap, (*self.__merge(merged, neighbour), merged, neighbour))
+        return {(mask, pattern) for pattern, mask in cover}
+
+    def __install(self, cover: set) -> None:
+        """ Start the new filters and stop the stale ones, keeping shared coverage installed """
+        passthru, channel = self.__passthru, self.__channel
+        stale = [term for term in self.__installed if term not in cover]
+        added = [term for term in cover if term not in self.__installed]
+        for term in added[:max(self.slots - len(self.__installed), 0)]:
+            self.__start(term)
+        for term in stale:
+            passthru.stop_msg_filter(channel, self.__installed.pop(term))
+        for term in added:
+            if term not in self.__installed:
+                self.__start(term)
+        self.__log.debug(f'Channel {channel}: +{len(added)} -{len(stale)} filters')
+
+    def __start(self, term: tuple[int, int]) -> None:
+        mask, pattern = term
+        self.__installed[term] = self.__passthru.set_filter(self.__channel,
+                                                            PassFilter(self.__protocol, mask, pattern))
+
+    def accepts_id(self, arbid: int) -> bool:
+        """ Returns ``True`` if ``arbid`` is wanted; usable as ``ReceivePump`` predicate """
+        return self.__exact or self.__engine.accepts_id(arbid)
+
+    def apply(self, batch, indices=None) -> list[int]:
+        """ Returns the positions of the wanted messages of ``batch`` (see ``FilterEngine.apply``) """
+        if self.__exact:
+            return list(range(batch.count) if indices is None else indices)
+        return self.__engine.apply(batch, indices)
+
@@ -0,0 +1,354 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" One worker process per PassThru device
+
+Vendor DLLs are usually single threaded, and one Python process cannot drive a dozen busy interfaces
+because of the GIL. A ``Fleet`` hosts every device in its own worker process. The parent talks to each
+worker through a ``DeviceProxy`` with the ``PassThru`` API:
+
+* calls are sent over a pipe and answered synchronously; ``PassThruInterfaceException`` keeps its error code
+  across the process boundary,
+* received messages are not pickled. ``read``/ ``poll`` let the worker read straight into one slot of a
+  shared memory ring of ``PASSTHRU_MSG4`` arrays, and the proxy returns a ``MessageBatch`` over the same
+  slot. As with the local pools a batch stays valid for ``depth - 1`` further reads of the proxy.
+
+Calls to different proxies run in parallel (the parent only waits on pipes), so a station can serve each
+device from its own thread and scale across all cores.
+
+Available Classes:
+    Fleet: starts and supervises the worker processes
+    DeviceProxy: ``PassThru`` API of one worker
+    WorkerMetrics: health and throughput of one worker
+"""
+
+from .buffer import MessageBatch, ReadResult, msg_array_type
+from .enums import ErrorCode
+from .errors import FleetException, PassThruInterfaceException
+from .interface import PassThru
+from .structs import PASSTHRU_MSG4
+from . import api
+from . import util
+
+import ctypes
+import dataclasses
+import logging
+import multiprocessing
+import pickle
+import threading
+import time
+from multiprocessing import shared_memory
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+@dataclasses.dataclass
+class WorkerMetrics:
+    """ Health and throughput of one worker process
+
+    Fields:
+        name: name of the device
+        pid: process id of the worker
+        alive: ``True`` while the worker process runs
+        calls: API calls served
+        errors: calls that raised
+        frames_read: messages returned through the ring
+        frames_written: messages sent with ``write``
+        busy_s: time spent in API calls
+        cpu_s: CPU time of the worker process
+        uptime_s: time since the worker started
+        max_rss_kb: peak resident memory of the worker (0 where unknown)
+        rpc_mean_us: mean round trip of a call seen from the parent
+    """
+    name: str
+    pid: int
+    alive: bool
+    calls: int = 0
+    errors: int = 0
+    frames_read: int = 0
+    frames_written: int = 0
+    busy_s: float = 0.0
+    cpu_s: float = 0.0
+    uptime_s: float = 0.0
+    max_rss_kb: int = 0
+    rpc_mean_us: float = 0.0
+
+
+def _ring(shm: shared_memory.SharedMemory, depth: int, size: int) -> list[ctypes.Array]:
+    """ Returns the ``depth`` message arrays of ``size`` messages laid out in ``shm`` """
+    array = msg_array_type(PASSTHRU_MSG4, size)
+    return [array.from_buffer(shm.buf, i * ctypes.sizeof(array)) for i in range(depth)]
+
+
+def _marshal(error: Exception) -> tuple:
+    """ Returns a picklable description of ``error`` """
+    if isinstance(error, PassThruInterfaceException):
+        return 'passthru', error.code if error.code is not None else error.message
+    try:
+        pickle.dumps(error)
+        return 'exception', error
+    except Exception:
+        return 'exception', FleetException(f'{error.__class__.__name__}: {error}')
+
+
+def _serve(conn, shm_name: str, depth: int, size: int, lib: type, kwargs: dict) -> None:
+    """ Worker process: create the ``PassThru`` and answer calls until the pipe closes """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        passthru = PassThru(lib, **kwargs)
+    except Exception as e:
+        conn.send(('error', _marshal(e)))
+    else:
+        conn.send(('ok', None))
+        _answer(conn, passthru, _ring(shm, depth, size))
+    # all views of the ring are gone with ``_answer``
+    shm.close()
+
+
+def _answer(conn, passthru: PassThru, ring: list[ctypes.Array]) -> None:
+    """ Answer the calls of the parent """
+    started = time.monotonic()
+    size = len(ring[0])
+    counters = dict(calls=0, errors=0, frames_read=0, frames_written=0, busy_s=0.0)
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        method, args, kw = request
+        begin = time.perf_counter()
+        try:
+            if method in ('read', 'poll'):
+                channel, msgs, timeout, slot = args
+                batch = MessageBatch(ring[slot], 0)
+                if method == 'read':
+                    status = ErrorCode.Status_NoError
+                    passthru.read(channel, min(msgs, size), timeout, batch)
+                else:
+                    status = passthru.poll(channel, min(msgs, size), timeout, batch).status
+                counters['frames_read'] += batch.count
+                result = (status, batch.count)
+            elif method == 'metrics':
+                usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else 0
+                result = dict(counters, cpu_s=time.process_time(), uptime_s=time.monotonic() - started,
+                              max_rss_kb=usage)
+            else:
+                result = getattr(passthru, method)(*args, **kw)
+                if method == 'write':
+                    counters['frames_written'] += result
+            reply = ('ok', result)
+        except Exception as e:
+            counters['errors'] += 1
+            reply = ('error', _marshal(e))
+        counters['calls'] += 1
+        counters['busy_s'] += time.perf_counter() - begin
+        conn.send(reply)
+
+
+@util.setup_logging
+class DeviceProxy(object):
+    """ ``PassThru`` API of a device hosted by a worker process
+
+    Every ``PassThru`` method with picklable arguments and results is forwarded; ``read`` and ``poll``
+    return batches from the shared memory ring. ``DeviceProxy.shutdown`` ends the worker (``close`` is
+    ``PassThruClose``).
+
+    Attributes:
+        name: name of the device in the fleet
+        apiversion: version of the PassThru API used by the worker
+    """
+
+    def __init__(self, name: str, process, conn, shm: shared_memory.SharedMemory, depth: int, size: int,
+                 apiversion: str) -> None:
+        self.name = name
+        self.apiversion = apiversion
+        self.__process = process
+        self.__conn = conn
+        self.__shm = shm
+        self.__ring = _ring(shm, depth, size)
+        self.__next = 0
+        self.__lock = threading.Lock()
+        self.__rpcs = 0
+        self.__rpc_time = 0.0
+
+    def __getattr__(self, method: str):
+        if method.startswith('_'):
+            raise AttributeError(method)
+
+        def call(*args, **kwargs):
+            return self.__call(method, args, kwargs)
+        call.__name__ = method
+        return call
+
+    def __call(self, method: str, args: tuple, kwargs: dict):
+        with self.__lock:
+            begin = time.perf_counter()
+            try:
+                self.__conn.send((method, args, kwargs))
+                status, result = self.__conn.recv()
+            except (EOFError, OSError, BrokenPipeError) as e:
+                raise FleetException(f'Worker {self.name} is gone (exit code {self.__process.exitcode})') from e
+            self.__rpcs += 1
+            self.__rpc_time += time.perf_counter() - begin
+        if status == 'ok':
+            return result
+        kind, error = result
+        if kind == 'passthru':
+            raise PassThruInterfaceException(error)
+        raise error
+
+    def __read(self, method: str, channel: int, msgs: int, timeout: int) -> tuple[int, MessageBatch]:
+        if self.apiversion == api.V5:
+            raise FleetException('API v05.00 messages point to process memory and are not shared')
+        with self.__lock:
+            slot = self.__next
+            self.__next = (slot + 1) % len(self.__ring)
+        status, count = self.__call(method, (channel, msgs, timeout, slot), {})
+        return status, MessageBatch(self.__ring[slot], count)
+
+    def read(self, channel: int, msgs: int, timeout: int) -> MessageBatch:
+        """ See ``PassThru.read``; at most the ring slot size is read per call """
+        return self.__read('read', channel, msgs, timeout)[1]
+
+    def poll(self, channel: int, msgs: int, timeout: int = 0) -> ReadResult:
+        """ See ``PassThru.poll``; at most the ring slot size is read per call """
+        return ReadResult(*self.__read('poll', channel, msgs, timeout))
+
+    @property
+    def alive(self) -> bool:
+        return self.__process.is_alive()
+
+    def metrics(self) -> WorkerMetrics:
+        """ Returns the health and throughput counters of the worker """
+        metrics = WorkerMetrics(self.name, self.__process.pid, self.alive)
+        if metrics.alive:
+            for key, value in self.__call('metrics', (), {}).items():
+                setattr(metrics, key, value)
+        with self.__lock:
+            if self.__rpcs:
+                metrics.rpc_mean_us = self.__rpc_time / self.__rpcs * 1e6
+        return metrics
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """ Stop the worker (its devices are released when the process exits) """
+        with self.__lock:
+            if self.__conn.closed:
+                return
+            try:
+                self.__conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            self.__process.join(timeout)
+            if self.__process.is_alive():
+                self.__log.warning(f'Worker {self.name} did not stop, terminating it')
+                self.__process.terminate()
+                self.__process.join()
+            self.__conn.close()
+            self.__ring = []
+            try:
+                self.__shm.close()
+            except BufferError:
+                # batches handed out still reference the ring; the mapping goes with them
+                pass
+            self.__shm.unlink()
+
+
+@util.setup_logging
+class Fleet(object):
+    """ Starts one worker process per device and keeps their proxies """
+
+    def __init__(self, **kwargs) -> None:
+        """ Create an empty fleet
+
+        Args:
+            self (Fleet): the ``Fleet`` instance
+
+        Keyword Args:
+            depth (int): ring slots per worker, i.e. batches valid at the same time (default 4)
+            slot_size (int): messages per ring slot, the largest read (default 256)
+            start_method (str): ``multiprocessing`` start method, the platform default if omitted
+            loglevel (int): logging level for the logger instance
+        """
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        self.depth = kwargs.get('depth', 4)
+        self.slot_size = kwargs.get('slot_size', 256)
+        self.__context = multiprocessing.get_context(kwargs.get('start_method'))
+        self.__proxies = {}
+
+    def __enter__(self) -> 'Fleet':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __getitem__(self, name: str) -> DeviceProxy:
+        return self.__proxies[name]
+
+    def __iter__(self):
+        return iter(list(self.__proxies.values()))
+
+    def __len__(self) -> int:
+        return len(self.__proxies)
+
+    def spawn(self, name: str, lib: type, **kwargs) -> DeviceProxy:
+        """ Start a worker hosting ``PassThru(lib, **kwargs)``
+
+        Args:
+            self (Fleet): the ``Fleet`` instance
+            name (str): name of the device in the fleet
+            lib (type): the library class, as for ``PassThru``
+            kwargs: keyword arguments of ``PassThru`` (must be picklable)
+
+        Returns:
+            the proxy of the worker
+
+        Raises:
+            FleetException: if the name is taken or the worker fails to start
+        """
+        if name in self.__proxies:
+            raise FleetException(f'Device {name} already exists')
+        size = ctypes.sizeof(msg_array_type(PASSTHRU_MSG4, self.slot_size)) * self.depth
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        parent, child = self.__context.Pipe()
+        process = self.__context.Process(target=_serve, name=f'j2534-fleet-{name}', daemon=True,
+                                         args=(child, shm.name, self.depth, self.slot_size, lib, kwargs))
+        process.start()
+        child.close()
+        try:
+            status, result = parent.recv()
+        except EOFError:
+            status, result = 'error', ('exception', FleetException(f'Worker {name} exited with {process.exitcode}'))
+        if status != 'ok':
+            process.join()
+            parent.close()
+            shm.close()
+            shm.unlink()
+            kind, error = result
+            raise PassThruInterfaceException(error) if kind == 'passthru' else error
+        proxy = DeviceProxy(name, process, parent, shm, self.depth, self.slot_size,
+                            kwargs.get('apiversion', api.V4))
+        self.__proxies[name] = proxy
+        self.__log.info(f'Started worker {name} (pid {process.pid})')
+        return proxy
+
+    def metrics(self) -> dict[str, WorkerMetrics]:
+        """ Returns the metrics of every worker, dead workers included """
+        metrics = {}
+        for name, proxy in list(self.__proxies.items()):
+            try:
+                metrics[name] = proxy.metrics()
+            except FleetException:
+                metrics[name] = WorkerMetrics(name, None, False)
+        return metrics
+
+    def close(self) -> None:
+        """ Stop all workers """
+        while self.__proxies:
+            _, proxy = self.__proxies.popitem()
+            proxy.shutdown()
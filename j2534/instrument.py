@@ -0,0 +1,210 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Per-call instrumentation of PassThru libraries
+
+An ``Instrumentation`` wraps the exported functions of a library (``PassThru(..., instrument=True)``) and
+counts, for every entry point:
+
+* calls, calls returning an error code and the time spent in the DLL,
+* a latency histogram; bucket ``n`` counts calls of ``[2**(n-1), 2**n)`` nanoseconds,
+* the error codes returned.
+
+All counters live in arrays allocated up front, a call only does a few index updates. The time measured is
+the DLL call alone, waiting for the call lock is reported by ``PassThru.lock_stats``. Trace hooks receive
+every call as ``hook(name, args, start_ns, end_ns, rv)``; with no hook installed they cost a single test.
+Wait hooks receive every contended acquisition of a call lock as
+``hook(name, channel, start_ns, end_ns, acquired)``.
+
+Counters are updated without a lock: two threads calling the same function on concurrent channels may
+rarely lose an update, which is fine for metrics.
+
+Available Classes:
+    Instrumentation: counters and trace hooks of one or more ``PassThru`` instances
+    CallStats: snapshot of the counters of one entry point
+"""
+
+from .enums import ErrorCode
+from . import api
+
+import array
+import collections
+import dataclasses
+import logging
+import threading
+import time
+
+_log = logging.getLogger(__name__)
+
+# latency histogram buckets, the last one collects everything from about a second
+LATENCY_BUCKETS = 32
+
+# error code counters per entry point, codes from the last slot up share it
+ERROR_SLOTS = 64
+
+# every entry point of both API versions, in a fixed order
+PROCS = tuple(dict.fromkeys(proc for defs in (api.PASSTHRU_DEF4, api.PASSTHRU_DEF5) for proc, _, _ in defs))
+
+# names of the return codes
+ERROR_NAMES = {value: name for name, value in vars(ErrorCode).items()
+                if name.startswith(('Err_', 'Status_')) and isinstance(value, int)}
+
+
+@dataclasses.dataclass
+class CallStats:
+    """ Snapshot of the counters of one entry point
+
+    Fields:
+        calls: number of calls
+        errors: calls returning anything but ``Status_NoError``
+        total_ns: time spent in the DLL in nanoseconds
+        max_ns: longest call in nanoseconds
+        latency: histogram of call durations; bucket ``n`` counts calls of ``[2**(n-1), 2**n)`` nanoseconds
+        error_codes: calls per returned error code name
+    """
+    calls: int
+    errors: int
+    total_ns: int
+    max_ns: int
+    latency: list[int]
+    error_codes: dict[str, int]
+
+    @property
+    def mean_ns(self) -> float:
+        return self.total_ns / self.calls if self.calls else 0.0
+
+
+class Instrumentation(object):
+    """ Call counters, latency histograms and trace hooks for the entry points of PassThru libraries
+
+    Attributes:
+        hooks: the installed trace hooks (use ``add_hook``/ ``remove_hook`` to change)
+        wait_hooks: the installed lock wait hooks (use ``add_wait_hook``/ ``remove_wait_hook`` to change)
+    """
+
+    def __init__(self) -> None:
+        self.hooks = ()
+        self.wait_hooks = ()
+        self.__lock = threading.Lock()
+        self.__index = {proc: i for i, proc in enumerate(PROCS)}
+        self.__allocate()
+
+    def __allocate(self) -> None:
+        count = len(PROCS)
+        self.__calls = array.array('Q', bytes(8 * count))
+        self.__errors = array.array('Q', bytes(8 * count))
+        self.__total = array.array('Q', bytes(8 * count))
+        self.__max = array.array('Q', bytes(8 * count))
+        self.__latency = array.array('Q', bytes(8 * count * LATENCY_BUCKETS))
+        self.__codes = array.array('Q', bytes(8 * count * ERROR_SLOTS))
+
+    def add_hook(self, hook) -> None:
+        """ Call ``hook(name, args, start_ns, end_ns, rv)`` after every instrumented call
+
+        ``args`` are the ``ctypes`` arguments of the call and the times are ``time.perf_counter_ns``
+        values. Hooks run on the calling thread while it still holds the call lock, so keep them short;
+        exceptions are logged.
+        """
+        with self.__lock:
+            self.hooks = self.hooks + (hook,)
+
+    def remove_hook(self, hook) -> None:
+        """ Remove a hook added by ``add_hook``
+
+        Raises:
+            ValueError: if the hook is not installed
+        """
+        with self.__lock:
+            hooks = list(self.hooks)
+            hooks.remove(hook)
+            self.hooks = tuple(hooks)
+
+    def add_wait_hook(self, hook) -> None:
+        """ Call ``hook(name, channel, start_ns, end_ns, acquired)`` whenever a call waits for its lock
+
+        ``name`` is the entry point waiting, ``channel`` the channel of the lock (-1 for the device lock)
+        and ``acquired`` is ``False`` if the wait ended with the lock timeout. Uncontended acquisitions are
+        not reported.
+        """
+        with self.__lock:
+            self.wait_hooks = self.wait_hooks + (hook,)
+
+    def remove_wait_hook(self, hook) -> None:
+        """ Remove a hook added by ``add_wait_hook``
+
+        Raises:
+            ValueError: if the hook is not installed
+        """
+        with self.__lock:
+            hooks = list(self.wait_hooks)
+            hooks.remove(hook)
+            self.wait_hooks = tuple(hooks)
+
+    def lock_wait(self, name: str, channel: int, start_ns: int, end_ns: int, acquired: bool) -> None:
+        """ Lock observer of the ``CallGate``, hands the wait to the wait hooks """
+        for hook in self.wait_hooks:
+            try:
+                hook(name, channel, start_ns, end_ns, acquired)
+            except Exception:
+                _log.exception(f'Wait hook {hook!r} failed')
+
+    def wrap(self, name: str, proc):
+        """ Returns ``proc`` counting its calls as ``name``, ``proc`` itself for unknown names """
+        i = self.__index.get(name)
+        if i is None:
+            return proc
+        calls, errors, total, peak = self.__calls, self.__errors, self.__total, self.__max
+        latency, codes = self.__latency, self.__codes
+        buckets = i * LATENCY_BUCKETS
+        top = LATENCY_BUCKETS - 1
+        slots = i * ERROR_SLOTS
+        other = ERROR_SLOTS - 1
+        clock = time.perf_counter_ns
+        owner = self
+
+        def instrumented(*args):
+            start = clock()
+            rv = proc(*args)
+            end = clock()
+            elapsed = end - start
+            calls[i] += 1
+            total[i] += elapsed
+            if elapsed > peak[i]:
+                peak[i] = elapsed
+            bucket = elapsed.bit_length()
+            latency[buckets + (bucket if bucket < top else top)] += 1
+            if rv:
+                errors[i] += 1
+                codes[slots + (rv if 0 <= rv < other else other)] += 1
+            hooks = owner.hooks
+            if hooks:
+                for hook in hooks:
+                    try:
+                        hook(name, args, start, end, rv)
+                    except Exception:
+                        _log.exception(f'Trace hook {hook!r} failed')
+            return rv
+        instrumented.__name__ = name
+        return instrumented
+
+    def snapshot(self) -> dict[str, CallStats]:
+        """ Returns a copy of the counters of every entry point called so far """
+        stats = {}
+        for proc, i in self.__index.items():
+            calls = self.__calls[i]
+            if not calls:
+                continue
+            codes = collections.Counter()
+            for code, count in enumerate(self.__codes[i * ERROR_SLOTS:(i + 1) * ERROR_SLOTS]):
+                if count:
+                    # unnamed codes and the overflow slot share one entry
+                    codes[ERROR_NAMES.get(code, 'other') if code < ERROR_SLOTS - 1 else 'other'] += count
+            stats[proc] = CallStats(
+                calls, self.__errors[i], self.__total[i], self.__max[i],
+                self.__latency[i * LATENCY_BUCKETS:(i + 1) * LATENCY_BUCKETS].tolist(), dict(codes))
+        return stats
+
+    def reset(self) -> None:
+        """ Zero all counters """
+        for counters in (self.__calls, self.__errors, self.__total, self.__max, self.__latency, self.__codes):
+            counters[:] = array.array('Q', bytes(8 * len(counters)))
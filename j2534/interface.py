@@ -2,21 +2,28 @@
 # -*- coding: utf-8 -*-
 
 from .errors import PassThruInterfaceException, PassThruApiNotSupportedException, PassThruApiConcurrentCallException
-from .enums import ErrorCode, ProtocolId
-from .vector import VectorPassThruXLLibrary
-from .intrepid import IntrepidCsPassthruLibrary
-from .structs import SDEVICE, PASSTHRU_MSG4, PASSTHRU_MSG5
+from .enums import ErrorCode, IoctlId, ProtocolId, SelectType
+from .library import SharedLibrary
+from .structs import SDEVICE, SCHANNELSET, SCONFIG, SCONFIG_LIST, PASSTHRU_MSG4, PASSTHRU_MSG5
+from .buffer import MessagePool, MessageBatch, ReadResult, READ_STATUS_OK, pack_msg4
 from .filter import BlockFilter, PassFilter, FlowCtrlFilter, Filter
 from .protocols import Protocol
+from .concurrency import CallGate, GuardedLibrary
+from .instrument import Instrumentation
+from .timeline import Timeline
 
 from . import api
 from . import util
 from . import connection
 
 import functools
+import inspect
 import ctypes
 import logging
+import os
 import contextlib
+import threading
+import time
 
 
 @util.setup_logging
@@ -25,29 +32,20 @@ class PassThru(object):
     def api_required(api: str):
         """ Decorator to specify that the J2534 API is implemented in the DLL by the manufacturer
 
+        The check is resolved once by ``PassThru.__init__``; methods whose API is missing from the DLL
+        are replaced on the instance by a stub raising ``PassThruApiNotSupportedException``.
+
         Args:
             api (str): Name of the API Function
         """
         def _api_required(func):
-            """Internal decorator that takes the argument and returns a decorator for our decorator
-            
+            """Internal decorator that takes the argument and marks the function with it
+
             Args:
                 func: the wrapped function 
             """
-            @functools.wraps(func)
-            def wrapper(self, *args, **kwargs):
-                """ Wrapper function to check if the required API is available in the DLL
-
-                Args:
-                    self (PassThru): the ``PassThru`` instance
-                    args: list of arguments passed to the wrapper
-                    kwargs: list of key-word arguments passed to the wrapper
-                """
-                if not hasattr(self.__dll, api):
-                    raise PassThruApiNotSupportedException(
-                        f'{api} is not supported by {self.dll}')
-                return func(self, *args, **kwargs)
-            return wrapper
+            func.__j2534_api__ = api
+            return func
         return _api_required
 
     def open_required(func):
@@ -72,30 +70,17 @@ class PassThru(object):
         return wrapper
 
     def ver_required(version: str):
+        """ Decorator to specify the API version(s) a method is available in
+
+        The check is resolved once by ``PassThru.__init__``; methods not available in ``apiversion``
+        are replaced on the instance by a stub raising ``PassThruInterfaceException``.
+
+        Args:
+            version (str): ``major.minor`` for an exact version, ``major.minor+`` for a minimum version
+        """
         def _ver_required(func):
-            @functools.wraps(func)
-            def wrapper(self, *args, **kwargs):
-                """
-                """
-                exact = not version.endswith('+')
-
-                major = int(version.split('.')[0])
-                minor = int(version.split('.')[
-                            1] if exact else version.split('.')[1][:-1])
-                usingmajor = int(self.apiversion.split('.')[0])
-                usingminor = int(self.apiversion.split('.')[1])
-
-                if exact and ((usingmajor != major) or (usingminor != minor)):
-                    raise PassThruInterfaceException(
-                        f'API call requires version {version} (using version {self.apiversion})')
-                elif not exact and (usingmajor < major):
-                    raise PassThruInterfaceException(
-                        f'API call requires version {version} (using version {self.apiversion})')
-                elif not exact and ((usingmajor == major) and (usingminor < minor)):
-                    raise PassThruInterfaceException(
-                        f'API call requires version {version} (using version {self.apiversion})')
-                return func(self, *args, **kwargs)
-            return wrapper
+            func.__j2534_version__ = version
+            return func
         return _ver_required
 
     def handle_dllreturn(func):
@@ -107,35 +92,120 @@ class PassThru(object):
             return rv
         return wrapper
 
-    def __init__(self, lib: str, **kwargs):
-        """
+    def __init__(self, lib: type | str, **kwargs):
+        """ Load the PassThru library and set up the prototypes for the API version
+
+        Args:
+            lib (type | str): the library class (``SharedLibrary`` and its vendor subclasses,
+                ``SimulatedPassThruLibrary``) or the path of any PassThru shared library
+
+        Keyword Args:
+            loglevel (int): logging level for the logger instance
+            apiversion (str): version of the PassThru API
+            rxdepth (int): number of receive arrays kept per channel by ``read``
+            txchunk (int): maximum number of messages passed to a single ``PassThruWriteMsgs`` call
+            lock_timeout (float): seconds to wait for a busy device/ channel before raising
+                ``PassThruApiConcurrentCallException``, negative waits forever
+            timeline (bool): unwrap the timestamps of received messages and correlate them with the host
+                clock (default ``True``)
+            instrument (bool | Instrumentation): count calls, latencies and error codes of every DLL entry
+                point, optionally into a shared ``Instrumentation`` (default ``False``)
         """
         self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
         self.apiversion = kwargs.get('apiversion', api.V4)
         # DLLs return weird error codes/ string when API is called without ``open``
         self.__open_refs = 0
+        self.__open_lock = threading.Lock()
 
-        if lib is VectorPassThruXLLibrary:
-            self.__lib = VectorPassThruXLLibrary(**kwargs)
-        elif lib is IntrepidCsPassthruLibrary:
-            self.__lib = IntrepidCsPassthruLibrary(**kwargs)
+        if isinstance(lib, (str, os.PathLike)):
+            self.__lib = SharedLibrary(**dict(kwargs, dll=os.fspath(lib)))
+        elif isinstance(lib, type) and hasattr(lib, 'dll'):
+            self.__lib = lib(**kwargs)
         else:
             raise PassThruInterfaceException(f'{lib} is not supported')
 
-        self.__dll = self.__lib.dll
-
-        # setup prototypes for all PassThru procedures supported by the DLL
+        dll = self.__lib.dll
+        # preallocated receive arrays, reused across ``read`` calls
+        self.__rxpool = MessagePool(PASSTHRU_MSG5 if self.apiversion == api.V5 else PASSTHRU_MSG4,
+                                    kwargs.get('rxdepth', 2))
+        # transmit arrays are packed and sent synchronously, one per channel is enough
+        self.__txpool = MessagePool(PASSTHRU_MSG4, 1)
+        self.__txchunk = kwargs.get('txchunk', 256)
+        # protocol id of every connected channel, used for packing raw payloads
+        self.__channels = {}
+        # known configuration parameter values of every channel, see ``get_config``/ ``set_config``
+        self.__config = {}
+        # device timeline of every connected channel, shared by the channels of a device
+        self.__timelines = {}
+        self.__device_timelines = {} if kwargs.get('timeline', True) else None
+
+        # setup prototypes for all PassThru procedures supported by the DLL, unless the library did
+        prototyped = getattr(self.__lib, 'PROTOTYPED', False)
         for proc, args, res in api.get_defs_for_version(self.apiversion):
-            if hasattr(self.__dll, proc):
-                self.__dll[proc].argtypes = args
-                self.__dll[proc].restype = res
-            self.__log.debug(
-                f'{proc[8:]}: {"Available" if hasattr(self.__dll, proc) else "Not supported" }')
+            if hasattr(dll, proc) and not prototyped:
+                # ``dll[proc]`` builds a new function pointer each time, the attribute is the cached one
+                func = getattr(dll, proc)
+                func.argtypes = args
+                func.restype = res
+            if self.__log.isEnabledFor(logging.DEBUG):
+                self.__log.debug(
+                    f'{proc[8:]}: {"Available" if hasattr(dll, proc) else "Not supported" }')
+
+        # serialize calls per device, or per channel if the library allows concurrent channels
+        instrument = kwargs.get('instrument', False)
+        self.__instrumentation = Instrumentation() if instrument is True else instrument or None
+        self.__gate = CallGate(getattr(self.__lib, 'CONCURRENT_CHANNELS', False), kwargs.get('lock_timeout', -1),
+                               self.__instrumentation)
+        self.__dll = GuardedLibrary(dll, self.__gate, self.__instrumentation)
+        self.__bind()
+
+    def __bind(self) -> None:
+        """ Resolve the ``api_required``/ ``ver_required`` checks of every method once
+
+        Supported methods are bound onto the instance so calls skip the class lookup; unsupported ones
+        are replaced by stubs that raise immediately.
+        """
+        for name, func in inspect.getmembers(type(self), inspect.isfunction):
+            proc = getattr(func, '__j2534_api__', None)
+            version = getattr(func, '__j2534_version__', None)
+            if proc is None and version is None:
+                continue
+            if version is not None and not api.version_satisfies(self.apiversion, version):
+                setattr(self, name, self.__stub(
+                    PassThruInterfaceException,
+                    f'API call requires version {version} (using version {self.apiversion})'))
+            elif proc is not None and not hasattr(self.__dll, proc):
+                setattr(self, name, self.__stub(
+                    PassThruApiNotSupportedException, f'{proc} is not supported by {self.dll}'))
+            else:
+                setattr(self, name, getattr(self, name))
+
+    @staticmethod
+    def __stub(exception: type, message: str):
+        """ Returns a function raising ``exception(message)`` for unsupported methods """
+        def stub(*args, **kwargs):
+            raise exception(message)
+        return stub
 
     @property
     def dll(self):
         return self.__lib.name
 
+    @property
+    def instrumentation(self) -> Instrumentation | None:
+        """ Returns the call counters and trace hooks, ``None`` unless created with ``instrument`` """
+        return self.__instrumentation
+
+    @property
+    def concurrent_channels(self) -> bool:
+        """ Returns ``True`` if calls on different channels of a device may run concurrently """
+        return self.__gate.concurrent_channels
+
+    @property
+    def lock_stats(self) -> dict:
+        """ Returns the wait-time metrics of the call serialization locks keyed by ``'device'`` or channel id """
+        return self.__gate.stats()
+
     @api_required('PassThruScanForDevices')
     @ver_required('5.0+')
     def scanfordevices(self) -> int:
@@ -151,7 +221,8 @@ class PassThru(object):
         p_device_count = ctypes.pointer(device_count)
 
         rv = self.__dll.PassThruScanForDevices(p_device_count)
-        self.__log.debug(f'PassThruScanForDevices: {ErrorCode.to_string(rv)}')
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'PassThruScanForDevices: {ErrorCode.to_string(rv)}')
 
         return rv, device_count.value
 
@@ -171,7 +242,8 @@ class PassThru(object):
         p_sdevice = ctypes.pointer(sdevice)
 
         rv = self.__dll.PassThruGetNextDevice(p_sdevice)
-        self.__log.debug(f'PassThruGetNextDevice: {ErrorCode.to_string(rv)}')
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'PassThruGetNextDevice: {ErrorCode.to_string(rv)}')
 
         return rv, str(sdevice)
 
@@ -196,10 +268,13 @@ class PassThru(object):
         p_device_id = ctypes.pointer(device_id)
 
         rv = self.__dll.PassThruOpen(p_name, p_device_id)
-        self.__log.debug(
-            f'Open {name} ID: 0x{device_id.value:08x} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(
+                f'Open {name} ID: 0x{device_id.value:08x} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
 
-        self.__open_refs += 1 if rv == ErrorCode.Status_NoError else 0
+        if rv == ErrorCode.Status_NoError:
+            with self.__open_lock:
+                self.__open_refs += 1
         return rv, device_id.value
 
     @api_required('PassThruClose')
@@ -218,12 +293,15 @@ class PassThru(object):
         Raises:
             PassThruInterfaceException: if the DLL returns an error code, or the instance has no device open
         """
-        p_device_id = ctypes.pointer(ctypes.c_ulong(device_id))
-        rv = self.__dll.PassThruClose(p_device_id)
-        self.__log.debug(f'Close ID: 0x{p_device_id[0]:08x} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
-
-        self.__open_refs -= 1
-        return rv,
+        rv = self.__dll.PassThruClose(device_id)
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'Close ID: 0x{device_id:08x} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
+
+        with self.__open_lock:
+            self.__open_refs -= 1
+        if self.__device_timelines is not None:
+            self.__device_timelines.pop(device_id, None)
+        return rv, None
 
     @api_required('PassThruConnect')
     @open_required
@@ -254,14 +332,23 @@ class PassThru(object):
             # resource =
             raise NotImplementedError("APIV5 connect call")
         elif self.apiversion == api.V4:
-            self.__log.debug(f'{device_id.value} {protocol_id.value} {flags.value} {baudrate.value}')
+            if self.__log.isEnabledFor(logging.DEBUG):
+                self.__log.debug(f'{device_id.value} {protocol_id.value} {flags.value} {baudrate.value}')
             rv = self.__dll.PassThruConnect(
                 device_id, protocol_id, flags, baudrate, p_channel_id)
         else:
             raise NotImplementedError(
                 f'PassThruConnect is not implemented in api.v{self.apiversion}')
 
-        self.__log.debug(f'Connect: Channel 0x{p_channel_id[0]:08x} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'Connect: Channel 0x{p_channel_id[0]:08x} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
+        if rv == ErrorCode.Status_NoError:
+            self.__channels[p_channel_id[0]] = protocol_id.value
+            self.__config[p_channel_id[0]] = {}
+            self.__gate.add_channel(p_channel_id[0])
+            if self.__device_timelines is not None:
+                timeline = self.__device_timelines.setdefault(device_id.value, Timeline())
+                self.__timelines[p_channel_id[0]] = timeline
         return rv, p_channel_id[0]
 
     @api_required('PassThruDisconnect')
@@ -270,10 +357,16 @@ class PassThru(object):
     def disconnect(self, channel: int) -> None:
         """
         """
-        channel = ctypes.c_ulong(channel)
-        rv = self.__dll.PassThruDisconnect(channel)
-        self.__log.debug(f'Disconnect: Channel 0x{channel:08x} RC[0x]')
-
+        rv = self.__dll.PassThruDisconnect(ctypes.c_ulong(channel))
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'Disconnect: Channel 0x{channel:08x} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
+
+        self.__rxpool.release(channel)
+        self.__txpool.release(channel)
+        self.__channels.pop(channel, None)
+        self.__timelines.pop(channel, None)
+        self.__config.pop(channel, None)
+        self.__gate.remove_channel(channel)
         return rv, None
 
     @api_required('PassThruLogicalConnect')
@@ -287,42 +380,263 @@ class PassThru(object):
         pass
 
     @api_required('PassThruSelect')
-    def select():
-        pass
+    @ver_required('5.0+')
+    @open_required
+    def select(self, channels, timeout: int = 0, threshold: int = 1) -> list[int]:
+        """ Wait until messages are available on ``threshold`` of the designated channels
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channels: the channel ids returned by the ``PassThru.connect`` call
+            timeout (int): maximum wait in milliseconds
+            threshold (int): number of channels that must have messages, 0 returns immediately
+
+        Returns:
+            the channels with messages available, empty if the timeout expired first
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns any other error code, or no device is open
+        """
+        channels = list(channels)
+        ids = (ctypes.c_ulong * len(channels))(*channels)
+        channel_set = SCHANNELSET(ChannelCount=len(channels), ChannelThreshold=threshold, ChannelList=ids)
+        rv = self.__dll.PassThruSelect(ctypes.byref(channel_set), SelectType.READABLE_TYPE, timeout)
+        if rv == ErrorCode.Err_Timeout:
+            return []
+        if rv != ErrorCode.Status_NoError:
+            raise PassThruInterfaceException(rv)
+        # the DLL rewrites the set to the channels with messages
+        return ids[:channel_set.ChannelCount]
 
     @api_required('PassThruReadMsgs')
     @open_required
     @handle_dllreturn
-    def read(self, channel, msgs, timeout) -> dict:
+    def read(self, channel: int, msgs: int, timeout: int, batch: MessageBatch = None) -> MessageBatch:
         """ Read messages and Indications (special messages generated to report specific events) from the 
         designated channel
+
+        The messages are read into a preallocated per-channel array and returned as a ``MessageBatch``
+        view; the batch is overwritten once the channel's pool ring wraps around (see ``rxdepth``).
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+            msgs (int): maximum number of messages to read
+            timeout (int): read timeout in milliseconds
+            batch (MessageBatch): caller-owned batch to read into instead of the channel's pool ring
+
+        Returns:
+            a ``MessageBatch`` over the messages read
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns an error code, or no device is open
+            ValueError: if ``batch`` holds fewer than ``msgs`` messages
         """
-        channel = ctypes.c_ulong(channel)
-        if self.apiversion == api.V5:
-            msgs = (PASSTHRU_MSG5*msgs)()
-        else:
-            msgs = (PASSTHRU_MSG4*msgs)()
-        p_msgsread = ctypes.pointer(ctypes.c_ulong(0))
-        timeout = ctypes.c_ulong(timeout)
-        print(ctypes.pointer(msgs))
-        rv = self.__dll.PassThruReadMsgs(channel, msgs, p_msgsread)
-        return rv, None
+        if batch is None:
+            batch = self.__rxpool.batch(channel, msgs)
+        elif len(batch.array) < msgs:
+            # the DLL would write past the end of the array
+            raise ValueError(f'Batch holds {len(batch.array)} messages, {msgs} requested')
+        msgsread = ctypes.c_ulong(msgs)
+        rv = self.__dll.PassThruReadMsgs(channel, batch.array, ctypes.byref(msgsread), timeout)
+        batch.count = msgsread.value
+        self.__stamp(channel, batch)
+        return rv, batch
+
+    @api_required('PassThruReadMsgs')
+    @open_required
+    def poll(self, channel: int, msgs: int, timeout: int = 0, batch: MessageBatch = None) -> ReadResult:
+        """ Read messages like ``PassThru.read`` without raising for the normal outcomes of polling
+
+        ``Err_BufferEmpty``, ``Err_Timeout`` and ``Err_BufferOverflow`` are reported through the result
+        together with any messages the DLL managed to read; only real faults raise.
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+            msgs (int): maximum number of messages to read
+            timeout (int): read timeout in milliseconds
+            batch (MessageBatch): caller-owned batch to read into instead of the channel's pool ring
+
+        Returns:
+            a ``ReadResult`` with the status code, message count and messages
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns any other error code, or no device is open
+            ValueError: if ``batch`` holds fewer than ``msgs`` messages
+        """
+        if batch is None:
+            batch = self.__rxpool.batch(channel, msgs)
+        elif len(batch.array) < msgs:
+            # the DLL would write past the end of the array
+            raise ValueError(f'Batch holds {len(batch.array)} messages, {msgs} requested')
+        msgsread = ctypes.c_ulong(msgs)
+        rv = self.__dll.PassThruReadMsgs(channel, batch.array, ctypes.byref(msgsread), timeout)
+        if rv not in READ_STATUS_OK:
+            raise PassThruInterfaceException(rv)
+        batch.count = msgsread.value
+        self.__stamp(channel, batch)
+        return ReadResult(rv, batch)
+
+    def __stamp(self, channel: int, batch: MessageBatch) -> None:
+        """ Anchor ``batch`` on the device timeline with its newest message (one sample per read) """
+        timeline = self.__timelines.get(channel)
+        if timeline is None or not batch.count:
+            batch.anchor = None
+            return
+        batch.timeline = timeline
+        batch.anchor = timeline.observe(batch.array[batch.count - 1].Timestamp, time.monotonic_ns())
+
+    def timeline(self, channel: int) -> Timeline | None:
+        """ Returns the ``Timeline`` of the device owning ``channel``
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+
+        Returns:
+            the timeline, ``None`` for unknown channels or if timelines are disabled
+        """
+        return self.__timelines.get(channel)
 
     @api_required('PassThruWriteMsgs')
-    def write(self, channel, msgs, timeout):
-        pass
+    @ver_required('4.4')
+    @open_required
+    def write(self, channel: int, msgs, timeout: int = 0, ids=None, txflags: int = 0, protocol: int = None) -> int:
+        """ Send messages on the designated channel using as few ``PassThruWriteMsgs`` calls as possible
+
+        The messages are packed into one contiguous pooled ``PASSTHRU_MSG4`` array of up to ``txchunk``
+        messages per call. When the DLL accepts fewer messages than requested the rest is resubmitted.
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+            msgs: iterable of bytes-like payloads or ``connection.Message`` objects
+            timeout (int): write timeout in milliseconds for each ``PassThruWriteMsgs`` call
+            ids: iterable of CAN IDs parallel to ``msgs``; each payload is then prefixed with its 4 byte ID,
+                both are materialized to check their lengths
+            txflags (int): ``TxFlags`` for raw payloads
+            protocol (int): ``ProtocolID`` for raw payloads, defaults to the protocol of the channel
+
+        Returns:
+            the number of messages sent
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns an error code or stops accepting messages,
+            or no device is open
+            ValueError: if ``ids`` and ``msgs`` differ in length
+        """
+        if protocol is None:
+            protocol = self.__channels.get(channel)
+            if protocol is None:
+                raise PassThruInterfaceException(f'Protocol of channel {channel} is unknown, pass ``protocol``')
+        if ids is not None:
+            ids, msgs = list(ids), list(msgs)
+            if len(ids) != len(msgs):
+                raise ValueError(f'Got {len(ids)} ids for {len(msgs)} messages')
+            msgs = (id.to_bytes(4, 'big') + payload for id, payload in zip(ids, msgs))
+
+        msgs = iter(msgs)
+        chunk = self.__txchunk
+        sent = 0
+        # the channel's transmit array is shared, hold the channel for the whole write
+        with self.__gate.hold(channel, 'write'):
+            while True:
+                slot = self.__txpool.acquire(channel, chunk)
+                count = pack_msg4(slot, msgs, chunk, protocol, txflags)
+                if count == 0:
+                    break
+                sent += self.__writemsgs(channel, slot.array, count, timeout)
+                if count < chunk:
+                    break
+        return sent
+
+    def __writemsgs(self, channel: int, array: ctypes.Array, count: int, timeout: int) -> int:
+        """ Submit ``count`` packed messages, resubmitting the remainder after partial sends
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id
+            array (ctypes.Array): packed ``PASSTHRU_MSG4`` array
+            count (int): number of messages in ``array``
+            timeout (int): write timeout in milliseconds
+
+        Returns:
+            ``count``
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns an error or sends nothing at all
+        """
+        done = 0
+        nummsgs = ctypes.c_ulong(0)
+        while done < count:
+            nummsgs.value = count - done
+            rv = self.__dll.PassThruWriteMsgs(channel, ctypes.byref(array[done]), ctypes.byref(nummsgs), timeout)
+            if rv not in (ErrorCode.Status_NoError, ErrorCode.Err_Timeout, ErrorCode.Err_BufferFull):
+                raise PassThruInterfaceException(rv)
+            if nummsgs.value == 0:
+                raise PassThruInterfaceException(rv if rv != ErrorCode.Status_NoError else ErrorCode.Err_Timeout)
+            done += nummsgs.value
+        return done
 
     @api_required('PassThruQueueMsgs')
     def queue_msgs():
         pass
 
     @api_required('PassThruStartPeriodicMsg')
-    def start_periodic_msg():
-        pass
+    @ver_required('4.4')
+    @open_required
+    @handle_dllreturn
+    def start_periodic_msg(self, channel: int, data, interval: int, txflags: int = 0, protocol: int = None) -> int:
+        """ Have the device transmit a message every ``interval`` milliseconds on the designated channel
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+            data: bytes-like message data (starting with the CAN ID for CAN based protocols)
+            interval (int): repetition interval in milliseconds (5 - 65535)
+            txflags (int): ``TxFlags`` of the message
+            protocol (int): ``ProtocolID`` of the message, defaults to the protocol of the channel
+
+        Returns:
+            the message id for ``PassThru.stop_periodic_msg``
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns an error code (``Err_ExceededLimit`` when all
+            periodic slots are in use) or no device is open
+        """
+        if protocol is None:
+            protocol = self.__channels.get(channel)
+            if protocol is None:
+                raise PassThruInterfaceException(f'Protocol of channel {channel} is unknown, pass ``protocol``')
+        data = bytes(data)
+        msg = PASSTHRU_MSG4(ProtocolID=protocol, TxFlags=txflags, DataSize=len(data), ExtraDataIndex=len(data))
+        ctypes.memmove(msg.Data, data, len(data))
+        msg_id = ctypes.c_ulong(0)
+        rv = self.__dll.PassThruStartPeriodicMsg(channel, ctypes.byref(msg), ctypes.byref(msg_id), interval)
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'StartPeriodicMsg: Channel {channel} ID: {msg_id.value} {interval} ms '
+                             f'RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
+        return rv, msg_id.value
 
     @api_required('PassThruStopPeriodicMsg')
-    def stop_periodic_msg():
-        pass
+    @open_required
+    @handle_dllreturn
+    def stop_periodic_msg(self, channel: int, msg_id: int) -> None:
+        """ Stop the periodic message ``msg_id`` of the designated channel
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+            msg_id (int): the message id returned by ``PassThru.start_periodic_msg``
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns an error code or no device is open
+        """
+        rv = self.__dll.PassThruStopPeriodicMsg(channel, msg_id)
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'StopPeriodicMsg: Channel {channel} ID: {msg_id} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
+        return rv, None
 
     @api_required('PassThruStartMsgFilter')
     @ver_required('4.4')
@@ -337,7 +651,7 @@ class PassThru(object):
         Args:
             self (PassThru): the ``PassThru`` instance
             channel (int): the channel id returned by the ``PassThru.connect`` call
-            type (int): the filter type value from ``j2534.enums.FilterType``
+            filter (Filter): the filter; its compiled messages are reused across calls
 
         Returns:
             the filter id for future calls
@@ -345,20 +659,55 @@ class PassThru(object):
         Raises:
             PassTHruInterfaceException: if the DLL returns an error code or no device is open
         """
-        channel = ctypes.c_ulong(channel)
-        type = ctypes.c_ulong(filter.type)
-        p_filter_id = ctypes.pointer(ctypes.c_ulong(0))
-        mask_msg, pattern_msg, fc_msg = filter.msg4
-        self.__log.debug(f'Mask:{mask_msg}')
-        self.__log.debug(f'Pttn:{pattern_msg}')
-        self.__log.debug(f'FCtl:{fc_msg}')
-        p_mask_msg = ctypes.pointer(mask_msg)
-        p_pattern_msg = ctypes.pointer(pattern_msg)
-        p_fc_msg = ctypes.pointer(fc_msg)
-
-        rv = self.__dll.PassThruStartMsgFilter(channel, type, p_mask_msg, p_pattern_msg, p_fc_msg, p_filter_id)
-        self.__log.debug(f'SetFilter: ID: {p_filter_id[0]} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
-        return rv, p_filter_id[0]
+        filter_id = ctypes.c_ulong(0)
+        rv = self.__start_filter(channel, filter, filter_id)
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'SetFilter: ID: {filter_id.value} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
+        return rv, filter_id.value
+
+    @api_required('PassThruStartMsgFilter')
+    @ver_required('4.4')
+    @open_required
+    def set_filters(self, channel: int, filters) -> list[int]:
+        """ Install several filters on the designated channel, holding the channel for the whole set
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+            filters: iterable of ``Filter`` objects
+
+        Returns:
+            the filter ids in the order of ``filters``
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns an error code (the filters installed before the
+            failing one stay installed) or no device is open
+        """
+        ids = []
+        filter_id = ctypes.c_ulong(0)
+        with self.__gate.hold(channel, 'set_filters'):
+            for filter in filters:
+                rv = self.__start_filter(channel, filter, filter_id)
+                if rv != ErrorCode.Status_NoError:
+                    raise PassThruInterfaceException(rv)
+                ids.append(filter_id.value)
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'SetFilters: IDs: {ids}')
+        return ids
+
+    def __start_filter(self, channel: int, filter: Filter, filter_id: ctypes.c_ulong) -> int:
+        """ Call ``PassThruStartMsgFilter`` with the cached messages of ``filter``
+
+        Returns:
+            the DLL return code, the id is stored in ``filter_id``
+        """
+        mask_msg, pattern_msg, fc_msg = filter._cached_msg4()
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'StartMsgFilter: Channel {channel} {filter!r}')
+        return self.__dll.PassThruStartMsgFilter(channel, filter.type, ctypes.byref(mask_msg),
+                                                 ctypes.byref(pattern_msg),
+                                                 None if fc_msg is None else ctypes.byref(fc_msg),
+                                                 ctypes.byref(filter_id))
 
     @api_required('PassThruStartMsgFilter')
     @ver_required('5.0+')
@@ -368,8 +717,23 @@ class PassThru(object):
         pass
 
     @api_required('PassThruStopMsgFilter')
-    def stop_msg_filter():
-        pass
+    @open_required
+    @handle_dllreturn
+    def stop_msg_filter(self, channel: int, filter_id: int) -> None:
+        """ Remove the filter ``filter_id`` from the message evaluation process of the designated channel
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+            filter_id (int): the filter id returned by ``PassThru.set_filter``
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns an error code or no device is open
+        """
+        rv = self.__dll.PassThruStopMsgFilter(channel, filter_id)
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'StopMsgFilter: Channel {channel} ID: {filter_id} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
+        return rv, None
 
     @api_required('PassThruSetProgrammingVoltage')
     def setprogrammingvoltage():
@@ -397,7 +761,8 @@ class PassThru(object):
 
         rv = self.__dll.PassThruReadVersion(
             device_id, firmware_version, dll_version, api_version)
-        self.__log.debug(f'PassThruReadVersion: {ErrorCode.to_string(rv)}')
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'PassThruReadVersion: {ErrorCode.to_string(rv)}')
 
         if rv != ErrorCode.Status_NoError:
             raise PassThruInterfaceException(rv)
@@ -419,11 +784,106 @@ class PassThru(object):
         """
         err_desc = ctypes.create_string_buffer(80)
         rv = self.__dll.PassThruGetLastError(err_desc)
-        self.__log.debug(f'PassThruGetLastError: {ErrorCode.to_string(rv)}')
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'PassThruGetLastError: {ErrorCode.to_string(rv)}')
         if rv != ErrorCode.Status_NoError:
             raise PassThruInterfaceException(rv)
         return err_desc.value.decode('ascii')
 
     @api_required('PassThruIoctl')
-    def ioctl():
-        pass
+    @open_required
+    @handle_dllreturn
+    def ioctl(self, channel: int, ioctl_id: int, input=None, output=None) -> None:
+        """ Perform the I/O control ``ioctl_id`` on the designated channel or device
+
+        A ``SET_CONFIG`` passed through here drops the configuration cache of the channel, use
+        ``PassThru.set_config`` to keep it.
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call (the device id for
+                device ioctls like ``READ_PIN_VOLTAGE``)
+            ioctl_id (int): the ``IoctlId``
+            input: ``ctypes`` object passed by reference as ``pInput``, ``None`` for a null pointer
+            output: ``ctypes`` object passed by reference as ``pOutput``, ``None`` for a null pointer
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns an error code or no device is open
+        """
+        if ioctl_id == IoctlId.SET_CONFIG:
+            self.__config.pop(channel, None)
+        return self.__ioctl(channel, ioctl_id, input, output), None
+
+    def __ioctl(self, channel: int, ioctl_id: int, input, output) -> int:
+        rv = self.__dll.PassThruIoctl(channel, ioctl_id, None if input is None else ctypes.byref(input),
+                                      None if output is None else ctypes.byref(output))
+        if self.__log.isEnabledFor(logging.DEBUG):
+            self.__log.debug(f'Ioctl: Channel {channel} ID: 0x{ioctl_id:02x} RC<0x{rv:02x}>:{ErrorCode.to_string(rv)}')
+        return rv
+
+    @api_required('PassThruIoctl')
+    @open_required
+    def get_config(self, channel: int, params, refresh: bool = False) -> dict[int, int]:
+        """ Read configuration parameters of the designated channel
+
+        Values read before are answered from the channel's configuration cache, all others are read with a
+        single ``GET_CONFIG``. The cache is dropped by ``connect``/ ``disconnect``.
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+            params: the ``ConfigParams`` to read
+            refresh (bool): read every parameter from the device
+
+        Returns:
+            ``{parameter: value}`` in the order of ``params``
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns an error code or no device is open
+        """
+        params = list(params)
+        with self.__gate.hold(channel, 'get_config'):
+            cache = self.__config.setdefault(channel, {})
+            missing = list(dict.fromkeys(param for param in params if refresh or param not in cache))
+            if missing:
+                configs = (SCONFIG * len(missing))(*((param, 0) for param in missing))
+                rv = self.__ioctl(channel, IoctlId.GET_CONFIG, SCONFIG_LIST(len(missing), configs), None)
+                if rv != ErrorCode.Status_NoError:
+                    raise PassThruInterfaceException(rv)
+                cache.update((config.Parameter, config.Value) for config in configs)
+            return {param: cache[param] for param in params}
+
+    @api_required('PassThruIoctl')
+    @open_required
+    def set_config(self, channel: int, config: dict[int, int], force: bool = False) -> int:
+        """ Write configuration parameters of the designated channel
+
+        Parameters the configuration cache already holds with the same value are skipped, the others are
+        written with a single ``SET_CONFIG``.
+
+        Args:
+            self (PassThru): the ``PassThru`` instance
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+            config (dict): ``{parameter: value}`` of the ``ConfigParams`` to write
+            force (bool): write every parameter, cached or not
+
+        Returns:
+            the number of parameters written
+
+        Raises:
+            PassThruInterfaceException: if the DLL returns an error code or no device is open
+        """
+        with self.__gate.hold(channel, 'set_config'):
+            cache = self.__config.setdefault(channel, {})
+            changes = {param: value for param, value in dict(config).items() if force or cache.get(param) != value}
+            if not changes:
+                return 0
+            configs = (SCONFIG * len(changes))(*changes.items())
+            rv = self.__ioctl(channel, IoctlId.SET_CONFIG, SCONFIG_LIST(len(changes), configs), None)
+            if rv != ErrorCode.Status_NoError:
+                # the device may have taken some of the values
+                for param in changes:
+                    cache.pop(param, None)
+                raise PassThruInterfaceException(rv)
+            cache.update(changes)
+            return len(changes)
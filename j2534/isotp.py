@@ -0,0 +1,367 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" ISO-TP (ISO 15765-2) transports
+
+``IsoTpTransport`` does segmentation and flow control on the host on top of a raw ``Protocol.CAN``
+channel instead of in the device firmware, so the consecutive frames of a block go out back-to-back in a
+single batched ``PassThruWriteMsgs`` call when the receiver allows ``STmin = 0``. ``Iso15765Transport``
+offers the same ``send``/ ``recv`` interface on a ``Protocol.ISO15765`` channel, where the device segments.
+
+The channel needs a filter passing the receive identifier (a flow control filter for ISO15765 channels);
+messages of other identifiers are ignored by the transports.
+
+Available Classes:
+    IsoTpTransport: one ISO-TP connection (transmit id/ receive id pair) on a CAN channel
+    Iso15765Transport: one ISO-TP connection on an ISO15765 channel
+"""
+
+from .enums import Flags, RxStatus, TxFlags
+from .errors import IsoTpException
+from . import util
+
+import collections
+import logging
+import time
+
+# protocol control information types
+SINGLE_FRAME = 0x0
+FIRST_FRAME = 0x1
+CONSECUTIVE_FRAME = 0x2
+FLOW_CONTROL = 0x3
+
+# flow status
+CONTINUE_TO_SEND = 0x0
+WAIT = 0x1
+OVERFLOW = 0x2
+
+# largest length the 12 bit first frame length can express
+MAX_SHORT_LENGTH = 4095
+
+
+def stmin_seconds(stmin: int) -> float:
+    """ Convert an STmin byte to seconds (reserved values are treated as the maximum, 127 ms) """
+    if stmin <= 0x7F:
+        return stmin / 1000
+    if 0xF1 <= stmin <= 0xF9:
+        return (stmin - 0xF0) / 10000
+    return 0.127
+
+
+@util.setup_logging
+class IsoTpTransport(object):
+    """ ISO-TP connection between ``txid`` (sent by us) and ``rxid`` (sent by the peer)
+
+    Attributes:
+        bs: block size announced to the peer when receiving (0 = no further flow control)
+        stmin: separation time announced to the peer when receiving (STmin byte)
+        padding: byte used to pad frames to 8 bytes, ``None`` to send frames of minimal length
+    """
+
+    # the escaped first frame length is 32 bits wide
+    max_length = 0xFFFFFFFF
+
+    def __init__(self, passthru, channel: int, txid: int, rxid: int, **kwargs) -> None:
+        """ Create the transport
+
+        Args:
+            self (IsoTpTransport): the ``IsoTpTransport`` instance
+            passthru (PassThru): the ``PassThru`` instance owning the channel
+            channel (int): channel id of a connected ``Protocol.CAN`` channel
+            txid (int): CAN identifier of the frames we send
+            rxid (int): CAN identifier of the frames the peer sends
+
+        Keyword Args:
+            extended (bool): use 29 bit identifiers
+            bs (int): block size announced when receiving
+            stmin (int): STmin byte announced when receiving
+            padding (int): padding byte, ``None`` for no padding (default 0xCC)
+            timeout (int): N_Bs/ N_Cr timeout in milliseconds
+            wait_limit (int): maximum number of consecutive WAIT flow control frames accepted
+            max_block (int): longest single blocking read in milliseconds (default 2)
+            loglevel (int): logging level for the logger instance
+        """
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        self.__pt = passthru
+        self.channel = channel
+        self.txid = txid
+        self.rxid = rxid
+        self.bs = kwargs.get('bs', 0)
+        self.stmin = kwargs.get('stmin', 0)
+        self.padding = kwargs.get('padding', 0xCC)
+        self.timeout = kwargs.get('timeout', 1000)
+        self.wait_limit = kwargs.get('wait_limit', 10)
+        self.max_block = max(kwargs.get('max_block', 2), 1)
+        self.txflags = Flags.CAN_ID_29BIT if kwargs.get('extended', False) else 0
+        self.__txhdr = txid.to_bytes(4, 'big')
+        self.__pending = collections.deque()
+
+    def __frame(self, data: bytes) -> bytes:
+        """ Prefix ``data`` with the transmit identifier and pad it """
+        if self.padding is not None and len(data) < 8:
+            data = data + bytes((self.padding, )) * (8 - len(data))
+        return self.__txhdr + data
+
+    def __next_frame(self, deadline: float) -> bytes:
+        """ Returns the data bytes (without identifier) of the next frame from the peer
+
+        Raises:
+            IsoTpException: if no frame arrives before ``deadline``
+        """
+        pending = self.__pending
+        while not pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise IsoTpException(f'Timeout waiting for a frame from 0x{self.rxid:x}')
+            # drain the queue, then block for a single frame: a blocking read of several frames only
+            # returns once all of them arrived. The read holds the call lock, so it blocks for at most
+            # ``max_block`` and the loop waits out the rest
+            result = self.__pt.poll(self.channel, 64, 0)
+            if result.count == 0:
+                result = self.__pt.poll(self.channel, 1, min(max(int(remaining * 1000), 1), self.max_block))
+            batch = result.messages
+            for i in range(result.count):
+                if batch.arbid(i) == self.rxid:
+                    pending.append(bytes(batch.payload(i)[4:]))
+        return pending.popleft()
+
+    def __flow_control(self, status: int) -> None:
+        """ Send a flow control frame with our ``bs``/ ``stmin`` """
+        self.__pt.write(self.channel, [self.__frame(bytes((0x30 | status, self.bs, self.stmin)))],
+                        txflags=self.txflags)
+
+    def send(self, data, timeout: int = None) -> None:
+        """ Send ``data`` (any bytes-like object, e.g. a ``memoryview`` of an ``mmap``) to the peer
+
+        Args:
+            self (IsoTpTransport): the ``IsoTpTransport`` instance
+            data: the payload
+            timeout (int): N_Bs timeout in milliseconds, defaults to ``timeout`` of the transport
+
+        Raises:
+            IsoTpException: on flow control timeouts, overflow or too many WAIT frames
+        """
+        view = memoryview(data).cast('B')
+        length = len(view)
+        timeout = (self.timeout if timeout is None else timeout) / 1000
+
+        if length <= 7:
+            self.__pt.write(self.channel, [self.__frame(bytes((length, )) + view)], txflags=self.txflags)
+            return
+
+        if length <= MAX_SHORT_LENGTH:
+            first = bytes((0x10 | length >> 8, length & 0xFF)) + view[:6]
+            offset = 6
+        else:
+            first = b'\x10\x00' + length.to_bytes(4, 'big') + view[:2]
+            offset = 2
+        self.__pending.clear()
+        self.__pt.write(self.channel, [self.__frame(first)], txflags=self.txflags)
+
+        sn = 1
+        while offset < length:
+            bs, stmin = self.__await_clear_to_send(timeout)
+            count = -(-(length - offset) // 7)
+            if bs:
+                count = min(count, bs)
+            frames = []
+            for _ in range(count):
+                frames.append(self.__frame(bytes((0x20 | sn, )) + view[offset:offset + 7]))
+                offset += 7
+                sn = (sn + 1) & 0x0F
+            if stmin == 0:
+                # the receiver takes frames back-to-back: one PassThruWriteMsgs for the whole block
+                self.__pt.write(self.channel, frames, txflags=self.txflags)
+            else:
+                separation = stmin_seconds(stmin)
+                deadline = time.perf_counter()
+                for frame in frames:
+                    util.spin_until(deadline)
+                    self.__pt.write(self.channel, (frame, ), txflags=self.txflags)
+                    deadline = time.perf_counter() + separation
+
+    def __await_clear_to_send(self, timeout: float) -> tuple[int, int]:
+        """ Wait for a flow control frame allowing us to continue
+
+        Returns:
+            block size and STmin byte from the peer
+
+        Raises:
+            IsoTpException: on timeout, overflow or too many WAIT frames
+        """
+        waits = 0
+        while True:
+            frame = self.__next_frame(time.perf_counter() + timeout)
+            if frame[0] >> 4 != FLOW_CONTROL:
+                self.__log.debug(f'Ignoring frame {frame.hex()} while waiting for flow control')
+                continue
+            status = frame[0] & 0x0F
+            if status == CONTINUE_TO_SEND:
+                return frame[1], frame[2]
+            if status == WAIT:
+                waits += 1
+                if waits > self.wait_limit:
+                    raise IsoTpException(f'Peer 0x{self.rxid:x} sent more than {self.wait_limit} WAIT frames')
+                continue
+            if status == OVERFLOW:
+                raise IsoTpException(f'Peer 0x{self.rxid:x} reported an overflow')
+            raise IsoTpException(f'Invalid flow status {status} from 0x{self.rxid:x}')
+
+    def recv(self, timeout: int = None, into: bytearray = None) -> bytearray | memoryview:
+        """ Receive one message from the peer
+
+        Args:
+            self (IsoTpTransport): the ``IsoTpTransport`` instance
+            timeout (int): time in milliseconds to wait for the first frame, defaults to ``timeout``
+            into: writable buffer to receive into instead of a new ``bytearray``
+
+        Returns:
+            the payload (a ``memoryview`` of ``into`` if given)
+
+        Raises:
+            IsoTpException: on timeouts, sequence errors or if ``into`` is too small
+        """
+        wait = (self.timeout if timeout is None else timeout) / 1000
+        deadline = time.perf_counter() + wait
+        while True:
+            frame = self.__next_frame(deadline)
+            pci = frame[0] >> 4
+            if pci == SINGLE_FRAME:
+                length = frame[0] & 0x0F
+                if length == 0 and len(frame) > 1:
+                    length = frame[1]
+                    data = frame[2:2 + length]
+                else:
+                    data = frame[1:1 + length]
+                if into is None:
+                    return bytearray(data)
+                view = memoryview(into)
+                view[:length] = data
+                return view[:length]
+            if pci == FIRST_FRAME:
+                break
+            self.__log.debug(f'Ignoring frame {frame.hex()} while waiting for a first frame')
+
+        length = (frame[0] & 0x0F) << 8 | frame[1]
+        if length == 0:
+            length = int.from_bytes(frame[2:6], 'big')
+            data = frame[6:]
+        else:
+            data = frame[2:]
+        if into is None:
+            into = bytearray(length)
+        elif len(into) < length:
+            self.__flow_control(OVERFLOW)
+            raise IsoTpException(f'Receive buffer of {len(into)} bytes is too small for {length} bytes')
+        view = memoryview(into)
+        offset = min(len(data), length)
+        view[:offset] = data[:offset]
+
+        sn = 1
+        step = self.timeout / 1000
+        while offset < length:
+            self.__flow_control(CONTINUE_TO_SEND)
+            received = 0
+            while offset < length and (self.bs == 0 or received < self.bs):
+                frame = self.__next_frame(time.perf_counter() + step)
+                if frame[0] >> 4 != CONSECUTIVE_FRAME:
+                    raise IsoTpException(f'Expected a consecutive frame from 0x{self.rxid:x}, got {frame.hex()}')
+                if frame[0] & 0x0F != sn:
+                    raise IsoTpException(f'Wrong sequence number {frame[0] & 0x0F} (expected {sn})')
+                chunk = frame[1:1 + min(7, length - offset)]
+                view[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+                received += 1
+                sn = (sn + 1) & 0x0F
+        return view[:length] if len(into) != length else into
+
+
+@util.setup_logging
+class Iso15765Transport(object):
+    """ ISO-TP connection between ``txid`` and ``rxid`` on a ``Protocol.ISO15765`` channel
+
+    Segmentation and flow control are left to the device; ``send`` queues the message and returns, so the
+    caller can prepare the next message while the device is still transmitting.
+    """
+
+    # largest ISO-TP message a J2534 v04.04 device accepts (4099 data bytes minus the identifier)
+    max_length = 4095
+
+    def __init__(self, passthru, channel: int, txid: int, rxid: int, **kwargs) -> None:
+        """ Create the transport
+
+        Args:
+            self (Iso15765Transport): the ``Iso15765Transport`` instance
+            passthru (PassThru): the ``PassThru`` instance owning the channel
+            channel (int): channel id of a connected ``Protocol.ISO15765`` channel
+            txid (int): CAN identifier of the messages we send
+            rxid (int): CAN identifier of the messages the peer sends
+
+        Keyword Args:
+            extended (bool): use 29 bit identifiers
+            padding (bool): pad the frames to 8 bytes (``ISO15765_FRAME_PAD``, default ``True``)
+            timeout (int): receive timeout in milliseconds
+            max_block (int): longest single blocking read in milliseconds (default 2)
+            loglevel (int): logging level for the logger instance
+        """
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        self.__pt = passthru
+        self.channel = channel
+        self.txid = txid
+        self.rxid = rxid
+        self.timeout = kwargs.get('timeout', 1000)
+        self.max_block = max(kwargs.get('max_block', 2), 1)
+        self.txflags = TxFlags.CAN_29BIT_ID if kwargs.get('extended', False) else 0
+        if kwargs.get('padding', True):
+            self.txflags |= TxFlags.ISO15765_FRAME_PAD
+        self.__txhdr = txid.to_bytes(4, 'big')
+        self.__pending = collections.deque()
+
+    def send(self, data, timeout: int = 0) -> None:
+        """ Queue ``data`` for transmission to the peer
+
+        Args:
+            self (Iso15765Transport): the ``Iso15765Transport`` instance
+            data: the payload (any bytes-like object)
+            timeout (int): ``PassThruWriteMsgs`` timeout in milliseconds, 0 returns once the message is queued
+
+        Raises:
+            IsoTpException: if the payload is longer than ``max_length``
+        """
+        if len(data) > self.max_length:
+            raise IsoTpException(f'{len(data)} bytes exceed the {self.max_length} bytes of an ISO15765 message')
+        self.__pt.write(self.channel, [self.__txhdr + data], timeout or 0, txflags=self.txflags)
+
+    def recv(self, timeout: int = None) -> bytes:
+        """ Receive one message from the peer
+
+        Transmit confirmations and first frame indications are skipped.
+
+        Args:
+            self (Iso15765Transport): the ``Iso15765Transport`` instance
+            timeout (int): time in milliseconds to wait, defaults to ``timeout``
+
+        Returns:
+            the payload without the identifier
+
+        Raises:
+            IsoTpException: if no message arrives in time
+        """
+        wait = (self.timeout if timeout is None else timeout) / 1000
+        deadline = time.perf_counter() + wait
+        pending = self.__pending
+        skip = RxStatus.TX_MSG_TYPE | RxStatus.START_OF_MESSAGE | RxStatus.TX_INDICATION
+        while not pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise IsoTpException(f'Timeout waiting for a message from 0x{self.rxid:x}')
+            # blocking reads hold the call lock, wait in slices of ``max_block``
+            result = self.__pt.poll(self.channel, 16, 0)
+            if result.count == 0:
+                result = self.__pt.poll(self.channel, 1, min(max(int(remaining * 1000), 1), self.max_block))
+            batch = result.messages
+            for i in range(result.count):
+                if batch.header(i).RxStatus & skip or batch.arbid(i) != self.rxid:
+                    continue
+                pending.append(bytes(batch.payload(i)[4:]))
+        return pending.popleft()
@@ -0,0 +1,216 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Shared loading of PassThru libraries
+
+Loading a vendor DLL and setting the prototypes of every entry point costs tens of milliseconds, and
+freeing it while another ``PassThru`` still calls into it crashes the process. The ``LibraryRegistry``
+loads each library once per resolved path and API version, hands out ``LibraryHandle`` objects counting
+their users and unloads the library when the last one is released.
+
+``SharedLibrary`` is the library class for ``PassThru`` built on the registry. It loads any shared library
+by path (``PassThru('/opt/vendor/libj2534.so')`` is short for ``PassThru(SharedLibrary, dll=...)``) or
+looks the path up with ``discovery.find_library``; the vendor classes derive from it.
+
+Available Classes:
+    LibraryHandle: one loaded, prototyped library
+    LibraryRegistry: process-wide reference counted library cache
+    SharedLibrary: library class accepted by ``PassThru``
+
+Available Functions:
+    acquire: take a handle from the default registry
+    release: give a handle back to the default registry
+"""
+
+from .errors import PassThruLibraryException
+from . import api
+from . import discovery
+from . import util
+
+import _ctypes
+import ctypes
+import logging
+import os
+import sys
+import threading
+
+_log = logging.getLogger(__name__)
+
+
+def _free(dll: ctypes.CDLL) -> None:
+    """ Unload ``dll`` (the OS keeps it mapped while other loads of the same file remain) """
+    if sys.platform == 'win32':
+        _ctypes.FreeLibrary(dll._handle)
+    else:
+        _ctypes.dlclose(dll._handle)
+
+
+class LibraryHandle(object):
+    """ A loaded library with the prototypes of its API version set
+
+    Attributes:
+        path: the resolved path of the library
+        apiversion: the API version the prototypes were set for
+        dll: the ``ctypes.CDLL``, ``None`` once unloaded
+        refs: number of users holding the handle
+    """
+
+    def __init__(self, path: str, apiversion: str, dll: ctypes.CDLL) -> None:
+        self.path = path
+        self.apiversion = apiversion
+        self.dll = dll
+        self.refs = 0
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.path!r}, {self.apiversion!r}, refs={self.refs})'
+
+
+class LibraryRegistry(object):
+    """ Loads every library once per path and API version and unloads it with its last user """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__handles = {}
+
+    @staticmethod
+    def resolve(path: str) -> str:
+        """ Returns the canonical path of ``path``, bare names are left to the loader's search path """
+        if os.path.dirname(path) or os.path.exists(path):
+            return os.path.normcase(os.path.realpath(path))
+        return path
+
+    def acquire(self, path: str, apiversion: str = api.V4) -> LibraryHandle:
+        """ Returns the shared handle of the library, loading and prototyping it on first use
+
+        Args:
+            self (LibraryRegistry): the ``LibraryRegistry`` instance
+            path (str): path or name of the shared library
+            apiversion (str): version of the PassThru API
+
+        Returns:
+            the handle, release it with ``LibraryRegistry.release``
+
+        Raises:
+            PassThruLibraryException: if the library cannot be loaded
+        """
+        key = (self.resolve(path), apiversion)
+        with self.__lock:
+            handle = self.__handles.get(key)
+            if handle is None:
+                defs = api.get_defs_for_version(apiversion)
+                _log.info(f'Load: {key[0]}')
+                try:
+                    dll = ctypes.cdll.LoadLibrary(key[0])
+                except OSError as e:
+                    raise PassThruLibraryException(f'Cannot load {path}: {e}') from e
+                for proc, args, res in defs:
+                    if hasattr(dll, proc):
+                        # ``dll[proc]`` builds a new function pointer each time, the attribute is the cached one
+                        func = getattr(dll, proc)
+                        func.argtypes = args
+                        func.restype = res
+                handle = self.__handles[key] = LibraryHandle(key[0], apiversion, dll)
+            handle.refs += 1
+            return handle
+
+    def release(self, handle: LibraryHandle) -> None:
+        """ Give ``handle`` back, unloading the library if it was the last user """
+        with self.__lock:
+            if handle.refs <= 0:
+                return
+            handle.refs -= 1
+            if handle.refs == 0:
+                del self.__handles[(handle.path, handle.apiversion)]
+                _log.info(f'Unload: {handle.path}')
+                dll, handle.dll = handle.dll, None
+                _free(dll)
+
+    def loaded(self) -> dict[tuple[str, str], int]:
+        """ Returns the users of every loaded library keyed by ``(path, apiversion)`` """
+        with self.__lock:
+            return {key: handle.refs for key, handle in self.__handles.items()}
+
+
+registry = LibraryRegistry()
+
+
+def acquire(path: str, apiversion: str = api.V4) -> LibraryHandle:
+    """ See ``LibraryRegistry.acquire`` of the default registry """
+    return registry.acquire(path, apiversion)
+
+
+def release(handle: LibraryHandle) -> None:
+    """ See ``LibraryRegistry.release`` of the default registry """
+    registry.release(handle)
+
+
+@util.setup_logging
+class SharedLibrary(object):
+    """ PassThru library loaded through the library registry
+
+    Instances for the same library and API version share one load; the library is unloaded when the
+    last instance is released or destroyed.
+
+    Attributes:
+        dll: A ``ctypes.DLL`` for invoking exported functions (prototypes already set)
+        name: The name ``str`` of the loaded DLL
+        path: The path of the loaded DLL
+    """
+
+    # vendor looked up by ``discovery.find_library`` when no path is given
+    VENDOR = None
+
+    # whether calls on different channels of one device may run concurrently
+    CONCURRENT_CHANNELS = False
+
+    # the registry sets the prototypes, ``PassThru`` does not need to
+    PROTOTYPED = True
+
+    def __init__(self, **kwargs):
+        """ Create instance and acquire the library
+
+        Keyword Args:
+            loglevel (int): logging level for the logger instance
+            apiversion (str): version of the PassThru API
+            dll (str): path to the DLL, looked up for ``vendor`` if omitted
+            vendor (str): vendor or registry key prefix to look up (default ``VENDOR``)
+            concurrent_channels (bool): calls on different channels may run concurrently
+                (default ``CONCURRENT_CHANNELS``)
+        """
+        self.__handle = None
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        version = kwargs.get('apiversion', api.V4)
+        self.CONCURRENT_CHANNELS = kwargs.get('concurrent_channels', self.CONCURRENT_CHANNELS)
+        self.path = kwargs.get('dll')
+        if self.path is None:
+            vendor = kwargs.get('vendor', self.VENDOR)
+            if vendor is None:
+                raise PassThruLibraryException(f'{self.__class__.__name__} needs a dll path or vendor')
+            self.__log.info(f'Looking for installed DLLs with API version={version}')
+            self.path = discovery.find_library(version, vendor)
+        self.__handle = acquire(self.path, version)
+
+    def release(self) -> None:
+        """ Give the library back to the registry; the instance is unusable afterwards """
+        handle, self.__handle = self.__handle, None
+        if handle is not None:
+            release(handle)
+
+    @property
+    def dll(self) -> ctypes.CDLL | None:
+        """ Returns the loaded DLL which can be used to call the exported functions
+
+        Returns:
+            ``None`` if the DLL was released already
+            ``ctypes.DLL`` otherwise
+        """
+        return self.__handle.dll if self.__handle is not None else None
+
+    @property
+    def name(self) -> str:
+        """ Returns the name of the DLL loaded. """
+        return self.path.replace('\\', '/').split('/')[-1]
+
+    def __del__(self):
+        """ Release the DLL when the class instance is destroyed. """
+        self.release()
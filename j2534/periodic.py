@@ -0,0 +1,382 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Periodic transmission of any number of messages on one channel
+
+Devices only offer a few periodic message slots per channel (often ten). A ``PeriodicScheduler`` hands as
+many static messages as the device accepts to ``PassThruStartPeriodicMsg`` and sends the rest from a host
+timer wheel:
+
+* every message keeps an absolute schedule (``start + n * period``), so late ticks never shift the following
+  ones and the timing does not drift,
+* the wheel has one slot per tick (``resolution``); all messages due on a tick go out in one
+  ``PassThruWriteMsgs`` call,
+* the thread sleeps until shortly before the next occupied tick (kept in a heap, so a wake-up does not scan
+  the wheel) and spins for the rest.
+
+Messages with an ``update`` callback (rolling counters, checksums) always stay on the host: the callback
+edits ``PeriodicMessage.data`` in place right before every transmission, without any stop/ start of the
+message. ``set_payload`` replaces the data the same way; only messages running on the device need a
+stop/ start for that.
+
+Available Classes:
+    PeriodicScheduler: hybrid device/ host periodic message scheduler of one channel
+    PeriodicMessage: handle of a scheduled message
+    PeriodicStats: counters and scheduling jitter of the host timer wheel
+"""
+
+from .enums import ErrorCode
+from .errors import PassThruInterfaceException
+from . import util
+
+import dataclasses
+import heapq
+import logging
+import threading
+import time
+
+# ticks the wheel covers before messages wrap around
+WHEEL_SLOTS = 1024
+# jitter histogram buckets: bucket ``n`` counts lags of [2**(n-1), 2**n) microseconds
+JITTER_BUCKETS = 24
+# PassThruStartPeriodicMsg interval limits in milliseconds
+MIN_INTERVAL = 5
+MAX_INTERVAL = 65535
+
+
+@dataclasses.dataclass
+class PeriodicStats:
+    """ Snapshot of the ``PeriodicScheduler`` counters
+
+    Fields:
+        hardware: messages transmitted by the device
+        software: messages transmitted by the host timer wheel
+        ticks: ticks with messages due
+        writes: ``PassThruWriteMsgs`` calls
+        frames: messages written by the host
+        missed: host transmissions skipped because the scheduler fell more than a period behind
+        errors: failed writes and ``update`` callbacks
+        jitter_mean_us: mean lateness of a tick against its schedule
+        jitter_max_us: worst lateness of a tick against its schedule
+        jitter_histogram: histogram of the lateness; bucket ``n`` counts ``[2**(n-1), 2**n)`` microseconds
+    """
+    hardware: int = 0
+    software: int = 0
+    ticks: int = 0
+    writes: int = 0
+    frames: int = 0
+    missed: int = 0
+    errors: int = 0
+    jitter_mean_us: float = 0.0
+    jitter_max_us: float = 0.0
+    jitter_histogram: list[int] = dataclasses.field(default_factory=lambda: [0] * JITTER_BUCKETS)
+
+
+class PeriodicMessage(object):
+    """ Handle of a message scheduled by ``PeriodicScheduler.add``
+
+    Attributes:
+        data: the message data; ``update`` callbacks modify it in place
+        period: repetition interval in milliseconds
+        txflags: ``TxFlags`` of the message
+        update: ``update(message)`` called before every host transmission, ``None`` for static messages
+        count: host transmissions so far
+        msg_id: id of the device periodic message, ``None`` while sent by the host
+    """
+
+    __slots__ = ('data', 'period', 'txflags', 'update', 'offset', 'count', 'msg_id', 'hardware', '_next', '_due')
+
+    def __init__(self, data, period: float, txflags: int, update, offset: float) -> None:
+        self.data = bytearray(data)
+        self.period = period
+        self.txflags = txflags
+        self.update = update
+        self.offset = offset
+        self.count = 0
+        self.msg_id = None
+        # placed on the device (``msg_id`` is only set while the scheduler runs)
+        self.hardware = False
+        # next transmission in nanoseconds since the wheel epoch, and its tick
+        self._next = 0
+        self._due = None
+
+    def __repr__(self) -> str:
+        return (f'{self.__class__.__name__}(data={bytes(self.data).hex()}, period={self.period}, '
+                f'{"hardware" if self.hardware else "software"})')
+
+
+@util.setup_logging
+class PeriodicScheduler(object):
+    """ Sends periodic messages on one channel through the device slots and a host timer wheel
+
+    Attributes:
+        hardware: device periodic slots the scheduler may use (lowered if the device accepts fewer)
+        resolution: tick of the host timer wheel in milliseconds
+        timeout: timeout in milliseconds of the host writes
+    """
+
+    def __init__(self, passthru, channel: int, **kwargs) -> None:
+        """ Create the scheduler; nothing is sent before ``start``
+
+        Args:
+            self (PeriodicScheduler): the ``PeriodicScheduler`` instance
+            passthru (PassThru): the ``PassThru`` instance owning ``channel``
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+
+        Keyword Args:
+            hardware (int): device periodic slots to use, 0 to send everything from the host (default 10)
+            resolution (float): tick of the host timer wheel in milliseconds (default 1.0)
+            timeout (int): timeout in milliseconds of the host writes (default 0, queue and return)
+            loglevel (int): logging level for the logger instance
+        """
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        self.__pt = passthru
+        self.channel = channel
+        self.hardware = kwargs.get('hardware', 10)
+        self.resolution = kwargs.get('resolution', 1.0)
+        self.timeout = kwargs.get('timeout', 0)
+        self.__tick_ns = int(self.resolution * 1000000)
+        self.__lock = threading.RLock()
+        self.__cond = threading.Condition(self.__lock)
+        self.__messages = []
+        self.__wheel = [[] for _ in range(WHEEL_SLOTS)]
+        # heap of the ticks messages were inserted for, stale ones are dropped by ``__next_tick``
+        self.__due = []
+        self.__queued = set()
+        self.__epoch = 0
+        self.__tick = 0
+        self.__changed = False
+        self.__thread = None
+        self.__stopping = False
+        self.__stats = PeriodicStats()
+
+    def __enter__(self) -> 'PeriodicScheduler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        return self.__thread is not None
+
+    def add(self, data, period: float, update=None, txflags: int = 0, offset: float = 0.0,
+            hardware: bool = True) -> PeriodicMessage:
+        """ Schedule a message, on the device if it is static and a slot is free
+
+        Args:
+            self (PeriodicScheduler): the ``PeriodicScheduler`` instance
+            data: bytes-like message data (starting with the CAN ID for CAN based protocols)
+            period (float): repetition interval in milliseconds
+            update: ``update(message)`` modifying ``message.data`` in place before every transmission
+            txflags (int): ``TxFlags`` of the message
+            offset (float): delay of the first host transmission in milliseconds, to spread the load
+            hardware (bool): ``False`` to keep the message on the host
+
+        Returns:
+            the message handle
+        """
+        if period <= 0:
+            raise ValueError(f'Period must be positive, got {period}')
+        message = PeriodicMessage(data, period, txflags, update, offset)
+        with self.__lock:
+            if hardware and self.__offloadable(message) and sum(m.hardware for m in self.__messages) < self.hardware:
+                message.hardware = True
+            self.__messages.append(message)
+            if self.running:
+                self.__activate(message, time.perf_counter_ns() - self.__epoch)
+        return message
+
+    def remove(self, message: PeriodicMessage) -> None:
+        """ Stop sending ``message``
+
+        Raises:
+            ValueError: if the message is not scheduled
+        """
+        with self.__lock:
+            self.__messages.remove(message)
+            self.__deactivate(message)
+
+    def set_payload(self, message: PeriodicMessage, data) -> None:
+        """ Replace the data of ``message``, effective from its next transmission
+
+        Host messages are updated in place; device messages are stopped and started with the new data.
+        """
+        with self.__lock:
+            message.data[:] = data
+            if message.msg_id is not None:
+                self.__pt.stop_periodic_msg(self.channel, message.msg_id)
+                message.msg_id = None
+                self.__start_hardware(message)
+
+    def stats(self) -> PeriodicStats:
+        """ Returns a snapshot of the counters """
+        with self.__lock:
+            stats = dataclasses.replace(self.__stats, jitter_histogram=list(self.__stats.jitter_histogram))
+            stats.hardware = sum(m.msg_id is not None for m in self.__messages)
+            stats.software = sum(m._due is not None for m in self.__messages)
+            if stats.ticks:
+                stats.jitter_mean_us /= stats.ticks
+        return stats
+
+    def start(self) -> None:
+        """ Start the device messages and the host timer wheel """
+        with self.__lock:
+            if self.running:
+                return
+            self.__stopping = False
+            self.__epoch = time.perf_counter_ns()
+            self.__tick = 0
+            self.__due.clear()
+            self.__queued.clear()
+            for message in self.__messages:
+                self.__activate(message, 0)
+            self.__thread = threading.Thread(target=self.__run, name=f'PeriodicScheduler-{self.channel}',
+                                             daemon=True)
+            self.__thread.start()
+
+    def stop(self) -> None:
+        """ Stop all transmissions; the messages stay scheduled for the next ``start`` """
+        with self.__lock:
+            thread = self.__thread
+            if thread is None:
+                return
+            self.__stopping = True
+            self.__cond.notify_all()
+        thread.join()
+        with self.__lock:
+            self.__thread = None
+            for message in self.__messages:
+                self.__deactivate(message)
+
+    def __offloadable(self, message: PeriodicMessage) -> bool:
+        """ Static messages with an interval the device supports """
+        return (message.update is None and float(message.period).is_integer()
+                and MIN_INTERVAL <= message.period <= MAX_INTERVAL)
+
+    def __activate(self, message: PeriodicMessage, now: int) -> None:
+        """ Start ``message`` on the device or put it on the wheel, ``now`` is relative to the epoch """
+        if message.hardware and self.__start_hardware(message):
+            return
+        message._next = now + int(message.offset * 1000000)
+        self.__insert(message, max(-(-message._next // self.__tick_ns), self.__tick))
+        self.__changed = True
+        self.__cond.notify_all()
+
+    def __deactivate(self, message: PeriodicMessage) -> None:
+        if message.msg_id is not None:
+            self.__pt.stop_periodic_msg(self.channel, message.msg_id)
+            message.msg_id = None
+        elif message._due is not None:
+            self.__wheel[message._due % WHEEL_SLOTS].remove(message)
+            message._due = None
+
+    def __start_hardware(self, message: PeriodicMessage) -> bool:
+        """ Returns ``True`` if the device took ``message``, moves it to the host if it ran out of slots """
+        try:
+            message.msg_id = self.__pt.start_periodic_msg(self.channel, message.data, int(message.period),
+                                                          message.txflags)
+            return True
+        except PassThruInterfaceException as e:
+            if e.code != ErrorCode.Err_ExceededLimit:
+                raise
+        self.hardware = sum(m.msg_id is not None for m in self.__messages)
+        self.__log.warning(f'Device accepts {self.hardware} periodic messages, sending the rest from the host')
+        for other in self.__messages:
+            if other.msg_id is None:
+                other.hardware = False
+        return False
+
+    def __insert(self, message: PeriodicMessage, tick: int) -> None:
+        message._due = tick
+        self.__wheel[tick % WHEEL_SLOTS].append(message)
+        if tick not in self.__queued:
+            self.__queued.add(tick)
+            heapq.heappush(self.__due, tick)
+
+    def __next_tick(self) -> int | None:
+        """ Returns the first occupied tick from the current one on """
+        due, queued, wheel = self.__due, self.__queued, self.__wheel
+        while due:
+            tick = due[0]
+            # messages removed or fired since the tick was pushed leave it behind
+            if any(message._due == tick for message in wheel[tick % WHEEL_SLOTS]):
+                return tick
+            heapq.heappop(due)
+            queued.discard(tick)
+        return None
+
+    def __run(self) -> None:
+        """ Host timer wheel thread """
+        cond = self.__cond
+        while True:
+            with cond:
+                tick = None
+                while not self.__stopping:
+                    self.__changed = False
+                    tick = self.__next_tick()
+                    if tick is None:
+                        cond.wait()
+                        continue
+                    remaining = (self.__epoch + tick * self.__tick_ns - time.perf_counter_ns()) / 1e9
+                    if remaining <= 0.002:
+                        break
+                    # woken early by ``add``/ ``remove``/ ``stop``: look again
+                    if not cond.wait(remaining - 0.001) and not self.__changed:
+                        break
+                if self.__stopping:
+                    return
+            deadline = (self.__epoch + tick * self.__tick_ns) / 1e9
+            util.spin_until(deadline)
+            self.__fire(tick, deadline)
+
+    def __fire(self, tick: int, deadline: float) -> None:
+        """ Send the messages due on ``tick`` in as few writes as possible and reschedule them """
+        stats = self.__stats
+        batches = {}
+        with self.__lock:
+            if self.__stopping:
+                return
+            slot = self.__wheel[tick % WHEEL_SLOTS]
+            due = [message for message in slot if message._due == tick]
+            slot[:] = [message for message in slot if message._due != tick]
+            self.__tick = tick + 1
+            now = time.perf_counter_ns() - self.__epoch
+            for message in due:
+                if message.update is not None:
+                    try:
+                        message.update(message)
+                    except Exception as e:
+                        stats.errors += 1
+                        self.__log.error(f'update of {message!r} failed: {e}')
+                batches.setdefault(message.txflags, []).append(bytes(message.data))
+                message.count += 1
+                period = int(message.period * 1000000)
+                message._next += period
+                if message._next < now - period:
+                    missed = (now - message._next) // period
+                    message._next += missed * period
+                    stats.missed += missed
+                self.__insert(message, max(-(-message._next // self.__tick_ns), tick + 1))
+        if not batches:
+            return
+        lag = max(time.perf_counter() - deadline, 0.0) * 1e6
+        written = failed = 0
+        for txflags, payloads in batches.items():
+            try:
+                self.__pt.write(self.channel, payloads, self.timeout, txflags=txflags)
+            except PassThruInterfaceException as e:
+                failed += 1
+                self.__log.error(f'Periodic write of {len(payloads)} messages failed: {e}')
+                continue
+            written += len(payloads)
+        with self.__lock:
+            stats.errors += failed
+            stats.writes += len(batches) - failed
+            stats.frames += written
+            stats.ticks += 1
+            stats.jitter_mean_us += lag
+            if lag > stats.jitter_max_us:
+                stats.jitter_max_us = lag
+            stats.jitter_histogram[min(int(lag).bit_length(), JITTER_BUCKETS - 1)] += 1
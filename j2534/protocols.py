@@ -96,17 +96,17 @@ class CAN(__Protocol):
     EXTENDED_ID = 1
     STANDARD_AND_EXTENDED_ID = 2
 
-    def __init__(self, rate: int) -> None:
+    def __init__(self, rate: int, flags: int = STANDARD_ID) -> None:
         match flags:
             case CAN.STANDARD_AND_EXTENDED_ID:
-                flags = Flags.CAN_ID_BOTH
+                f = Flags.CAN_ID_BOTH
             case CAN.STANDARD_ID:
-                flags = 0
+                f = 0
             case CAN.EXTENDED_ID:
-                flags = Flags.CAN_ID_29BIT
+                f = Flags.CAN_ID_29BIT
             case _:
                 raise ValueError(f'Unknown flags value {flags}')
-        super().__init__(ProtocolId.CAN, flags, rate)
+        super().__init__(ProtocolId.CAN, f, rate)
 
 
 @set_supported_baudrates(125000, 250000, 500000)
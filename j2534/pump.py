@@ -0,0 +1,255 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Background receive pump for a single PassThru channel
+
+A ``ReceivePump`` owns the reads of one channel: a reader thread polls the channel and hands the
+batches over a bounded queue to a dispatcher thread, which calls every subscriber whose arbitration-ID
+predicate matches.
+
+The reader drains the channel with zero timeout reads. When it is empty:
+
+* libraries with concurrent channels (``PassThru.concurrent_channels``) only lock the channel, so the
+  reader blocks in ``PassThruReadMsgs`` for the next frame, up to ``timeout``,
+* on libraries serializing every call of a device a blocking read would hold the device lock for its whole
+  timeout, stalling writes and ioctls on every other channel. The reader waits ``idle_wait`` on the host
+  instead and polls again.
+
+Available Classes:
+    ReceivePump: reader/dispatcher thread pair for one channel
+    PumpStats: snapshot of the pump counters
+"""
+
+from .buffer import MessagePool, MessageBatch
+from .errors import PassThruInterfaceException
+from .structs import PASSTHRU_MSG4, PASSTHRU_MSG5
+from . import api
+from . import util
+
+import collections
+import dataclasses
+import logging
+import queue
+import threading
+
+
+@dataclasses.dataclass
+class PumpStats:
+    """ Snapshot of the ``ReceivePump`` counters
+
+    Fields:
+        queue_depth: batches waiting for dispatch
+        max_queue_depth: highest queue depth seen
+        batches: batches queued for dispatch
+        frames: frames queued for dispatch
+        dropped_batches: batches dropped because the queue was full
+        dropped_frames: frames in the dropped batches
+        overflows: reads that reported ``Err_BufferOverflow`` from the device
+        subscriber_errors: exceptions raised by subscriber callbacks
+        batch_sizes: histogram of messages per read; bucket ``n`` counts reads of ``[2**(n-1), 2**n)``
+    """
+    queue_depth: int
+    max_queue_depth: int
+    batches: int
+    frames: int
+    dropped_batches: int
+    dropped_frames: int
+    overflows: int
+    subscriber_errors: int
+    batch_sizes: list[int]
+
+
+_Subscriber = collections.namedtuple('_Subscriber', ('callback', 'predicate', 'matches'))
+
+
+@util.setup_logging
+class ReceivePump(object):
+    """ Dedicated receive thread for one channel with subscriber dispatch
+
+    Subscribers are called on the dispatcher thread as ``callback(batch, indices)`` where ``indices`` are
+    the positions in ``batch`` accepted by their predicate. The batch is only valid during the call; copy
+    whatever has to be kept.
+    """
+
+    def __init__(self, passthru, channel: int, msgs: int = 64, timeout: int = 100, maxsize: int = 64,
+                 **kwargs) -> None:
+        """ Create the pump (not started)
+
+        Args:
+            self (ReceivePump): the ``ReceivePump`` instance
+            passthru (PassThru): the ``PassThru`` instance owning the channel
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+            msgs (int): maximum number of messages per read
+            timeout (int): blocking read timeout in milliseconds (libraries with concurrent channels)
+            maxsize (int): number of batches the queue holds before new ones are dropped
+
+        Keyword Args:
+            idle_wait (float): wait in milliseconds between polls of an idle channel on serialized
+                libraries, spent outside the DLL so the device stays free for other calls (default 1)
+            loglevel (int): logging level for the logger instance
+        """
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        self.__pt = passthru
+        self.channel = channel
+        self.msgs = msgs
+        self.timeout = timeout
+        self.idle_wait = kwargs.get('idle_wait', 1)
+        self.exception = None
+
+        # every batch queued or being dispatched holds a buffer, plus the one being filled
+        struct = PASSTHRU_MSG5 if passthru.apiversion == api.V5 else PASSTHRU_MSG4
+        pool = MessagePool(struct, maxsize + 2)
+        self.__free = collections.deque(pool.batch(channel, msgs) for _ in range(maxsize + 2))
+        self.__queue = queue.Queue(maxsize)
+        self.__subscribers = ()
+        self.__sublock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__threads = ()
+
+        self.__max_depth = 0
+        self.__batches = 0
+        self.__frames = 0
+        self.__dropped_batches = 0
+        self.__dropped_frames = 0
+        self.__overflows = 0
+        self.__subscriber_errors = 0
+        self.__sizes = [0] * (msgs.bit_length() + 1)
+
+    def subscribe(self, callback, predicate=None) -> object:
+        """ Register ``callback`` for the frames whose arbitration ID satisfies ``predicate``
+
+        Args:
+            self (ReceivePump): the ``ReceivePump`` instance
+            callback: called as ``callback(batch, indices)``
+            predicate: ``predicate(arbid) -> bool``; ``None`` accepts every frame
+
+        Returns:
+            a handle for ``unsubscribe``
+        """
+        subscriber = _Subscriber(callback, predicate, {})
+        with self.__sublock:
+            self.__subscribers = self.__subscribers + (subscriber, )
+        return subscriber
+
+    def unsubscribe(self, handle: object) -> None:
+        """ Remove a subscriber registered with ``subscribe``
+
+        Args:
+            self (ReceivePump): the ``ReceivePump`` instance
+            handle: the value returned by ``subscribe``
+        """
+        with self.__sublock:
+            self.__subscribers = tuple(s for s in self.__subscribers if s is not handle)
+
+    def start(self) -> 'ReceivePump':
+        """ Start the reader and dispatcher threads """
+        if self.running:
+            raise RuntimeError(f'{self.__class__.__name__} for channel {self.channel} is already running')
+        self.__stop.clear()
+        self.__threads = (
+            threading.Thread(target=self.__reader, name=f'pump-read-{self.channel}', daemon=True),
+            threading.Thread(target=self.__dispatcher, name=f'pump-dispatch-{self.channel}', daemon=True),
+        )
+        for thread in self.__threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ Stop both threads; batches still queued are dispatched first """
+        self.__stop.set()
+        for thread in self.__threads:
+            thread.join()
+        self.__threads = ()
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self.__threads)
+
+    def __enter__(self) -> 'ReceivePump':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @property
+    def stats(self) -> PumpStats:
+        """ Returns a snapshot of the pump counters """
+        return PumpStats(self.__queue.qsize(), self.__max_depth, self.__batches, self.__frames,
+                         self.__dropped_batches, self.__dropped_frames, self.__overflows,
+                         self.__subscriber_errors, list(self.__sizes))
+
+    def __reader(self) -> None:
+        """ Read batches from the channel until stopped or the DLL faults """
+        free = self.__free
+        sizes = self.__sizes
+        blocking = self.__pt.concurrent_channels
+        try:
+            while not self.__stop.is_set():
+                batch = free.popleft()
+                # drain what is queued without waiting; the call lock is only held for the copy
+                result = self.__pt.poll(self.channel, self.msgs, 0, batch)
+                if result.count == 0 and blocking:
+                    # only the channel is locked: block until the next frame
+                    # (a blocking read of ``msgs`` frames would only return once all of them arrived)
+                    result = self.__pt.poll(self.channel, 1, self.timeout, batch)
+                count = result.count
+                sizes[count.bit_length()] += 1
+                if result.overflow:
+                    self.__overflows += 1
+                if count == 0:
+                    free.append(batch)
+                    if not blocking:
+                        self.__stop.wait(self.idle_wait / 1000)
+                    continue
+                try:
+                    self.__queue.put_nowait(batch)
+                except queue.Full:
+                    self.__dropped_batches += 1
+                    self.__dropped_frames += count
+                    free.append(batch)
+                    continue
+                self.__batches += 1
+                self.__frames += count
+                depth = self.__queue.qsize()
+                if depth > self.__max_depth:
+                    self.__max_depth = depth
+        except PassThruInterfaceException as e:
+            self.__log.error(f'Channel {self.channel}: {e}')
+            self.exception = e
+        finally:
+            self.__stop.set()
+
+    def __dispatcher(self) -> None:
+        """ Hand queued batches to the subscribers """
+        while not (self.__stop.is_set() and self.__queue.empty()):
+            try:
+                batch = self.__queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self.__dispatch(batch)
+            finally:
+                self.__free.append(batch)
+
+    def __dispatch(self, batch: MessageBatch) -> None:
+        """ Call each subscriber with the indices accepted by its predicate """
+        everything = range(batch.count)
+        for callback, predicate, matches in self.__subscribers:
+            if predicate is None:
+                indices = everything
+            else:
+                indices = []
+                for i in everything:
+                    arbid = batch.arbid(i)
+                    match = matches.get(arbid)
+                    if match is None:
+                        match = matches[arbid] = bool(predicate(arbid))
+                    if match:
+                        indices.append(i)
+                if not indices:
+                    continue
+            try:
+                callback(batch, indices)
+            except Exception as e:
+                self.__subscriber_errors += 1
+                self.__log.error(f'Channel {self.channel}: subscriber {callback} failed: {e}')
@@ -0,0 +1,216 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Replay of captured traffic into a PassThru channel
+
+Two modes are supported:
+
+* timing accurate (``realtime=True``): every frame is scheduled at an absolute point derived from its
+  capture time, so errors never accumulate. The scheduler sleeps until shortly before the deadline and
+  spins for the rest; frames that are already due go out together in one ``PassThruWriteMsgs`` call.
+* as fast as possible (``realtime=False``): frames are sent in batches of ``chunk`` messages with a
+  blocking write, i.e. as fast as the device accepts them.
+
+Frames are streamed from the source (e.g. ``CaptureReader.frames``), so memory use does not depend on the
+length of the capture.
+
+Available Classes:
+    Replayer: replays ``(header, payload)`` frames into one channel
+    ReplayStats: counters and scheduling jitter of a replay
+"""
+
+from .enums import RxStatus, TxFlags
+from . import util
+
+import dataclasses
+import logging
+import threading
+import time
+
+# jitter histogram buckets: bucket ``n`` counts lags of [2**(n-1), 2**n) microseconds
+JITTER_BUCKETS = 24
+
+
+@dataclasses.dataclass
+class ReplayStats:
+    """ Result of ``Replayer.replay``
+
+    Fields:
+        frames: frames read from the source
+        sent: frames written to the channel
+        skipped: frames dropped by the predicate or of another protocol
+        writes: ``PassThruWriteMsgs`` batches
+        duration: wall time of the replay in seconds
+        jitter_mean_us: mean lateness of a frame against its schedule (timing accurate mode)
+        jitter_max_us: worst lateness of a frame against its schedule (timing accurate mode)
+        jitter_histogram: histogram of the lateness; bucket ``n`` counts ``[2**(n-1), 2**n)`` microseconds
+    """
+    frames: int = 0
+    sent: int = 0
+    skipped: int = 0
+    writes: int = 0
+    duration: float = 0.0
+    jitter_mean_us: float = 0.0
+    jitter_max_us: float = 0.0
+    jitter_histogram: list[int] = dataclasses.field(default_factory=lambda: [0] * JITTER_BUCKETS)
+
+
+@util.setup_logging
+class Replayer(object):
+    """ Replays captured frames into a connected channel
+
+    Attributes:
+        realtime: ``True`` to preserve the captured timing, ``False`` to send as fast as possible
+        speed: playback speed factor in timing accurate mode
+        chunk: maximum number of messages per ``PassThruWriteMsgs`` call
+        timeout: write timeout in milliseconds
+    """
+
+    def __init__(self, passthru, channel: int, **kwargs) -> None:
+        """ Create the replayer
+
+        Args:
+            self (Replayer): the ``Replayer`` instance
+            passthru (PassThru): the ``PassThru`` instance owning the channel
+            channel (int): the channel id returned by the ``PassThru.connect`` call
+
+        Keyword Args:
+            realtime (bool): preserve the captured timing (default ``True``)
+            speed (float): playback speed factor (default 1.0)
+            chunk (int): maximum messages per write (default 256)
+            timeout (int): write timeout in milliseconds (default 1000)
+            remap (dict): arbitration ID replacements ``{captured: replayed}``
+            predicate: ``predicate(arbid) -> bool`` selecting the frames to replay (by captured ID)
+            protocol (int): only replay frames of this protocol id, all by default
+            txflags (int): ``TxFlags`` added to every frame
+            loglevel (int): logging level for the logger instance
+        """
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        self.__pt = passthru
+        self.channel = channel
+        self.realtime = kwargs.get('realtime', True)
+        self.speed = kwargs.get('speed', 1.0)
+        self.chunk = kwargs.get('chunk', 256)
+        self.timeout = kwargs.get('timeout', 1000)
+        self.protocol = kwargs.get('protocol')
+        self.txflags = kwargs.get('txflags', 0)
+        self.__remap = {old: new.to_bytes(4, 'big') for old, new in kwargs.get('remap', {}).items()}
+        self.__predicate = kwargs.get('predicate')
+        self.__stop = threading.Event()
+
+    def stop(self) -> None:
+        """ Abort a running replay (from another thread) after the current batch """
+        self.__stop.set()
+
+    def replay(self, frames) -> ReplayStats:
+        """ Replay ``frames`` into the channel
+
+        Args:
+            self (Replayer): the ``Replayer`` instance
+            frames: iterable of ``(header, payload)`` with ``CAPTURE_HDR`` headers, e.g. a ``CaptureReader``
+                or ``CaptureReader.frames(start, stop)``
+
+        Returns:
+            the replay statistics
+        """
+        self.__stop.clear()
+        stats = ReplayStats()
+        start = time.perf_counter()
+        try:
+            if self.realtime:
+                self.__realtime(frames, stats)
+            else:
+                self.__bulk(frames, stats)
+        finally:
+            stats.duration = time.perf_counter() - start
+            if stats.sent and self.realtime:
+                stats.jitter_mean_us /= stats.sent
+        self.__log.info(f'Replayed {stats.sent} of {stats.frames} frames in {stats.duration:.3f} s')
+        return stats
+
+    def __select(self, frames, stats: ReplayStats):
+        """ Generator of ``(time, txflags, payload)`` of the frames to replay """
+        remap = self.__remap
+        predicate = self.__predicate
+        protocol = self.protocol
+        txflags = self.txflags
+        stop = self.__stop
+        matches = {}
+        for header, payload in frames:
+            if stop.is_set():
+                self.__log.info(f'Replay stopped after {stats.frames} frames')
+                return
+            stats.frames += 1
+            if protocol is not None and header.ProtocolID != protocol:
+                stats.skipped += 1
+                continue
+            if predicate is not None or remap:
+                arbid = int.from_bytes(payload[:4], 'big')
+                if predicate is not None:
+                    match = matches.get(arbid)
+                    if match is None:
+                        match = matches[arbid] = bool(predicate(arbid))
+                    if not match:
+                        stats.skipped += 1
+                        continue
+                replacement = remap.get(arbid)
+                if replacement is not None:
+                    payload = replacement + payload[4:]
+            flags = txflags | (TxFlags.CAN_29BIT_ID if header.RxStatus & RxStatus.CAN_29BIT_ID else 0)
+            yield header.Time, flags, payload
+
+    def __write(self, payloads: list, txflags: int, stats: ReplayStats) -> None:
+        self.__pt.write(self.channel, payloads, self.timeout, txflags=txflags)
+        stats.sent += len(payloads)
+        stats.writes += 1
+
+    def __bulk(self, frames, stats: ReplayStats) -> None:
+        """ Send everything in batches of ``chunk`` frames """
+        chunk = self.chunk
+        payloads = []
+        batch_flags = None
+        for _, txflags, payload in self.__select(frames, stats):
+            if txflags != batch_flags or len(payloads) == chunk:
+                if payloads:
+                    self.__write(payloads, batch_flags, stats)
+                    payloads = []
+                batch_flags = txflags
+            payloads.append(payload)
+        if payloads:
+            self.__write(payloads, batch_flags, stats)
+
+    def __realtime(self, frames, stats: ReplayStats) -> None:
+        """ Send every frame at its captured offset from the first frame """
+        chunk = self.chunk
+        scale = 1e-6 / self.speed
+        histogram = stats.jitter_histogram
+        payloads = []
+        deadlines = []
+        batch_flags = None
+        origin = base = None
+
+        def flush():
+            now = time.perf_counter()
+            self.__write(payloads, batch_flags, stats)
+            for deadline in deadlines:
+                lag = max(now - deadline, 0.0) * 1e6
+                stats.jitter_mean_us += lag
+                if lag > stats.jitter_max_us:
+                    stats.jitter_max_us = lag
+                histogram[min(int(lag).bit_length(), JITTER_BUCKETS - 1)] += 1
+            payloads.clear()
+            deadlines.clear()
+
+        for capture_time, txflags, payload in self.__select(frames, stats):
+            if origin is None:
+                origin, base = capture_time, time.perf_counter()
+            deadline = base + (capture_time - origin) * scale
+            # frames already due share a write, anything later waits for its own deadline
+            if payloads and (deadline > time.perf_counter() or txflags != batch_flags or len(payloads) == chunk):
+                flush()
+            util.spin_until(deadline)
+            batch_flags = txflags
+            payloads.append(payload)
+            deadlines.append(deadline)
+        if payloads:
+            flush()
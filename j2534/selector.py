@@ -0,0 +1,182 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Waiting for messages on any of several channels
+
+A ``ChannelSelector`` blocks until at least one of its channels has messages and returns what it read:
+
+* v05.00 libraries block in ``PassThruSelect`` and then drain the channels it reported,
+* v04.04 libraries have no such call. The selector drains every channel with zero timeout reads and, when
+  all were empty, blocks for a single message on the channel that was busiest so far. That wait grows
+  from ``min_backoff`` to ``max_backoff`` while the channels stay idle and drops back as soon as anything
+  arrives, so an idle logger sleeps in the DLL instead of spinning, the busy channel is served without
+  delay and the quiet ones are checked at least every ``max_backoff``.
+
+Blocking calls hold the call lock of the device (or channel), so both waits are split into calls of at
+most ``max_block`` milliseconds; calls of other threads get through in between.
+
+Available Classes:
+    ChannelSelector: multiplexed reads of several channels
+"""
+
+from .buffer import ReadResult
+from .errors import PassThruInterfaceException, PassThruApiNotSupportedException
+from . import api
+from . import util
+
+import collections
+import logging
+import time
+
+
+@util.setup_logging
+class ChannelSelector(object):
+    """ Multiplexed reads of several channels of one ``PassThru`` instance
+
+    The results come from the channel pools (see ``PassThru.poll``) and stay valid until the next ``wait``.
+
+    Attributes:
+        msgs: maximum number of messages read per channel and call
+        min_backoff: shortest idle wait in milliseconds
+        max_backoff: longest idle wait in milliseconds
+        max_block: longest single blocking read in milliseconds
+    """
+
+    def __init__(self, passthru, channels=(), **kwargs) -> None:
+        """ Create the selector
+
+        Args:
+            self (ChannelSelector): the ``ChannelSelector`` instance
+            passthru (PassThru): the ``PassThru`` instance owning the channels
+            channels: the channel ids returned by the ``PassThru.connect`` call
+
+        Keyword Args:
+            msgs (int): maximum number of messages read per channel and call (default 64)
+            min_backoff (int): shortest idle wait in milliseconds (default 1)
+            max_backoff (int): longest idle wait in milliseconds (default 16)
+            max_block (int): longest single blocking read in milliseconds (default 2)
+            select (bool): use ``PassThruSelect``, by default if the API version has it (v05.00)
+            loglevel (int): logging level for the logger instance
+        """
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        self.__pt = passthru
+        self.msgs = kwargs.get('msgs', 64)
+        self.min_backoff = max(kwargs.get('min_backoff', 1), 1)
+        self.max_backoff = max(kwargs.get('max_backoff', 16), self.min_backoff)
+        self.max_block = max(kwargs.get('max_block', 2), 1)
+        self.__select = kwargs.get('select', passthru.apiversion == api.V5)
+        self.__channels = []
+        # messages received per channel, decayed so the busiest channel follows the traffic
+        self.__activity = collections.Counter()
+        self.__backoff = self.min_backoff
+        self.__next = 0
+        for channel in channels:
+            self.add(channel)
+
+    @property
+    def channels(self) -> list[int]:
+        return list(self.__channels)
+
+    def add(self, channel: int) -> None:
+        """ Watch ``channel`` """
+        if channel not in self.__channels:
+            self.__channels.append(channel)
+
+    def remove(self, channel: int) -> None:
+        """ Stop watching ``channel``
+
+        Raises:
+            ValueError: if the channel is not watched
+        """
+        self.__channels.remove(channel)
+        self.__activity.pop(channel, None)
+
+    def wait(self, timeout: int) -> list[tuple[int, ReadResult]]:
+        """ Wait until messages are available on any channel and read them
+
+        Args:
+            self (ChannelSelector): the ``ChannelSelector`` instance
+            timeout (int): maximum wait in milliseconds
+
+        Returns:
+            ``(channel, result)`` of every read that returned messages (a channel may appear twice), empty
+            if the timeout expired first
+
+        Raises:
+            PassThruInterfaceException: if a read fails
+        """
+        if not self.__channels:
+            raise PassThruInterfaceException('No channel to wait for')
+        if self.__select:
+            try:
+                return self.__wait_select(timeout)
+            except PassThruApiNotSupportedException:
+                self.__log.info('PassThruSelect is not available, polling')
+                self.__select = False
+        return self.__wait_poll(timeout)
+
+    def __drain(self) -> list[tuple[int, ReadResult]]:
+        """ Read the waiting messages of every channel, starting with a different one each call """
+        channels = self.__channels
+        start = self.__next % len(channels)
+        self.__next = start + 1
+        ready = []
+        for channel in channels[start:] + channels[:start]:
+            result = self.__pt.poll(channel, self.msgs, 0)
+            if result.messages:
+                ready.append((channel, result))
+        return ready
+
+    def __wait_select(self, timeout: int) -> list[tuple[int, ReadResult]]:
+        deadline = time.perf_counter() + timeout / 1000
+        while True:
+            remaining = int((deadline - time.perf_counter()) * 1000)
+            ready = []
+            for channel in self.__pt.select(self.__channels, max(min(remaining, self.max_block), 0)):
+                result = self.__pt.poll(channel, self.msgs, 0)
+                if result.messages:
+                    ready.append((channel, result))
+            if ready or remaining <= 0:
+                return ready
+
+    def __wait_poll(self, timeout: int) -> list[tuple[int, ReadResult]]:
+        deadline = time.perf_counter() + timeout / 1000
+        while True:
+            ready = self.__drain()
+            if ready:
+                self.__backoff = self.min_backoff
+                self.__learn(ready)
+                return ready
+            remaining = int((deadline - time.perf_counter()) * 1000)
+            if remaining <= 0:
+                return []
+            wait = min(self.__backoff, remaining)
+            self.__backoff = min(self.__backoff * 2, self.max_backoff)
+            # a single message, a larger count would block for the whole wait (J2534 read semantics)
+            hot = self.__hottest()
+            result = self.__block(hot, wait)
+            if result.messages:
+                self.__backoff = self.min_backoff
+                ready = [(hot, result)] + self.__drain()
+                self.__learn(ready)
+                return ready
+
+    def __block(self, channel: int, wait: int) -> ReadResult:
+        """ Wait up to ``wait`` milliseconds for a message on ``channel`` in reads of at most ``max_block`` """
+        until = time.perf_counter() + wait / 1000
+        while True:
+            result = self.__pt.poll(channel, 1, min(wait, self.max_block))
+            wait = int((until - time.perf_counter()) * 1000)
+            if result.messages or wait <= 0:
+                return result
+
+    def __hottest(self) -> int:
+        activity = self.__activity
+        return max(self.__channels, key=lambda channel: activity[channel])
+
+    def __learn(self, ready: list[tuple[int, ReadResult]]) -> None:
+        activity = self.__activity
+        for channel in activity:
+            activity[channel] >>= 1
+        for channel, result in ready:
+            activity[channel] += len(result)
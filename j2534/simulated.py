@@ -0,0 +1,570 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Pure-Python stand-in for a J2534 PassThru DLL
+
+``SimulatedPassThruLibrary`` exposes the ``PASSTHRU_DEF4`` entry points as ``ctypes`` callbacks with the
+same prototypes as a vendor DLL, so ``PassThru`` drives it exactly like real hardware (including the
+``ctypes`` argument conversion cost). Channels of every simulated device attached to the same
+``SimulatedBus`` see each other's traffic.
+
+The bus model covers what matters for testing and benchmarking the host side:
+
+* frame timing derived from the channel baud rate (worst case bit stuffing), serialized on the bus
+* bounded receive/ transmit queues with ``Err_BufferOverflow``/ ``Err_BufferFull`` behaviour
+* pass/ block/ flow control filters with mask/ pattern semantics (nothing is received without a filter)
+* periodic messages, ``GET_CONFIG``/ ``SET_CONFIG`` and the queue clearing ioctls
+* latency injection for every API call and for frame delivery
+
+Only messages of the same protocol are delivered to each other; an ISO15765 message travels as one
+unsegmented message (with the bus time of its segments). Nodes attached with ``SimulatedBus.attach``
+can observe traffic and answer it, e.g. to stand in for an ECU.
+
+Available Classes:
+    SimulatedBus: shared in-memory bus connecting simulated channels
+    SimulatedPassThruLibrary: library object accepted by ``PassThru``
+"""
+
+from .enums import ErrorCode, FilterType, IoctlId, ConfigParams, ProtocolId, Flags
+from .structs import PASSTHRU_MSG4, SCONFIG_LIST
+from .errors import PassThruLibraryException
+from . import api
+from . import util
+
+import collections
+import ctypes
+import itertools
+import logging
+import threading
+import time
+
+# receive status bits used by the simulation
+TX_MSG_TYPE = 0x00000001
+CAN_29BIT_ID = 0x00000100
+
+# periodic messages supported per channel, like most real interfaces
+MAX_PERIODIC_MSGS = 10
+
+# filters supported per channel
+MAX_FILTERS = 10
+
+
+def can_frame_bits(size: int, extended: bool = False) -> int:
+    """ Worst case number of bits on the wire for a classic CAN frame carrying ``size`` data bytes
+
+    Args:
+        size (int): number of data bytes (0-8)
+        extended (bool): ``True`` for 29 bit identifiers
+
+    Returns:
+        the frame length in bits including worst case stuffing and inter frame space
+    """
+    if extended:
+        return 67 + 8 * size + (53 + 8 * size) // 4
+    return 47 + 8 * size + (33 + 8 * size) // 4
+
+
+class _Channel(object):
+    """ State of one connected simulated channel """
+
+    def __init__(self, device: '_Device', channel_id: int, protocol: int, flags: int, baudrate: int) -> None:
+        self.device = device
+        self.id = channel_id
+        self.protocol = protocol
+        self.flags = flags
+        self.baudrate = baudrate
+        self.rx = collections.deque()
+        self.overflow = False
+        self.pending = collections.deque()
+        self.filters = {}
+        self.periodic = {}
+        self.config = {ConfigParams.DATA_RATE: baudrate}
+
+    def accepts(self, data: bytes) -> bool:
+        """ Apply the J2534 filter rules: at least one pass/ flow control match and no block match """
+        passed = False
+        for type, mask, pattern in self.filters.values():
+            if len(data) < len(mask):
+                continue
+            if all((d & m) == p for d, m, p in zip(data, mask, pattern)):
+                if type == FilterType.BLOCK_FILTER:
+                    return False
+                passed = True
+        return passed
+
+    def frame_time_ns(self, data: bytes) -> int:
+        """ Time the message occupies the bus in nanoseconds """
+        extended = bool(self.flags & Flags.CAN_ID_29BIT)
+        payload = max(len(data) - 4, 0)
+        if self.protocol in (ProtocolId.ISO15765, ProtocolId.ISO15765_LOGICAL) and payload > 7:
+            # first frame, consecutive frames and one flow control frame
+            frames = 1 + -(-(payload - 6) // 7)
+            bits = frames * can_frame_bits(8, extended) + can_frame_bits(3, extended)
+        else:
+            bits = can_frame_bits(min(payload, 8), extended)
+        return bits * 1000000000 // max(self.config.get(ConfigParams.DATA_RATE, self.baudrate), 1)
+
+
+class _Device(object):
+    """ State of one opened simulated device """
+
+    def __init__(self, device_id: int, name: str) -> None:
+        self.id = device_id
+        self.name = name
+        self.epoch = time.perf_counter_ns()
+
+    def timestamp(self, ns: int) -> int:
+        """ Device clock (wrapping 32 bit microseconds) at ``perf_counter_ns`` value ``ns`` """
+        return ((ns - self.epoch) // 1000) & 0xFFFFFFFF
+
+
+class SimulatedBus(object):
+    """ In-memory bus shared by simulated channels
+
+    Attributes:
+        frame_timing: ``True`` to serialize frames on the bus according to the baud rate
+        latency: extra delivery delay in seconds added to every frame
+        rx_depth: receive queue depth of each channel
+        tx_depth: transmit queue depth of each channel
+        filters: ``True`` to apply the J2534 filter rules, ``False`` to deliver every message as if a
+            pass-all filter were installed
+    """
+
+    def __init__(self, frame_timing: bool = True, latency: float = 0.0, rx_depth: int = 8192,
+                 tx_depth: int = 1024, filters: bool = True) -> None:
+        self.frame_timing = frame_timing
+        self.filters = filters
+        self.latency = latency
+        self.rx_depth = rx_depth
+        self.tx_depth = tx_depth
+        self.cond = threading.Condition(threading.RLock())
+        self.channels = []
+        self.nodes = []
+        self.busy_until = 0
+        self.frames = 0
+
+    def attach(self, node) -> None:
+        """ Attach a node observing the traffic
+
+        ``node(protocol, data)`` is called for every message transmitted by a channel and may return an
+        iterable of ``data`` to transmit on the same protocol in response.
+
+        Args:
+            self (SimulatedBus): the ``SimulatedBus`` instance
+            node: the node callable
+        """
+        with self.cond:
+            self.nodes.append(node)
+
+    def transmit(self, sender: _Channel | None, protocol: int, data: bytes, txflags: int = 0,
+                 start_ns: int = None, frame_ns: int = None) -> int:
+        """ Put a message on the bus and deliver it to every other channel of the same protocol
+
+        Args:
+            self (SimulatedBus): the ``SimulatedBus`` instance
+            sender (_Channel): the sending channel, ``None`` for nodes
+            protocol (int): protocol id of the message
+            data (bytes): message data
+            txflags (int): transmit flags
+            start_ns (int): earliest start on the bus (``perf_counter_ns``), defaults to now
+            frame_ns (int): bus time of the message, defaults to the sender's frame timing
+
+        Returns:
+            the ``perf_counter_ns`` at which the message has left the bus
+        """
+        now = time.perf_counter_ns() if start_ns is None else start_ns
+        with self.cond:
+            if self.frame_timing:
+                if frame_ns is None:
+                    frame_ns = sender.frame_time_ns(data) if sender is not None else 0
+                start = max(now, self.busy_until)
+                done = self.busy_until = start + frame_ns
+            else:
+                done = now
+            deliver = done + int(self.latency * 1e9)
+            rxstatus = CAN_29BIT_ID if txflags & Flags.CAN_ID_29BIT else 0
+            self.frames += 1
+            for channel in self.channels:
+                if channel is sender or channel.protocol != protocol:
+                    continue
+                if self.filters and not channel.accepts(data):
+                    continue
+                if len(channel.rx) >= self.rx_depth:
+                    channel.overflow = True
+                    continue
+                channel.rx.append((deliver, protocol, rxstatus, data))
+            self.cond.notify_all()
+            if sender is not None:
+                for node in self.nodes:
+                    for response in node(protocol, data) or ():
+                        self.transmit(None, protocol, response, txflags, deliver,
+                                      sender.frame_time_ns(response))
+        return done
+
+
+@util.setup_logging
+class _SimulatedDll(object):
+    """ Implementation of the ``PASSTHRU_DEF4`` entry points """
+
+    def __init__(self, bus: SimulatedBus, call_latency: float, version: tuple[str, str, str]) -> None:
+        self.bus = bus
+        self.call_latency = call_latency
+        self.version = version
+        self.devices = {}
+        self.channels = {}
+        self.last_error = ''
+        self.ids = itertools.count(1)
+        self.scheduler = None
+
+    def _fail(self, rv: int, message: str = None) -> int:
+        self.last_error = message or ErrorCode.to_string(rv)
+        return rv
+
+    def _channel(self, channel_id: int) -> _Channel | None:
+        return self.channels.get(channel_id)
+
+    def PassThruOpen(self, pName, pDeviceID) -> int:
+        if not pDeviceID:
+            return self._fail(ErrorCode.Err_NullParameter)
+        name = ctypes.cast(pName, ctypes.c_char_p).value if pName else b''
+        device = _Device(next(self.ids), (name or b'').decode('ascii', 'replace'))
+        self.devices[device.id] = device
+        pDeviceID[0] = device.id
+        return ErrorCode.Status_NoError
+
+    def PassThruClose(self, DeviceID) -> int:
+        device = self.devices.pop(DeviceID, None)
+        if device is None:
+            return self._fail(ErrorCode.Err_InvalidDeviceId)
+        for channel in [c for c in self.channels.values() if c.device is device]:
+            self.PassThruDisconnect(channel.id)
+        return ErrorCode.Status_NoError
+
+    def PassThruConnect(self, DeviceID, ProtocolID, Flags, Baudrate, pChannelID) -> int:
+        device = self.devices.get(DeviceID)
+        if device is None:
+            return self._fail(ErrorCode.Err_InvalidDeviceId)
+        if not pChannelID:
+            return self._fail(ErrorCode.Err_NullParameter)
+        if ProtocolID not in (ProtocolId.CAN, ProtocolId.ISO15765):
+            return self._fail(ErrorCode.Err_ProtocolIdNotSupported)
+        if Baudrate <= 0:
+            return self._fail(ErrorCode.Err_BaudrateNotSupported)
+        channel = _Channel(device, next(self.ids), ProtocolID, Flags, Baudrate)
+        with self.bus.cond:
+            self.channels[channel.id] = channel
+            self.bus.channels.append(channel)
+        pChannelID[0] = channel.id
+        return ErrorCode.Status_NoError
+
+    def PassThruDisconnect(self, ChannelID) -> int:
+        channel = self.channels.pop(ChannelID, None)
+        if channel is None:
+            return self._fail(ErrorCode.Err_InvalidChannelId)
+        with self.bus.cond:
+            self.bus.channels.remove(channel)
+            channel.periodic.clear()
+        return ErrorCode.Status_NoError
+
+    def PassThruReadMsgs(self, ChannelID, pMsg, pNumMsgs, Timeout) -> int:
+        channel = self._channel(ChannelID)
+        if channel is None:
+            return self._fail(ErrorCode.Err_InvalidChannelId)
+        if not pMsg or not pNumMsgs:
+            return self._fail(ErrorCode.Err_NullParameter)
+        wanted = pNumMsgs[0]
+        deadline = time.perf_counter_ns() + Timeout * 1000000
+        count = 0
+        cond = self.bus.cond
+        with cond:
+            while True:
+                now = time.perf_counter_ns()
+                rx = channel.rx
+                while count < wanted and rx and rx[0][0] <= now:
+                    deliver, protocol, rxstatus, data = rx.popleft()
+                    msg = pMsg[count]
+                    msg.ProtocolID = protocol
+                    msg.RxStatus = rxstatus
+                    msg.TxFlags = 0
+                    msg.Timestamp = channel.device.timestamp(deliver)
+                    msg.DataSize = msg.ExtraDataIndex = len(data)
+                    ctypes.memmove(ctypes.addressof(msg.Data), data, len(data))
+                    count += 1
+                if count == wanted or now >= deadline:
+                    break
+                wait = deadline - now
+                if rx:
+                    wait = min(wait, rx[0][0] - now)
+                cond.wait(wait / 1e9)
+            overflow, channel.overflow = channel.overflow, False
+        pNumMsgs[0] = count
+        if overflow:
+            return self._fail(ErrorCode.Err_BufferOverflow)
+        if count == wanted:
+            return ErrorCode.Status_NoError
+        return ErrorCode.Err_Timeout if Timeout else ErrorCode.Err_BufferEmpty
+
+    def PassThruWriteMsgs(self, ChannelID, pMsg, pNumMsgs, Timeout) -> int:
+        channel = self._channel(ChannelID)
+        if channel is None:
+            return self._fail(ErrorCode.Err_InvalidChannelId)
+        if not pMsg or not pNumMsgs:
+            return self._fail(ErrorCode.Err_NullParameter)
+        wanted = pNumMsgs[0]
+        deadline = time.perf_counter_ns() + Timeout * 1000000
+        pending = channel.pending
+        bus = self.bus
+        sent = 0
+        rv = ErrorCode.Status_NoError
+        while sent < wanted:
+            msg = pMsg[sent]
+            if msg.ProtocolID != channel.protocol:
+                rv = self._fail(ErrorCode.Err_MsgProtocolId)
+                break
+            size = msg.DataSize
+            if size < 4 or size > MAX_DATA_SIZE_FOR.get(channel.protocol, 12):
+                rv = self._fail(ErrorCode.Err_InvalidMsg)
+                break
+            now = time.perf_counter_ns()
+            while pending and pending[0] <= now:
+                pending.popleft()
+            if len(pending) >= bus.tx_depth:
+                if now >= deadline:
+                    rv = ErrorCode.Err_Timeout if Timeout else ErrorCode.Err_BufferFull
+                    break
+                util.spin_until(min(pending[0], deadline) / 1e9)
+                continue
+            data = ctypes.string_at(ctypes.addressof(msg.Data), size)
+            pending.append(bus.transmit(channel, msg.ProtocolID, data, msg.TxFlags))
+            sent += 1
+        pNumMsgs[0] = sent
+        if Timeout and rv == ErrorCode.Status_NoError and pending:
+            # with a timeout the call returns once the messages have been transmitted
+            util.spin_until(min(pending[-1], deadline) / 1e9)
+            if pending[-1] > deadline:
+                rv = ErrorCode.Err_Timeout
+        return rv
+
+    def PassThruStartPeriodicMsg(self, ChannelID, pMsg, pMsgID, TimeInterval) -> int:
+        channel = self._channel(ChannelID)
+        if channel is None:
+            return self._fail(ErrorCode.Err_InvalidChannelId)
+        if not pMsg or not pMsgID:
+            return self._fail(ErrorCode.Err_NullParameter)
+        if not 5 <= TimeInterval <= 65535:
+            return self._fail(ErrorCode.Err_TimeIntervalNotSupported)
+        msg = pMsg[0]
+        if msg.ProtocolID != channel.protocol:
+            return self._fail(ErrorCode.Err_MsgProtocolId)
+        with self.bus.cond:
+            if len(channel.periodic) >= MAX_PERIODIC_MSGS:
+                return self._fail(ErrorCode.Err_ExceededLimit)
+            msg_id = next(self.ids)
+            data = ctypes.string_at(ctypes.addressof(msg.Data), msg.DataSize)
+            channel.periodic[msg_id] = [time.perf_counter_ns(), TimeInterval * 1000000, msg.TxFlags, data]
+            self._start_scheduler()
+            self.bus.cond.notify_all()
+        pMsgID[0] = msg_id
+        return ErrorCode.Status_NoError
+
+    def PassThruStopPeriodicMsg(self, ChannelID, MsgID) -> int:
+        channel = self._channel(ChannelID)
+        if channel is None:
+            return self._fail(ErrorCode.Err_InvalidChannelId)
+        with self.bus.cond:
+            if channel.periodic.pop(MsgID, None) is None:
+                return self._fail(ErrorCode.Err_InvalidMsgId)
+        return ErrorCode.Status_NoError
+
+    def PassThruStartMsgFilter(self, ChannelID, FilterType_, pMaskMsg, pPatternMsg, pFlowControlMsg,
+                               pFilterID) -> int:
+        channel = self._channel(ChannelID)
+        if channel is None:
+            return self._fail(ErrorCode.Err_InvalidChannelId)
+        if not pMaskMsg or not pPatternMsg or not pFilterID:
+            return self._fail(ErrorCode.Err_NullParameter)
+        if FilterType_ not in (FilterType.PASS_FILTER, FilterType.BLOCK_FILTER, FilterType.FLOW_CONTROL_FILTER):
+            return self._fail(ErrorCode.Err_FilterTypeNotSupported)
+        if (FilterType_ == FilterType.FLOW_CONTROL_FILTER) != bool(pFlowControlMsg):
+            return self._fail(ErrorCode.Err_NullRequired if pFlowControlMsg else ErrorCode.Err_NullParameter)
+        mask, pattern = pMaskMsg[0], pPatternMsg[0]
+        if mask.DataSize != pattern.DataSize or mask.DataSize > 12:
+            return self._fail(ErrorCode.Err_InvalidMsg)
+        with self.bus.cond:
+            if len(channel.filters) >= MAX_FILTERS:
+                return self._fail(ErrorCode.Err_ExceededLimit)
+            filter_id = next(self.ids)
+            masks = bytes(mask.Data[:mask.DataSize])
+            channel.filters[filter_id] = (FilterType_, masks,
+                                          bytes(p & m for p, m in zip(pattern.Data[:pattern.DataSize], masks)))
+        pFilterID[0] = filter_id
+        return ErrorCode.Status_NoError
+
+    def PassThruStopMsgFilter(self, ChannelID, FilterID) -> int:
+        channel = self._channel(ChannelID)
+        if channel is None:
+            return self._fail(ErrorCode.Err_InvalidChannelId)
+        with self.bus.cond:
+            if channel.filters.pop(FilterID, None) is None:
+                return self._fail(ErrorCode.Err_InvalidFilterId)
+        return ErrorCode.Status_NoError
+
+    def PassThruSetProgrammingVoltage(self, DeviceID, PinNumber, Voltage) -> int:
+        if DeviceID not in self.devices:
+            return self._fail(ErrorCode.Err_InvalidDeviceId)
+        return ErrorCode.Status_NoError
+
+    def PassThruReadVersion(self, DeviceID, pFirmwareVersion, pDllVersion, pApiVersion) -> int:
+        if DeviceID not in self.devices:
+            return self._fail(ErrorCode.Err_InvalidDeviceId)
+        for pointer, value in zip((pFirmwareVersion, pDllVersion, pApiVersion), self.version):
+            if not pointer:
+                return self._fail(ErrorCode.Err_NullParameter)
+            ctypes.memmove(pointer, value.encode('ascii') + b'\0', len(value) + 1)
+        return ErrorCode.Status_NoError
+
+    def PassThruGetLastError(self, pErrorDescription) -> int:
+        if not pErrorDescription:
+            return ErrorCode.Err_NullParameter
+        text = self.last_error.encode('ascii', 'replace')[:79]
+        ctypes.memmove(pErrorDescription, text + b'\0', len(text) + 1)
+        return ErrorCode.Status_NoError
+
+    def PassThruIoctl(self, ChannelID, IoctlID, pInput, pOutput) -> int:
+        if IoctlID == IoctlId.READ_PIN_VOLTAGE:
+            if ChannelID not in self.devices:
+                return self._fail(ErrorCode.Err_InvalidDeviceId)
+            if not pOutput:
+                return self._fail(ErrorCode.Err_NullParameter)
+            ctypes.c_ulong.from_address(pOutput).value = 12000
+            return ErrorCode.Status_NoError
+        channel = self._channel(ChannelID)
+        if channel is None:
+            return self._fail(ErrorCode.Err_InvalidChannelId)
+        with self.bus.cond:
+            match IoctlID:
+                case IoctlId.GET_CONFIG | IoctlId.SET_CONFIG:
+                    if not pInput:
+                        return self._fail(ErrorCode.Err_NullParameter)
+                    configs = SCONFIG_LIST.from_address(pInput)
+                    for i in range(configs.NumOfParams):
+                        config = configs.ConfigPtr[i]
+                        if IoctlID == IoctlId.GET_CONFIG:
+                            config.Value = channel.config.get(config.Parameter, 0)
+                        else:
+                            channel.config[config.Parameter] = config.Value
+                case IoctlId.CLEAR_TX_QUEUE:
+                    channel.pending.clear()
+                case IoctlId.CLEAR_RX_QUEUE:
+                    channel.rx.clear()
+                case IoctlId.CLEAR_PERIODIC_MSGS:
+                    channel.periodic.clear()
+                case IoctlId.CLEAR_MSG_FILTERS:
+                    channel.filters.clear()
+                case _:
+                    return self._fail(ErrorCode.Err_IoctlIdNotSupported)
+        return ErrorCode.Status_NoError
+
+    def _start_scheduler(self) -> None:
+        """ Start the thread transmitting periodic messages (called with the bus lock held) """
+        if self.scheduler is None or not self.scheduler.is_alive():
+            self.scheduler = threading.Thread(target=self._periodic, name='j2534-sim-periodic', daemon=True)
+            self.scheduler.start()
+
+    def _periodic(self) -> None:
+        """ Transmit due periodic messages until none is left """
+        cond = self.bus.cond
+        with cond:
+            while True:
+                entries = [(channel, entry) for channel in self.channels.values()
+                           for entry in channel.periodic.values()]
+                if not entries:
+                    self.scheduler = None
+                    return
+                now = time.perf_counter_ns()
+                for channel, entry in entries:
+                    if entry[0] <= now:
+                        self.bus.transmit(channel, channel.protocol, entry[3], entry[2])
+                        entry[0] += entry[1]
+                due = min(entry[0] for _, entry in entries)
+                cond.wait(max(due - time.perf_counter_ns(), 0) / 1e9)
+
+
+# largest DataSize accepted per protocol
+MAX_DATA_SIZE_FOR = {
+    ProtocolId.CAN: 12,
+    ProtocolId.ISO15765: 4099,
+}
+
+
+class _ExportTable(object):
+    """ Namespace of ``ctypes`` callbacks looking like a loaded ``ctypes.CDLL`` """
+
+    def __getitem__(self, name: str):
+        return getattr(self, name)
+
+
+@util.setup_logging
+class SimulatedPassThruLibrary(object):
+    """ Simulated J2534 library usable wherever a vendor library is expected
+
+    Attributes:
+        dll: the table of exported ``ctypes`` functions
+        name: the name of the library
+        bus: the ``SimulatedBus`` the channels are attached to
+    """
+
+    VENDOR = 'Simulated'
+
+    # all state is guarded by the bus lock
+    CONCURRENT_CHANNELS = True
+
+    # the exported callbacks are created with the prototypes of the API version
+    PROTOTYPED = True
+
+    def __init__(self, **kwargs):
+        """ Create the exported function table
+
+        Keyword Args:
+            loglevel (int): logging level for the logger instance
+            apiversion (str): version of the PassThru API (only v04.04 is simulated)
+            bus (SimulatedBus): bus to attach to, a private bus is created if omitted
+            call_latency (float): delay in seconds added to every API call
+        """
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        version = kwargs.get('apiversion', api.V4)
+        if version != api.V4:
+            raise PassThruLibraryException(f'{self.__class__.__name__} only implements API version {api.V4}')
+        self.bus = kwargs.get('bus') or SimulatedBus()
+        self.path = None
+        self.__impl = _SimulatedDll(self.bus, kwargs.get('call_latency', 0.0),
+                                    ('1.0.0', '1.0.0', api.V4))
+        self.__dll = _ExportTable()
+        for proc, args, res in api.get_defs_for_version(version):
+            setattr(self.__dll, proc, ctypes.CFUNCTYPE(res, *args)(self.__export(proc)))
+
+    def __export(self, proc: str):
+        """ Wrap the implementation of ``proc`` with latency injection and error reporting """
+        func = getattr(self.__impl, proc)
+        impl = self.__impl
+        log = self.__log
+
+        def export(*args):
+            if impl.call_latency:
+                util.spin_until(time.perf_counter() + impl.call_latency)
+            try:
+                return func(*args)
+            except Exception as e:
+                log.exception(f'{proc}: {e}')
+                return impl._fail(ErrorCode.Err_Failed, f'{proc}: {e}')
+        return export
+
+    @property
+    def dll(self) -> _ExportTable:
+        """ Returns the table of exported functions """
+        return self.__dll
+
+    @property
+    def name(self) -> str:
+        """ Returns the name of the simulated library """
+        return 'simulated'
@@ -0,0 +1,197 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Host-side pass/ block filtering of received messages
+
+Devices only offer a handful of hardware filter slots (often ten). A ``FilterEngine`` applies any number
+of ``PassFilter``/ ``BlockFilter`` rules on the host with the ``PASS_FILTER``/ ``BLOCK_FILTER`` semantics
+of J2534: a message is accepted if it matches at least one pass rule and no block rule, and nothing is
+accepted without a pass rule.
+
+Rules are grouped by their mask. Every group is a hash set of masked patterns, so a message costs one
+lookup per distinct mask, not one comparison per rule. When no mask reaches past the four identifier
+bytes the decision only depends on the CAN identifier: it is memoised per identifier and a whole batch is
+decided with a couple of C level passes over the identifiers gathered by ``MessageBatch.arbids``.
+
+Available Classes:
+    FilterEngine: software pass/ block filter set
+"""
+
+from .buffer import MessageBatch
+from .enums import FilterType
+from .filter import Filter
+
+import itertools
+import threading
+
+# identifiers memoised before the cache is reset (a bus with random 29 bit identifiers never repeats)
+CACHE_LIMIT = 1 << 16
+
+
+class _Group(object):
+    """ Rules sharing one mask """
+
+    __slots__ = ('length', 'mask', 'shift', 'passes', 'blocks')
+
+    def __init__(self, length: int, mask: int) -> None:
+        self.length = length
+        self.mask = mask
+        # moves the identifier (first four data bytes) onto masks shorter than four bytes
+        self.shift = 8 * max(4 - length, 0)
+        self.passes = {}
+        self.blocks = {}
+
+
+class FilterEngine(object):
+    """ Software pass/ block filter set
+
+    Safe to use from one thread while another adds or removes rules.
+    """
+
+    def __init__(self, filters=()) -> None:
+        """ Create the engine
+
+        Args:
+            self (FilterEngine): the ``FilterEngine`` instance
+            filters: initial ``PassFilter``/ ``BlockFilter`` rules
+        """
+        self.__lock = threading.Lock()
+        self.__rules = {}
+        self.__handles = itertools.count(1)
+        self.__groups = {}
+        self.__ordered = ()
+        self.__id_only = True
+        self.__cache = {}
+        for filter in filters:
+            self.add(filter)
+
+    def __len__(self) -> int:
+        return len(self.__rules)
+
+    def add(self, filter: Filter) -> int:
+        """ Add a rule
+
+        Flow control filters count as pass rules, like on the device.
+
+        Args:
+            self (FilterEngine): the ``FilterEngine`` instance
+            filter (Filter): the rule
+
+        Returns:
+            a handle for ``remove``
+        """
+        mask = bytes(filter.mask)
+        length = len(mask)
+        mask_value = int.from_bytes(mask, 'big')
+        pattern = int.from_bytes(bytes(filter.patt), 'big') & mask_value
+        block = filter.type == FilterType.BLOCK_FILTER
+        with self.__lock:
+            handle = next(self.__handles)
+            self.__rules[handle] = (length, mask_value, pattern, block)
+            group = self.__groups.get((length, mask_value))
+            if group is None:
+                group = self.__groups[(length, mask_value)] = _Group(length, mask_value)
+            table = group.blocks if block else group.passes
+            table[pattern] = table.get(pattern, 0) + 1
+            self.__changed()
+        return handle
+
+    def remove(self, handle: int) -> None:
+        """ Remove the rule ``handle`` returned by ``add``
+
+        Raises:
+            KeyError: if the handle is unknown
+        """
+        with self.__lock:
+            length, mask_value, pattern, block = self.__rules.pop(handle)
+            group = self.__groups[(length, mask_value)]
+            table = group.blocks if block else group.passes
+            table[pattern] -= 1
+            if not table[pattern]:
+                del table[pattern]
+            if not group.passes and not group.blocks:
+                del self.__groups[(length, mask_value)]
+            self.__changed()
+
+    def clear(self) -> None:
+        """ Remove all rules """
+        with self.__lock:
+            self.__rules.clear()
+            self.__groups.clear()
+            self.__changed()
+
+    def __changed(self) -> None:
+        """ Publish the new groups (block-only groups first so a block decides early) """
+        self.__ordered = tuple(sorted(self.__groups.values(), key=lambda g: not g.blocks))
+        self.__id_only = all(g.length <= 4 for g in self.__ordered)
+        self.__cache = {}
+
+    def __decide_id(self, groups: tuple, arbid: int) -> bool:
+        """ Decision for a message of at least four bytes when no mask is longer than four bytes """
+        passed = False
+        for group in groups:
+            key = (arbid >> group.shift) & group.mask
+            if key in group.blocks:
+                return False
+            if key in group.passes:
+                passed = True
+        return passed
+
+    def matches(self, data) -> bool:
+        """ Returns ``True`` if the message ``data`` (bytes-like, starting with the identifier) is accepted """
+        passed = False
+        size = len(data)
+        for group in self.__ordered:
+            if size < group.length:
+                continue
+            key = int.from_bytes(data[:group.length], 'big') & group.mask
+            if key in group.blocks:
+                return False
+            if key in group.passes:
+                passed = True
+        return passed
+
+    def accepts_id(self, arbid: int) -> bool:
+        """ Returns the memoised decision for a message with identifier ``arbid`` and at least four bytes
+
+        Only meaningful while no mask is longer than four bytes; usable as ``ReceivePump`` predicate.
+        """
+        cache = self.__cache
+        decision = cache.get(arbid)
+        if decision is None:
+            decision = cache[arbid] = self.__decide_id(self.__ordered, arbid)
+        return decision
+
+    def apply(self, batch: MessageBatch, indices=None) -> list[int]:
+        """ Returns the positions of the accepted messages of ``batch`` (nothing is copied)
+
+        Args:
+            self (FilterEngine): the ``FilterEngine`` instance
+            batch (MessageBatch): the received messages
+            indices: positions to consider, all by default
+
+        Returns:
+            the accepted positions in ascending order of ``indices``
+        """
+        groups = self.__ordered
+        if not groups or not batch.count:
+            return []
+        if indices is None:
+            indices = range(batch.count)
+        if not self.__id_only:
+            return [i for i in indices if self.matches(batch.payload(i))]
+
+        arbids = batch.arbids()
+        sizes = batch.sizes()
+        cache = self.__cache
+        if len(cache) > CACHE_LIMIT:
+            cache = self.__cache = {}
+        for arbid in set(arbids).difference(cache):
+            cache[arbid] = self.__decide_id(groups, arbid)
+        if min(sizes) >= 4:
+            if isinstance(indices, range) and indices == range(batch.count):
+                return list(itertools.compress(indices, map(cache.__getitem__, arbids)))
+            return [i for i in indices if cache[arbids[i]]]
+        # messages shorter than the identifier take the general path
+        return [i for i in indices
+                if (cache[arbids[i]] if sizes[i] >= 4 else self.matches(batch.payload(i)))]
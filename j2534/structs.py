@@ -154,7 +154,7 @@ class PASSTHRU_MSG4(struct):
                f' Timestamp: {self.Timestamp}'\
                f' DataSize: {self.DataSize}'\
                f' ExtraDataIndex: {self.ExtraDataIndex}'\
-               f' Data: {bytes(list(self.Data)[:self.DataSize])}'
+               f' Data: {bytes(self.Data[:self.DataSize])}'
 
 
 class PASSTHRU_HDR(struct):
@@ -0,0 +1,140 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" 64 bit device timeline and host clock correlation
+
+``PASSTHRU_MSG`` timestamps are 32 bit microsecond counters that wrap about every 71 minutes. A
+``Timeline`` unwraps them per device into a monotonic 64 bit microsecond count and continuously fits the
+device clock against ``time.monotonic_ns`` with an exponentially weighted least squares regression, which
+costs a handful of float operations per sample and follows drift (temperature, crystal tolerance).
+
+Timestamps are unwrapped against the newest one seen, so reads from any channel of the device keep the
+timeline current; they must not fall behind by more than half the wrap period (about 35 minutes).
+
+Available Classes:
+    Timeline: unwrapped device clock with its host clock estimate
+"""
+
+import threading
+
+WRAP = 1 << 32
+HALF_WRAP = 1 << 31
+# nanoseconds per microsecond, the slope of an ideal device clock
+NOMINAL_RATE = 1000.0
+
+
+class Timeline(object):
+    """ Unwrapped 64 bit device clock of one device and its mapping onto the host clock
+
+    The host estimate is ``host_ns = offset + rate * device_us``. Samples are ``(device timestamp, host
+    time of the read that returned it)``, so the offset includes the mean read latency.
+
+    Attributes:
+        alpha: weight of a new sample in the regression (the memory is about ``1 / alpha`` samples)
+        samples: number of samples observed
+    """
+
+    def __init__(self, alpha: float = 0.01) -> None:
+        """ Create an empty timeline
+
+        Args:
+            self (Timeline): the ``Timeline`` instance
+            alpha (float): weight of a new sample in the regression
+        """
+        self.alpha = alpha
+        self.samples = 0
+        self.__lock = threading.Lock()
+        self.__last = None
+        # samples are kept relative to the first one so the float sums keep their precision
+        self.__x0 = 0
+        self.__y0 = 0
+        self.__mx = 0.0
+        self.__my = 0.0
+        self.__cxx = 0.0
+        self.__cxy = 0.0
+
+    def unwrap(self, timestamp: int) -> int:
+        """ Returns the 64 bit device time of a 32 bit ``timestamp``
+
+        Args:
+            self (Timeline): the ``Timeline`` instance
+            timestamp (int): the ``Timestamp`` of a message
+
+        Returns:
+            the device time in microseconds
+        """
+        with self.__lock:
+            return self.__unwrap(timestamp)
+
+    def __unwrap(self, timestamp: int) -> int:
+        last = self.__last
+        if last is None:
+            self.__last = timestamp
+            return timestamp
+        delta = (timestamp - last) & (WRAP - 1)
+        if delta >= HALF_WRAP:
+            # older than the newest timestamp seen
+            return last + delta - WRAP
+        self.__last = last + delta
+        return self.__last
+
+    def relative(self, timestamp: int, anchor: int) -> int:
+        """ Returns the 64 bit time of ``timestamp`` given the 64 bit time ``anchor`` of a newer message
+
+        Messages of one read are at most a few minutes apart, so this needs no state.
+        """
+        return anchor - ((anchor - timestamp) & (WRAP - 1))
+
+    def observe(self, timestamp: int, host_ns: int) -> int:
+        """ Unwrap ``timestamp`` and add it to the regression as received at ``host_ns``
+
+        Args:
+            self (Timeline): the ``Timeline`` instance
+            timestamp (int): the ``Timestamp`` of the newest message of a read
+            host_ns (int): ``time.monotonic_ns`` right after the read returned
+
+        Returns:
+            the 64 bit device time of ``timestamp``
+        """
+        with self.__lock:
+            device = self.__unwrap(timestamp)
+            if not self.samples:
+                self.__x0 = device
+                self.__y0 = host_ns
+            self.samples += 1
+            # plain averaging until the window is full, exponential forgetting afterwards
+            a = max(1.0 / self.samples, self.alpha)
+            dx = (device - self.__x0) - self.__mx
+            dy = (host_ns - self.__y0) - self.__my
+            self.__mx += a * dx
+            self.__my += a * dy
+            self.__cxx = (1.0 - a) * (self.__cxx + a * dx * dx)
+            self.__cxy = (1.0 - a) * (self.__cxy + a * dx * dy)
+            return device
+
+    @property
+    def rate(self) -> float:
+        """ Host nanoseconds per device microsecond """
+        # a few samples close together say nothing about the rate yet
+        if self.samples < 3 or self.__cxx < 1.0:
+            return NOMINAL_RATE
+        return self.__cxy / self.__cxx
+
+    @property
+    def drift_ppm(self) -> float:
+        """ Deviation of the device clock from the host clock in parts per million """
+        return (self.rate / NOMINAL_RATE - 1.0) * 1e6
+
+    def host_ns(self, device_us: int) -> int:
+        """ Returns the estimated ``time.monotonic_ns`` of the 64 bit device time ``device_us``
+
+        Args:
+            self (Timeline): the ``Timeline`` instance
+            device_us (int): device time in microseconds (from ``unwrap``/ ``observe``)
+
+        Returns:
+            the host time in nanoseconds, ``None`` before the first sample
+        """
+        if not self.samples:
+            return None
+        return self.__y0 + int(self.__my + self.rate * (device_us - self.__x0 - self.__mx))
@@ -0,0 +1,218 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Timeline of DLL calls in the Chrome trace event format
+
+A ``CallTracer`` is a trace hook of an ``Instrumentation`` (``PassThru(..., instrument=True)``) that keeps
+the last ``capacity`` DLL calls in a preallocated ring:
+
+    pt = PassThru(lib, instrument=True)
+    with CallTracer(pt.instrumentation) as tracer:
+        ...
+    tracer.export('calls.json')
+
+The export opens in ``chrome://tracing`` or https://ui.perfetto.dev and shows one row per thread with a
+slice per DLL call and a ``lock wait`` slice whenever a call had to wait for its call lock. Time inside a
+call slice went into the vendor DLL, time in a wait slice into lock contention; gaps between the slices of
+a thread are Python code.
+
+Available Classes:
+    CallTracer: ring buffer of DLL calls with trace event export
+    TraceRecord: one recorded call
+"""
+
+from .concurrency import CHANNEL_PROCS, CHANNEL_OR_DEVICE_PROCS
+from .enums import IoctlId
+from .instrument import PROCS, ERROR_NAMES
+
+import array
+import dataclasses
+import itertools
+import json
+import os
+import threading
+
+# entry points whose third argument points to the number of messages transferred
+_MSG_PROCS = frozenset(('PassThruReadMsgs', 'PassThruWriteMsgs', 'PassThruQueueMsgs'))
+# ioctls addressed to the device instead of a channel
+_DEVICE_IOCTLS = frozenset((IoctlId.READ_PIN_VOLTAGE, IoctlId.READ_PROG_VOLTAGE))
+
+
+@dataclasses.dataclass
+class TraceRecord:
+    """ One DLL call or wait for a call lock
+
+    Fields:
+        name: the entry point, e.g. ``'PassThruReadMsgs'``, or the operation holding the lock (``'write'``)
+        channel: the channel id, -1 for device-wide calls/ the device lock
+        start_ns: ``time.perf_counter_ns`` when the call (wait) started
+        end_ns: ``time.perf_counter_ns`` when the call returned (the lock was acquired)
+        thread: ``threading.get_ident`` of the calling thread
+        msgs: messages transferred by read/ write/ queue calls, -1 otherwise
+        rv: the return code; for waits 0, or -1 if the lock timeout expired
+        wait: ``True`` for the wait of ``name`` for its call lock
+    """
+    name: str
+    channel: int
+    start_ns: int
+    end_ns: int
+    thread: int
+    msgs: int
+    rv: int
+    wait: bool = False
+
+
+def _value(arg) -> int:
+    """ Returns the integer behind a ``ctypes`` argument: a plain value, a pointer or a ``byref`` """
+    if isinstance(arg, int):
+        return arg
+    if hasattr(arg, '_obj'):
+        arg = arg._obj
+    elif hasattr(arg, 'contents'):
+        arg = arg.contents
+    return getattr(arg, 'value', -1)
+
+
+class CallTracer(object):
+    """ Records the DLL calls and lock waits of an ``Instrumentation`` in a fixed-size ring
+
+    Recording costs a few array stores per call; when the ring is full the oldest records are overwritten.
+
+    Attributes:
+        capacity: number of calls kept
+    """
+
+    def __init__(self, instrumentation=None, capacity: int = 65536) -> None:
+        """ Create the tracer and attach it if ``instrumentation`` is given
+
+        Args:
+            self (CallTracer): the ``CallTracer`` instance
+            instrumentation (Instrumentation): the instrumentation whose calls to record
+            capacity (int): number of calls kept
+        """
+        if capacity < 1:
+            raise ValueError(f'Capacity must be positive, got {capacity}')
+        self.capacity = capacity
+        self.__names = list(PROCS)
+        self.__index = {proc: i for i, proc in enumerate(PROCS)}
+        self.__lock = threading.Lock()
+        self.__seq = array.array('q', [-1]) * capacity
+        self.__proc = array.array('H', bytes(2 * capacity))
+        self.__channel = array.array('q', bytes(8 * capacity))
+        self.__start = array.array('q', bytes(8 * capacity))
+        self.__end = array.array('q', bytes(8 * capacity))
+        self.__thread = array.array('Q', bytes(8 * capacity))
+        self.__msgs = array.array('q', bytes(8 * capacity))
+        self.__rv = array.array('q', bytes(8 * capacity))
+        self.__wait = array.array('B', bytes(capacity))
+        self.__counter = itertools.count()
+        self.__instrumentation = None
+        if instrumentation is not None:
+            self.attach(instrumentation)
+
+    def __enter__(self) -> 'CallTracer':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.detach()
+
+    def attach(self, instrumentation) -> None:
+        """ Start recording the calls of ``instrumentation`` """
+        self.detach()
+        instrumentation.add_hook(self.record)
+        instrumentation.add_wait_hook(self.record_wait)
+        self.__instrumentation = instrumentation
+
+    def detach(self) -> None:
+        """ Stop recording; the records are kept """
+        if self.__instrumentation is not None:
+            self.__instrumentation.remove_hook(self.record)
+            self.__instrumentation.remove_wait_hook(self.record_wait)
+            self.__instrumentation = None
+
+    def record(self, name: str, args: tuple, start_ns: int, end_ns: int, rv: int) -> None:
+        """ Trace hook, see ``Instrumentation.add_hook`` """
+        channel = -1
+        if name in CHANNEL_PROCS and args:
+            channel = _value(args[0])
+        elif name in CHANNEL_OR_DEVICE_PROCS and len(args) > 1 and _value(args[1]) not in _DEVICE_IOCTLS:
+            channel = _value(args[0])
+        self.__store(name, channel, start_ns, end_ns, _value(args[2]) if name in _MSG_PROCS else -1, rv, False)
+
+    def record_wait(self, name: str, channel: int, start_ns: int, end_ns: int, acquired: bool) -> None:
+        """ Wait hook, see ``Instrumentation.add_wait_hook`` """
+        self.__store(name, channel, start_ns, end_ns, -1, 0 if acquired else -1, True)
+
+    def __store(self, name: str, channel: int, start_ns: int, end_ns: int, msgs: int, rv: int,
+                wait: bool) -> None:
+        # ``next`` on ``itertools.count`` is atomic, threads never share a slot unless the ring wraps
+        seq = next(self.__counter)
+        i = seq % self.capacity
+        self.__seq[i] = -1
+        index = self.__index.get(name)
+        self.__proc[i] = index if index is not None else self.__intern(name)
+        self.__channel[i] = channel
+        self.__start[i] = start_ns
+        self.__end[i] = end_ns
+        self.__thread[i] = threading.get_ident()
+        self.__msgs[i] = msgs
+        self.__rv[i] = rv
+        self.__wait[i] = wait
+        self.__seq[i] = seq
+
+    def __intern(self, name: str) -> int:
+        """ Returns the index of a name outside ``PROCS``, e.g. an operation holding a lock with ``CallGate.hold`` """
+        with self.__lock:
+            if name not in self.__index:
+                self.__index[name] = len(self.__names)
+                self.__names.append(name)
+            return self.__index[name]
+
+    def clear(self) -> None:
+        """ Drop all records """
+        self.__seq[:] = array.array('q', [-1]) * self.capacity
+
+    def records(self) -> list[TraceRecord]:
+        """ Returns the recorded calls and waits, oldest first """
+        slots = sorted((seq, i) for i, seq in enumerate(self.__seq) if seq >= 0)
+        return [TraceRecord(self.__names[self.__proc[i]], self.__channel[i], self.__start[i], self.__end[i],
+                            self.__thread[i], self.__msgs[i], self.__rv[i], bool(self.__wait[i]))
+                for _, i in slots]
+
+    def events(self) -> list[dict]:
+        """ Returns the records as Chrome trace events, with thread names as metadata events """
+        pid = os.getpid()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        events = []
+        threads = set()
+        for record in self.records():
+            threads.add(record.thread)
+            if record.wait:
+                name = 'lock wait'
+                lock = 'device' if record.channel < 0 else f'channel {record.channel}'
+                args = {'call': record.name, 'lock': lock}
+                if record.rv:
+                    args['timeout'] = True
+            else:
+                name = record.name
+                args = {'rv': ERROR_NAMES.get(record.rv, record.rv)}
+                if record.channel >= 0:
+                    args['channel'] = record.channel
+                if record.msgs >= 0:
+                    args['msgs'] = record.msgs
+            events.append({'name': name, 'cat': 'j2534', 'ph': 'X', 'pid': pid, 'tid': record.thread,
+                           'ts': record.start_ns / 1000, 'dur': (record.end_ns - record.start_ns) / 1000,
+                           'args': args})
+        for thread in sorted(threads):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread,
+                           'args': {'name': names.get(thread, f'thread {thread}')}})
+        return events
+
+    def export(self, file) -> None:
+        """ Write the records as a Chrome trace (JSON object format) to a path or text file object """
+        trace = {'traceEvents': self.events(), 'displayTimeUnit': 'ns'}
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'w', encoding='utf-8') as f:
+                json.dump(trace, f)
+        else:
+            json.dump(trace, file)
@@ -0,0 +1,268 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Unified Diagnostic Services (ISO 14229) client
+
+The client talks through any ISO-TP transport with a ``send(data, timeout)``/ ``recv(timeout)`` pair: an
+``isotp.Iso15765Transport`` on a ``Protocol.ISO15765`` channel or an ``isotp.IsoTpTransport`` on a raw
+``Protocol.CAN`` channel. Response pending answers (NRC 0x78) are handled transparently and an optional
+background thread keeps the diagnostic session alive with TesterPresent.
+
+Downloads stream straight from a bytes-like image (e.g. an ``mmap`` of the file): every TransferData
+request is built in one of two preallocated buffers while the previous one is still in flight.
+
+Available Classes:
+    Service: UDS service identifiers
+    UdsClient: request/ response client for one ECU
+"""
+
+from .errors import IsoTpException, UdsException, UdsNegativeResponseException
+from . import util
+
+import logging
+import mmap
+import threading
+import time
+
+NEGATIVE_RESPONSE = 0x7F
+RESPONSE_PENDING = 0x78
+# positive response SIDs are the request SID with this bit set
+POSITIVE_RESPONSE_OFFSET = 0x40
+# TesterPresent with suppressPosRspMsgIndicationBit set
+TESTER_PRESENT_SUPPRESSED = b'\x3e\x80'
+
+
+class Service(object):
+    """ UDS service identifiers (ISO 14229-1)
+    """
+    DIAGNOSTIC_SESSION_CONTROL = 0x10
+    ECU_RESET = 0x11
+    READ_DATA_BY_IDENTIFIER = 0x22
+    SECURITY_ACCESS = 0x27
+    COMMUNICATION_CONTROL = 0x28
+    WRITE_DATA_BY_IDENTIFIER = 0x2E
+    ROUTINE_CONTROL = 0x31
+    REQUEST_DOWNLOAD = 0x34
+    TRANSFER_DATA = 0x36
+    REQUEST_TRANSFER_EXIT = 0x37
+    TESTER_PRESENT = 0x3E
+    CONTROL_DTC_SETTING = 0x85
+
+
+@util.setup_logging
+class UdsClient(object):
+    """ UDS client for one ECU
+
+    Attributes:
+        p2: time in milliseconds to wait for a response
+        p2star: time in milliseconds to wait after a response pending answer
+    """
+
+    def __init__(self, transport, **kwargs) -> None:
+        """ Create the client
+
+        Args:
+            self (UdsClient): the ``UdsClient`` instance
+            transport: the ISO-TP transport to the ECU
+
+        Keyword Args:
+            p2 (int): response timeout in milliseconds (default 1000)
+            p2star (int): response timeout after NRC 0x78 in milliseconds (default 5000)
+            keepalive (float): TesterPresent interval in seconds, starts the keepalive thread if given
+            loglevel (int): logging level for the logger instance
+        """
+        self.__log.setLevel(kwargs.get('loglevel', logging.WARN))
+        self.transport = transport
+        self.p2 = kwargs.get('p2', 1000)
+        self.p2star = kwargs.get('p2star', 5000)
+        self.__lock = threading.RLock()
+        self.__last = time.monotonic()
+        self.__keepalive = None
+        self.__stop = threading.Event()
+        if kwargs.get('keepalive') is not None:
+            self.start_keepalive(kwargs['keepalive'])
+
+    def __enter__(self) -> 'UdsClient':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop_keepalive()
+
+    def start_keepalive(self, interval: float = 2.0) -> None:
+        """ Send TesterPresent (without response) whenever the ECU has not been addressed for ``interval``
+
+        Args:
+            self (UdsClient): the ``UdsClient`` instance
+            interval (float): seconds between TesterPresent requests
+        """
+        self.stop_keepalive()
+        self.__stop.clear()
+        self.__keepalive = threading.Thread(target=self.__tester_present, args=(interval, ),
+                                            name='uds-keepalive', daemon=True)
+        self.__keepalive.start()
+
+    def stop_keepalive(self) -> None:
+        """ Stop the TesterPresent thread if it runs """
+        if self.__keepalive is not None:
+            self.__stop.set()
+            self.__keepalive.join()
+            self.__keepalive = None
+
+    def __tester_present(self, interval: float) -> None:
+        """ Keepalive thread body """
+        while not self.__stop.wait(max(self.__last + interval - time.monotonic(), interval / 10)):
+            # a request in progress keeps the session alive by itself
+            if not self.__lock.acquire(False):
+                continue
+            try:
+                if time.monotonic() - self.__last >= interval:
+                    self.transport.send(TESTER_PRESENT_SUPPRESSED)
+                    self.__last = time.monotonic()
+            except Exception as e:
+                self.__log.error(f'TesterPresent failed: {e}')
+            finally:
+                self.__lock.release()
+
+    def __response(self, sid: int) -> bytes:
+        """ Wait for the response to service ``sid``, following response pending answers
+
+        Raises:
+            UdsNegativeResponseException: if the ECU answers negatively
+            UdsException: if no response arrives in time
+        """
+        timeout = self.p2
+        while True:
+            try:
+                response = self.transport.recv(timeout)
+            except IsoTpException as e:
+                raise UdsException(f'No response to service 0x{sid:02x} within {timeout} ms') from e
+            self.__last = time.monotonic()
+            if response[0] == NEGATIVE_RESPONSE and len(response) >= 3 and response[1] == sid:
+                if response[2] == RESPONSE_PENDING:
+                    self.__log.debug(f'Service 0x{sid:02x}: response pending')
+                    timeout = self.p2star
+                    continue
+                raise UdsNegativeResponseException(sid, response[2])
+            if response[0] == sid + POSITIVE_RESPONSE_OFFSET:
+                return response
+            self.__log.debug(f'Ignoring unexpected response {bytes(response).hex()} to 0x{sid:02x}')
+
+    def request(self, data) -> bytes:
+        """ Send a request and return the positive response
+
+        Args:
+            self (UdsClient): the ``UdsClient`` instance
+            data: the request, starting with the service identifier
+
+        Returns:
+            the positive response including its service identifier
+
+        Raises:
+            UdsNegativeResponseException: if the ECU answers negatively
+            UdsException: if no response arrives in time
+        """
+        with self.__lock:
+            self.transport.send(data)
+            self.__last = time.monotonic()
+            return self.__response(data[0])
+
+    def diagnostic_session_control(self, session: int) -> bytes:
+        """ Switch to diagnostic ``session`` and return the session parameter record """
+        return self.request(bytes((Service.DIAGNOSTIC_SESSION_CONTROL, session)))[2:]
+
+    def ecu_reset(self, reset_type: int = 0x01) -> None:
+        """ Reset the ECU (``reset_type`` 0x01 = hard reset) """
+        self.request(bytes((Service.ECU_RESET, reset_type)))
+
+    def read_data_by_identifier(self, did: int) -> bytes:
+        """ Returns the data record of ``did`` """
+        return self.request(bytes((Service.READ_DATA_BY_IDENTIFIER, )) + did.to_bytes(2, 'big'))[3:]
+
+    def write_data_by_identifier(self, did: int, data: bytes) -> None:
+        """ Write the data record of ``did`` """
+        self.request(bytes((Service.WRITE_DATA_BY_IDENTIFIER, )) + did.to_bytes(2, 'big') + data)
+
+    def routine_control(self, control: int, routine: int, data: bytes = b'') -> bytes:
+        """ Start (1)/ stop (2)/ query the results (3) of ``routine`` and return the status record """
+        return self.request(bytes((Service.ROUTINE_CONTROL, control)) + routine.to_bytes(2, 'big') + data)[4:]
+
+    def download(self, data, address: int, **kwargs) -> int:
+        """ Download ``data`` to ``address`` with RequestDownload/ TransferData/ RequestTransferExit
+
+        The block length follows the ``maxNumberOfBlockLength`` returned by the ECU (limited by the
+        transport). Each block is prepared while the previous one is in flight.
+
+        Args:
+            self (UdsClient): the ``UdsClient`` instance
+            data: bytes-like image, e.g. an ``mmap``
+            address (int): memory address of the download
+
+        Keyword Args:
+            data_format (int): dataFormatIdentifier (compression/ encryption, default 0x00)
+            address_length (int): bytes of the memory address (default 4)
+            size_length (int): bytes of the memory size (default 4)
+            progress: called as ``progress(done, total)`` after each block
+
+        Returns:
+            the number of blocks transferred
+
+        Raises:
+            UdsNegativeResponseException: if the ECU answers negatively
+            UdsException: on timeouts or unexpected responses
+        """
+        address_length = kwargs.get('address_length', 4)
+        size_length = kwargs.get('size_length', 4)
+        progress = kwargs.get('progress')
+        with memoryview(data).cast('B') as image, self.__lock:
+            length = len(image)
+            response = self.request(bytes((Service.REQUEST_DOWNLOAD, kwargs.get('data_format', 0x00),
+                                           size_length << 4 | address_length))
+                                    + address.to_bytes(address_length, 'big') + length.to_bytes(size_length, 'big'))
+            width = response[1] >> 4
+            block_length = int.from_bytes(response[2:2 + width], 'big')
+            block_length = min(block_length, getattr(self.transport, 'max_length', 4095))
+            if block_length < 3:
+                raise UdsException(f'Unusable maxNumberOfBlockLength {block_length}')
+            chunk = block_length - 2
+            self.__log.info(f'Downloading {length} bytes to 0x{address:x} in blocks of {chunk} bytes')
+
+            # one request in flight, the next one being prepared
+            buffers = (bytearray(block_length), bytearray(block_length))
+            for buffer in buffers:
+                buffer[0] = Service.TRANSFER_DATA
+
+            def prepare(index: int, offset: int) -> memoryview:
+                buffer = buffers[index & 1]
+                size = min(chunk, length - offset)
+                buffer[1] = (index + 1) & 0xFF
+                buffer[2:2 + size] = image[offset:offset + size]
+                return memoryview(buffer)[:2 + size]
+
+            blocks = -(-length // chunk)
+            request = prepare(0, 0) if blocks else None
+            for index in range(blocks):
+                self.transport.send(request)
+                self.__last = time.monotonic()
+                if index + 1 < blocks:
+                    request = prepare(index + 1, (index + 1) * chunk)
+                response = self.__response(Service.TRANSFER_DATA)
+                if len(response) < 2 or response[1] != (index + 1) & 0xFF:
+                    raise UdsException(f'TransferData block {index + 1}: unexpected response {bytes(response).hex()}')
+                if progress is not None:
+                    progress(min((index + 1) * chunk, length), length)
+            self.request(bytes((Service.REQUEST_TRANSFER_EXIT, )))
+        return blocks
+
+    def download_file(self, path: str, address: int, **kwargs) -> int:
+        """ Download the file at ``path`` to ``address`` straight from a memory map (see ``download``)
+
+        Args:
+            self (UdsClient): the ``UdsClient`` instance
+            path (str): the image file
+            address (int): memory address of the download
+
+        Returns:
+            the number of blocks transferred
+        """
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+            return self.download(image, address, **kwargs)
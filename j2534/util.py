@@ -3,9 +3,13 @@
 
 """ Utility functions and decorators for registry lookups and class setups
 
+The registry lookups go through ``discovery.RegistryProvider``; ``discovery.find_library`` also searches
+catalogs and caches the result.
+
 Available Functions:
     find_installed_dlls: get DLL from vendor string
     get_dll_path: get path of the DLL from the registry key
+    spin_until: wait for a ``perf_counter`` deadline with sub-millisecond precision
 
 Available Decorators:
     setup_logging: add ``__log`` to the decorated class
@@ -13,12 +17,15 @@ Available Decorators:
     set_supported_pins: add ``__pins`` to the decorated class
 """
 
-import winreg
+from .errors import PassThruLibraryException
+from . import discovery
+
 import logging
+import time
 
 def find_installed_dlls(api_version: str, vendor: str) -> str:
-    """ Returns all the installed J2534 DLLs from a specific vendor of a specific API version.
-    An empty string will return results from all vendors.
+    """ Returns the registry key of the first installed J2534 DLL from a specific vendor of a specific API
+    version. An empty string will return results from all vendors.
 
     Args:
         api_version (str): Valid J2534 API API version string
@@ -28,12 +35,12 @@ def find_installed_dlls(api_version: str, vendor: str) -> str:
         the first available installation under the input ``api_version``
 
     Raises:
-        OsError: if registry lookup fails
+        PassThruLibraryException: if no matching DLL is registered
     """
-    hkey = winreg.OpenKeyEx(winreg.HKEY_LOCAL_MACHINE, 'SOFTWARE')
-    hkey = winreg.OpenKeyEx(hkey, f'PassThruSupport.{api_version}')
-    available = [winreg.EnumKey(hkey, x) for x in range(0, winreg.QueryInfoKey(hkey)[0])]
-    return list(filter(lambda x: x.lower().startswith(vendor.lower()), available))[0]
+    for library in discovery.RegistryProvider().libraries(api_version):
+        if library.matches(vendor):
+            return library.name
+    raise PassThruLibraryException(f'No {vendor} library implementing API {api_version} registered')
 
 def get_dll_path(api_version: str, key: str) -> str:
     """ Returns path to the DLL matching the key implementing the api_version
@@ -46,11 +53,25 @@ def get_dll_path(api_version: str, key: str) -> str:
         path to the DLL
 
     Raises:
-        OsError: if registry lookup fails
+        PassThruLibraryException: if the key is not registered
+    """
+    for library in discovery.RegistryProvider().libraries(api_version):
+        if library.name == key:
+            return library.path
+    raise PassThruLibraryException(f'{key} implementing API {api_version} is not registered')
+
+def spin_until(deadline: float) -> None:
+    """ Wait until ``time.perf_counter`` reaches ``deadline``, sleeping for all but the last millisecond
+    and spinning for the rest (``time.sleep`` alone overshoots by up to a scheduler tick)
+
+    Args:
+        deadline (float): the ``time.perf_counter`` value to wait for
     """
-    hkey = winreg.OpenKeyEx(winreg.HKEY_LOCAL_MACHINE, 'SOFTWARE')
-    hkey = winreg.OpenKeyEx(hkey, f'PassThruSupport.{api_version}\\{key}')
-    return winreg.QueryValueEx(hkey, 'FunctionLibrary')[0]
+    remaining = deadline - time.perf_counter()
+    if remaining > 0.002:
+        time.sleep(remaining - 0.001)
+    while time.perf_counter() < deadline:
+        pass
 
 def setup_logging(cls: type):
     """ Decorator to setup logging for a class
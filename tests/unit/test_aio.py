@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.aio import AsyncPassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+from j2534.enums import ErrorCode
+import asyncio
+import unittest
+
+class TestAsyncPassThru(unittest.TestCase):
+    """ Unit tests for the ``j2534.aio``"""
+
+    def test_roundtrip(self):
+        bus = SimulatedBus(frame_timing=False, filters=False)
+
+        async def main():
+            async with AsyncPassThru(SimulatedPassThruLibrary, bus=bus) as tx, \
+                    AsyncPassThru(SimulatedPassThruLibrary, bus=bus) as rx:
+                txch = await tx.connect(await tx.open('tx'), Protocol.CAN(500000))
+                rxch = await rx.connect(await rx.open('rx'), Protocol.CAN(500000))
+                empty = await rx.poll(rxch, 4, 5)
+                reader = asyncio.ensure_future(rx.read(rxch, 4, 1000))
+                await tx.write(txch, [b'\x00\x00\x01\x00\xaa'])
+                batch = await reader
+                return empty.status, bytes(batch.payload(0))
+
+        status, payload = asyncio.run(main())
+        self.assertEqual(status, ErrorCode.Err_Timeout)
+        self.assertEqual(payload, b'\x00\x00\x01\x00\xaa')
+
+    def test_concurrent_readers(self):
+        bus = SimulatedBus(frame_timing=False, filters=False)
+        frames = [bytes([0, 0, 1, i, 0xa0 + i]) for i in range(4)]
+
+        async def main():
+            async with AsyncPassThru(SimulatedPassThruLibrary, bus=bus) as tx, \
+                    AsyncPassThru(SimulatedPassThruLibrary, bus=bus) as rx:
+                txch = await tx.connect(await tx.open('tx'), Protocol.CAN(500000))
+                rxch = await rx.connect(await rx.open('rx'), Protocol.CAN(500000))
+                # more readers in flight than the receive pool ring of the channel holds
+                readers = [asyncio.ensure_future(rx.read(rxch, 1, 1000)) for _ in frames]
+                await asyncio.sleep(0.01)
+                for frame in frames:
+                    await tx.write(txch, [frame])
+                batches = await asyncio.gather(*readers)
+                return [bytes(batch.payload(0)) for batch in batches]
+
+        self.assertEqual(sorted(asyncio.run(main())), frames)
+
+    def test_poll_pool(self):
+        bus = SimulatedBus(frame_timing=False, filters=False)
+
+        async def main():
+            async with AsyncPassThru(SimulatedPassThruLibrary, bus=bus, rxdepth=2) as rx:
+                rxch = await rx.connect(await rx.open('rx'), Protocol.CAN(500000))
+                return [await rx.poll(rxch, 4) for _ in range(3)]
+
+        first, second, third = asyncio.run(main())
+        # no wait requested: the status of the DLL is kept
+        self.assertEqual(first.status, ErrorCode.Err_BufferEmpty)
+        # the channel's ring is reused instead of allocating per call
+        self.assertIsNot(first.messages.array, second.messages.array)
+        self.assertIs(first.messages.array, third.messages.array)
+
+if __name__=="__main__":
+    unittest.main()
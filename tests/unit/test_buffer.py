@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.buffer import MessagePool, MessageBatch, ReadResult, msg_array_type, pack_msg4
+from j2534.connection import Message
+from j2534.enums import ErrorCode
+from j2534.structs import PASSTHRU_MSG4
+import ctypes
+import unittest
+
+class TestMessagePool(unittest.TestCase):
+    """ Unit tests for the ``j2534.buffer``"""
+
+    def test_array_type_cached(self):
+        self.assertIs(msg_array_type(PASSTHRU_MSG4, 8), msg_array_type(PASSTHRU_MSG4, 8))
+
+    def test_ring_reuses_arrays(self):
+        pool = MessagePool(depth=2)
+        first = pool.acquire(1, 10).array
+        second = pool.acquire(1, 10).array
+        self.assertIsNot(first, second)
+        self.assertIs(pool.acquire(1, 10).array, first)
+        self.assertEqual(len(first), 16)
+
+    def test_ring_grows(self):
+        pool = MessagePool(depth=1)
+        self.assertEqual(len(pool.acquire(1, 4).array), 4)
+        self.assertEqual(len(pool.acquire(1, 100).array), 128)
+
+    def test_batch_views(self):
+        batch = MessagePool().batch(1, 2)
+        msg = batch.array[1]
+        msg.ProtocolID = 5
+        msg.DataSize = 6
+        ctypes.memmove(msg.Data, b'\x00\x00\x07\xe0\x02\x10', 6)
+        batch.count = 2
+        self.assertEqual(batch.header(1).ProtocolID, 5)
+        self.assertEqual(bytes(batch.payload(1)), b'\x00\x00\x07\xe0\x02\x10')
+        self.assertEqual(len(batch.payload(0)), 0)
+        # views share memory with the array
+        msg.Data[5] = 0x3e
+        self.assertEqual(batch.payload(1)[5], 0x3e)
+        self.assertEqual(len(list(batch)), 2)
+    def test_read_result_keeps_partial_messages(self):
+        batch = MessagePool().batch(1, 4)
+        batch.count = 3
+        result = ReadResult(ErrorCode.Err_Timeout, batch)
+        self.assertTrue(result.timedout)
+        self.assertEqual(len(result), 3)
+        self.assertIs(result.messages, batch)
+    def test_pack_msg4(self):
+        slot = MessagePool(depth=1).acquire(1, 4)
+        msgs = iter([b'\x00\x00\x07\xe0\x01', Message(6, 0, 0x40, 0, b'\x00\x00\x07\xe8', b''), b'\x00'])
+        self.assertEqual(pack_msg4(slot, msgs, 2, 5), 2)
+        self.assertEqual(slot.array[0].ProtocolID, 5)
+        self.assertEqual(bytes(slot.array[0].Data[:slot.array[0].DataSize]), b'\x00\x00\x07\xe0\x01')
+        self.assertEqual((slot.array[1].ProtocolID, slot.array[1].TxFlags, slot.array[1].DataSize), (6, 0x40, 4))
+        # the iterator resumes where the previous chunk stopped
+        self.assertEqual(pack_msg4(slot, msgs, 2, 5), 1)
+
+    def test_message_from_ptmsg(self):
+        msg = PASSTHRU_MSG4(ProtocolID=5, Timestamp=42, DataSize=5, ExtraDataIndex=5)
+        ctypes.memmove(msg.Data, b'\x00\x00\x07\xe8\x7f', 5)
+        self.assertEqual(Message.from_ptmsg(msg), Message(5, 0, 0, 42, b'\x00\x00\x07\xe8\x7f', b''))
+
+if __name__=="__main__":
+    unittest.main()
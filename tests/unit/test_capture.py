@@ -0,0 +1,83 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.capture import CaptureWriter, CaptureReader, RECORD_SIZE
+from j2534.buffer import MessagePool, MessageBatch
+from j2534.structs import PASSTHRU_MSG4
+import ctypes
+import os
+import tempfile
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_capture``
+"""
+
+def batch(frames: list[tuple[int, bytes]]) -> MessageBatch:
+    """ Build a received batch of ``(timestamp, data)`` frames """
+    result = MessagePool(PASSTHRU_MSG4, 1).batch(0, len(frames))
+    for i, (timestamp, data) in enumerate(frames):
+        msg = result.array[i]
+        msg.ProtocolID = 5
+        msg.Timestamp = timestamp
+        msg.DataSize = msg.ExtraDataIndex = len(data)
+        ctypes.memmove(msg.Data, data, len(data))
+    result.count = len(frames)
+    return result
+
+class TestCapture(unittest.TestCase):
+    """ Unit tests for the ``j2534.capture``"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'run.cap')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_roundtrip(self):
+        frames = [(i * 1000, i.to_bytes(4, 'big') + bytes(i % 9)) for i in range(100)]
+        with CaptureWriter(self.path, chunk=1 << 16) as writer:
+            writer.write_batch(batch(frames[:50]))
+            writer.write_batch(batch(frames[50:]), range(50))
+        size = os.path.getsize(self.path)
+        self.assertLess(size, 100 * (RECORD_SIZE + 16) + 64)
+        with CaptureReader(self.path) as reader:
+            read = [(header.Timestamp, bytes(payload)) for header, payload in reader]
+            self.assertEqual(read, frames)
+            self.assertEqual(reader.start_time, 0)
+
+    def test_timestamp_wrap(self):
+        with CaptureWriter(self.path) as writer:
+            writer.write_batch(batch([(0xFFFFFF00, b'\x00\x00\x01\x00'), (0x10, b'\x00\x00\x01\x01')]))
+        with CaptureReader(self.path) as reader:
+            self.assertEqual([header.Time for header, _ in reader], [0xFFFFFF00, 0x100000010])
+
+    def test_seek(self):
+        with CaptureWriter(self.path, index_interval=10000) as writer:
+            for i in range(0, 1000):
+                writer.write_batch(batch([(i * 500, b'\x00\x00\x01\x00' + i.to_bytes(2, 'big'))]))
+        index = os.path.getsize(self.path + '.idx')
+        for rebuilt in (False, True):
+            if rebuilt:
+                os.remove(self.path + '.idx')
+            with CaptureReader(self.path) as reader:
+                times = [header.Time for header, _ in reader.frames(123456, 130000)]
+                self.assertEqual(times, list(range(123500, 130000, 500)))
+                self.assertEqual(reader.find(10**9), reader.size)
+        self.assertEqual(index // 16, 50)
+
+    def test_truncated_tail(self):
+        with CaptureWriter(self.path) as writer:
+            writer.write_batch(batch([(1, b'\x00\x00\x01\x00' + bytes(8))] * 3))
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 8)
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(sum(1 for _ in reader), 2)
+
+    def test_not_a_capture(self):
+        with open(self.path, 'wb') as f:
+            f.write(bytes(64))
+        self.assertRaises(ValueError, CaptureReader, self.path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.concurrency import CallGate, GuardedLibrary
+from j2534.enums import ErrorCode
+from j2534.errors import PassThruApiConcurrentCallException
+import threading
+import time
+import unittest
+
+class _Dll(object):
+    """ Records the channels inside a call at the same time """
+
+    def __init__(self):
+        self.active = set()
+        self.overlap = False
+
+    def PassThruReadMsgs(self, channel, *args):
+        if self.active:
+            self.overlap = True
+        self.active.add(channel)
+        time.sleep(0.02)
+        self.active.discard(channel)
+        return ErrorCode.Status_NoError
+
+    def PassThruIoctl(self, channel, ioctl_id, *args):
+        return ErrorCode.Status_NoError
+
+    def PassThruConnect(self, device, *args):
+        if self.active:
+            self.overlap = True
+        return ErrorCode.Status_NoError
+
+    def PassThruClose(self, device):
+        return ErrorCode.Err_ConcurrentApiCall
+
+class TestCallGate(unittest.TestCase):
+    """ Unit tests for the ``j2534.concurrency``"""
+
+    def _run(self, concurrent):
+        dll = _Dll()
+        lib = GuardedLibrary(dll, CallGate(concurrent))
+        threads = [threading.Thread(target=lib.PassThruReadMsgs, args=(ch, )) for ch in (1, 2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return dll
+
+    def test_serialized_by_default(self):
+        self.assertFalse(self._run(False).overlap)
+
+    def test_concurrent_channels(self):
+        self.assertTrue(self._run(True).overlap)
+
+    def test_timeout_raises(self):
+        gate = CallGate(False, timeout=0.01)
+        lib = GuardedLibrary(_Dll(), gate)
+        with gate.device():
+            t = threading.Thread(target=self.assertRaises,
+                                 args=(PassThruApiConcurrentCallException, lib.PassThruReadMsgs, 1))
+            t.start()
+            t.join()
+        self.assertEqual(gate.stats()['device'].timeouts, 1)
+
+    def test_device_ioctl(self):
+        gate = CallGate(True, timeout=0.01)
+        gate.add_channel(1)
+        lib = GuardedLibrary(_Dll(), gate)
+        with gate.device():
+            results = []
+            # READ_PROG_VOLTAGE on device 7 waits for the device lock, channel ioctls do not
+            t = threading.Thread(target=lambda: results.extend(
+                [lib.PassThruIoctl(1, 0x01), self.assertRaises(PassThruApiConcurrentCallException,
+                                                               lib.PassThruIoctl, 7, 0x0E)]))
+            t.start()
+            t.join()
+        self.assertEqual(results[0], ErrorCode.Status_NoError)
+        self.assertEqual(gate.stats()['device'].timeouts, 1)
+        self.assertNotIn(7, gate.stats())
+        gate.remove_channel(1)
+        self.assertEqual(lib.PassThruIoctl(1, 0x01), ErrorCode.Status_NoError)
+        self.assertEqual(gate.stats()['device'].acquired, 2)
+
+    def test_device_call_excludes_channels(self):
+        dll = _Dll()
+        gate = CallGate(True)
+        gate.add_channel(1)
+        lib = GuardedLibrary(dll, gate)
+        reader = threading.Thread(target=lib.PassThruReadMsgs, args=(1, ))
+        reader.start()
+        time.sleep(0.005)
+        # waits for the read in flight on channel 1
+        self.assertEqual(lib.PassThruConnect(7), ErrorCode.Status_NoError)
+        reader.join()
+        self.assertFalse(dll.overlap)
+        self.assertEqual(gate.stats()[1].contended, 1)
+        # device ioctls too
+        reader = threading.Thread(target=lib.PassThruReadMsgs, args=(1, ))
+        reader.start()
+        time.sleep(0.005)
+        start = time.perf_counter()
+        lib.PassThruIoctl(7, 0x0E)
+        self.assertGreater(time.perf_counter() - start, 0.005)
+        reader.join()
+
+    def test_concurrent_api_call_code(self):
+        lib = GuardedLibrary(_Dll(), CallGate())
+        self.assertRaises(PassThruApiConcurrentCallException, lib.PassThruClose, 1)
+
+    def test_missing_proc(self):
+        self.assertFalse(hasattr(GuardedLibrary(_Dll(), CallGate()), 'PassThruSelect'))
+
+if __name__=="__main__":
+    unittest.main()
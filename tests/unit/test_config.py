@@ -0,0 +1,68 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+from j2534.enums import ConfigParams, IoctlId
+from j2534.structs import SCONFIG, SCONFIG_LIST
+import ctypes
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_config``
+"""
+
+class TestChannelConfig(unittest.TestCase):
+    """ Unit tests for ``PassThru.get_config``/ ``PassThru.set_config``"""
+
+    def setUp(self):
+        self.pt = PassThru(SimulatedPassThruLibrary, bus=SimulatedBus(frame_timing=False), instrument=True)
+        self.device = self.pt.open('sim')
+        self.channel = self.pt.connect(self.device, Protocol.CAN(500000))
+
+    def tearDown(self) -> None:
+        self.pt.close(self.device)
+
+    def ioctls(self) -> int:
+        stats = self.pt.instrumentation.snapshot().get('PassThruIoctl')
+        return stats.calls if stats else 0
+
+    def test_batched_and_cached(self):
+        params = [ConfigParams.DATA_RATE, ConfigParams.ISO15765_BS, ConfigParams.STMIN_TX]
+        self.assertEqual(self.pt.get_config(self.channel, params),
+                         {ConfigParams.DATA_RATE: 500000, ConfigParams.ISO15765_BS: 0, ConfigParams.STMIN_TX: 0})
+        self.assertEqual(self.ioctls(), 1)
+        self.assertEqual(self.pt.get_config(self.channel, params[:2])[ConfigParams.DATA_RATE], 500000)
+        self.assertEqual(self.ioctls(), 1)
+        # only the parameters that change are written, all in one call
+        self.assertEqual(self.pt.set_config(self.channel, {ConfigParams.ISO15765_BS: 8, ConfigParams.STMIN_TX: 0,
+                                                           ConfigParams.ISO15765_STMIN: 2}), 2)
+        self.assertEqual(self.ioctls(), 2)
+        self.assertEqual(self.pt.set_config(self.channel, {ConfigParams.ISO15765_BS: 8}), 0)
+        self.assertEqual(self.ioctls(), 2)
+        self.assertEqual(self.pt.get_config(self.channel, [ConfigParams.ISO15765_STMIN]), {ConfigParams.ISO15765_STMIN: 2})
+        self.assertEqual(self.pt.get_config(self.channel, [ConfigParams.ISO15765_BS], refresh=True),
+                         {ConfigParams.ISO15765_BS: 8})
+        self.assertEqual(self.ioctls(), 3)
+
+    def test_invalidation(self):
+        self.pt.set_config(self.channel, {ConfigParams.ISO15765_BS: 8})
+        # a raw SET_CONFIG bypasses the cache and drops it
+        configs = (SCONFIG * 1)((ConfigParams.ISO15765_BS, 4))
+        self.pt.ioctl(self.channel, IoctlId.SET_CONFIG, SCONFIG_LIST(1, configs))
+        self.assertEqual(self.pt.get_config(self.channel, [ConfigParams.ISO15765_BS]), {ConfigParams.ISO15765_BS: 4})
+        # a new connection starts with the device defaults
+        self.pt.disconnect(self.channel)
+        self.channel = self.pt.connect(self.device, Protocol.CAN(250000))
+        calls = self.ioctls()
+        self.assertEqual(self.pt.get_config(self.channel, [ConfigParams.DATA_RATE, ConfigParams.ISO15765_BS]),
+                         {ConfigParams.DATA_RATE: 250000, ConfigParams.ISO15765_BS: 0})
+        self.assertEqual(self.ioctls(), calls + 1)
+
+    def test_raw_ioctl(self):
+        voltage = ctypes.c_ulong(0)
+        self.pt.ioctl(self.device, IoctlId.READ_PIN_VOLTAGE, None, voltage)
+        self.assertEqual(voltage.value, 12000)
+
+if __name__=="__main__":
+    unittest.main()
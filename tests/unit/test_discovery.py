@@ -0,0 +1,116 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.discovery import CatalogProvider, DiscoveryCache, LibraryInfo, RegistryProvider, find_library
+from j2534.errors import PassThruLibraryException
+from j2534 import util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_discovery``
+"""
+
+class CountingProvider(object):
+    """ Provider answering from a fixed list and counting the lookups """
+
+    def __init__(self, *libraries: LibraryInfo) -> None:
+        self.entries = libraries
+        self.lookups = 0
+
+    def libraries(self, api_version: str) -> list[LibraryInfo]:
+        self.lookups += 1
+        return [library for library in self.entries if library.api_version == api_version]
+
+class TestDiscovery(unittest.TestCase):
+    """ Unit tests for the ``j2534.discovery``"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.lib = self.path('libpassthru.so')
+        open(self.lib, 'wb').close()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp.name, name)
+
+    def test_json_catalog(self):
+        catalog = self.path('catalog.json')
+        with open(catalog, 'w') as f:
+            json.dump({'libraries': [
+                {'name': 'Vector XL', 'vendor': 'Vector', 'api_version': '04.04', 'path': self.lib},
+                {'name': 'neoVI Fire2', 'api_version': '05.00', 'path': '/opt/icsneo.so'},
+            ]}, f)
+        provider = CatalogProvider(catalog)
+        self.assertEqual(provider.libraries('04.04'), [LibraryInfo('Vector XL', 'Vector', '04.04', self.lib)])
+        self.assertEqual(provider.libraries('05.00')[0].vendor, 'neoVI Fire2')
+        self.assertEqual(find_library('04.04', 'vector', [provider], cache=False), self.lib)
+        with self.assertRaises(PassThruLibraryException):
+            find_library('05.00', 'Vector', [provider], cache=False)
+
+    def test_ini_catalog(self):
+        catalog = self.path('catalog.ini')
+        with open(catalog, 'w') as f:
+            f.write(f'[neoVI Fire2]\nvendor = Intrepid\napi_version = 04.04\npath = {self.lib}\n')
+        providers = [CatalogProvider(self.path('missing.json')), CatalogProvider(catalog)]
+        self.assertEqual(find_library('04.04', 'neoVI Fire2', providers, cache=False), self.lib)
+        self.assertEqual(find_library('04.04', 'intrepid', providers, cache=False), self.lib)
+        with open(catalog, 'w') as f:
+            f.write('[broken]\nvendor = Intrepid\n')
+        with self.assertRaises(PassThruLibraryException):
+            CatalogProvider(catalog).libraries('04.04')
+
+    def test_cache(self):
+        provider = CountingProvider(LibraryInfo('Vector XL', 'Vector', '04.04', self.lib))
+        cache = DiscoveryCache(self.path('cache/libraries.json'))
+        self.assertEqual(find_library('04.04', 'Vector', [provider], cache), self.lib)
+        self.assertEqual(find_library('04.04', 'Vector', [provider], cache), self.lib)
+        self.assertEqual(provider.lookups, 1)
+        # a new process reads the file instead of asking the providers
+        self.assertEqual(DiscoveryCache(cache.path).get('04.04', 'vector'), self.lib)
+        # entries of removed libraries are dropped
+        os.remove(self.lib)
+        self.assertIsNone(DiscoveryCache(cache.path).get('04.04', 'Vector'))
+        with self.assertRaises(PassThruLibraryException):
+            find_library('04.04', 'Vector', [CountingProvider()], cache)
+        cache.put('04.04', 'Vector', '/opt/other.so')
+        cache.clear()
+        self.assertIsNone(DiscoveryCache(cache.path).get('04.04', 'Vector'))
+
+    def test_cache_follows_catalogs(self):
+        other = self.path('libother.so')
+        open(other, 'wb').close()
+        catalog, pinned = self.path('catalog.json'), self.path('pinned.json')
+        for path, lib in ((catalog, self.lib), (pinned, other)):
+            with open(path, 'w') as f:
+                json.dump([{'name': 'Vector XL', 'api_version': '04.04', 'path': lib}], f)
+        cache = DiscoveryCache(self.path('libraries.json'))
+        self.assertEqual(find_library('04.04', 'Vector', [CatalogProvider(catalog)], cache), self.lib)
+        # a catalog pinned in front wins over the cached entry
+        providers = [CatalogProvider(pinned), CatalogProvider(catalog)]
+        self.assertEqual(find_library('04.04', 'Vector', providers, cache), other)
+        # so does an edit of the catalog
+        with open(catalog, 'w') as f:
+            json.dump([{'name': 'Vector XL', 'api_version': '04.04', 'path': other}], f)
+        os.utime(catalog, ns=(0, 0))
+        self.assertEqual(find_library('04.04', 'Vector', [CatalogProvider(catalog)], cache), other)
+        self.assertEqual(DiscoveryCache(cache.path).get('04.04', 'Vector', CatalogProvider(catalog).stamp()), other)
+
+    def test_no_registry(self):
+        if sys.platform != 'win32':
+            self.assertEqual(RegistryProvider().libraries('04.04'), [])
+            with self.assertRaises(PassThruLibraryException):
+                util.find_installed_dlls('04.04', 'Vector')
+
+    def test_lazy_package(self):
+        code = 'import sys, j2534; print("j2534.vector" in sys.modules, j2534.VectorPassThruXLLibrary.VENDOR)'
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.split(), ['False', 'Vector'])
+
+if __name__=="__main__":
+    unittest.main()
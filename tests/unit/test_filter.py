@@ -2,6 +2,10 @@
 # -*- coding: utf-8 -*-
 
 import j2534.filter as filter
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+from j2534.enums import ProtocolId
 import unittest
 
 class TestFilters(unittest.TestCase):
@@ -16,5 +20,50 @@ class TestFilters(unittest.TestCase):
     def test_FilterMsg_tomsg4(self):
         filter.Filter.to_msg4(1, 2, 3, 4, [], [])
 
+    def test_msg4_cached(self):
+        fc = filter.FlowCtrlFilter(pattern=0x7e8, mask=0xFFFFFFFF, flow=0x7e0, protocol=ProtocolId.CAN)
+        mask, pattern, flow = fc.msg4
+        self.assertIs(fc._cached_msg4()[0], fc._cached_msg4()[0])
+        self.assertEqual((mask.ProtocolID, mask.DataSize), (ProtocolId.CAN, 4))
+        self.assertEqual(bytes(pattern.Data[:4]), b'\x00\x00\x07\xe8')
+        self.assertEqual(bytes(flow.Data[:4]), b'\x00\x00\x07\xe0')
+
+    def test_msg4_copy(self):
+        fc = filter.FlowCtrlFilter(pattern=0x7e8, mask=0xFFFFFFFF, flow=0x7e0, protocol=ProtocolId.CAN)
+        mask, pattern, flow = fc.msg4
+        pattern.Data[3] = 0xe9
+        flow.DataSize = 2
+        mask.ProtocolID = ProtocolId.ISO15765
+        self.assertEqual(bytes(fc.msg4[1].Data[:4]), b'\x00\x00\x07\xe8')
+        self.assertEqual([msg.DataSize for msg in fc._cached_msg4()], [4, 4, 4])
+        self.assertEqual(fc._cached_msg4()[0].ProtocolID, ProtocolId.CAN)
+        self.assertIsNone(filter.PassFilter(ProtocolId.CAN, 0x7FF, 0x100).msg4[2])
+
+    def test_msg4_follows_fields(self):
+        fc = filter.FlowCtrlFilter(pattern=0x7e8, mask=0xFFFFFFFF, flow=0x7e0, protocol=ProtocolId.CAN)
+        fc._cached_msg4()
+        fc.protocol = ProtocolId.ISO15765
+        fc.patt = filter._field(0x7e9, 4)
+        mask, pattern, flow = fc._cached_msg4()
+        self.assertEqual((mask.ProtocolID, pattern.ProtocolID), (ProtocolId.ISO15765, ProtocolId.ISO15765))
+        self.assertEqual(bytes(pattern.Data[:4]), b'\x00\x00\x07\xe9')
+        pf = filter.PassFilter(ProtocolId.CAN, 0x7FF, 0x100)
+        pf.msg4
+        pf.txflags = 0x40
+        self.assertEqual(pf.msg4[0].TxFlags, 0x40)
+
+    def test_set_filters(self):
+        pt = PassThru(SimulatedPassThruLibrary, bus=SimulatedBus(frame_timing=False))
+        device = pt.open('dev')
+        try:
+            filters = [filter.FlowCtrlFilter(pattern=0x7e8 + i, mask=0xFFFFFFFF, flow=0x7e0 + i) for i in range(4)]
+            for _ in range(2):
+                channel = pt.connect(device, Protocol.ISO15765(500000, Protocol.CAN.STANDARD_ID))
+                ids = pt.set_filters(channel, filters)
+                self.assertEqual(len(set(ids)), 4)
+                pt.disconnect(channel)
+        finally:
+            pt.close(device)
+
 if __name__=="__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,99 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.filtermanager import FilterManager
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus, MAX_FILTERS
+from j2534.protocols import Protocol
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_filtermanager``
+"""
+
+class TestFilterManager(unittest.TestCase):
+    """ Unit tests for the ``j2534.filtermanager``"""
+
+    def setUp(self):
+        self.bus = SimulatedBus(frame_timing=False)
+        self.tx = PassThru(SimulatedPassThruLibrary, bus=self.bus)
+        self.rx = PassThru(SimulatedPassThruLibrary, bus=self.bus)
+        self.txdev, self.rxdev = self.tx.open('tx'), self.rx.open('rx')
+        self.txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        self.rxch = self.rx.connect(self.rxdev, Protocol.CAN(500000))
+
+    def tearDown(self):
+        self.tx.close(self.txdev)
+        self.rx.close(self.rxdev)
+
+    def received(self, manager: FilterManager) -> tuple[set, set]:
+        """ Send every 11 bit identifier once, returns the identifiers let through by the device and the host """
+        self.tx.write(self.txch, [arbid.to_bytes(4, 'big') for arbid in range(0x800)])
+        device, host = set(), set()
+        while True:
+            result = self.rx.poll(self.rxch, 256)
+            if not result.messages:
+                break
+            device.update(result.messages.arbids())
+            host.update(result.messages.arbid(i) for i in manager.apply(result.messages))
+        return device, host
+
+    def test_exact(self):
+        manager = FilterManager(self.rx, self.rxch)
+        manager.update(ids=[0x7E8, 0x7E9, 0x7EA, 0x7EB], ranges=[(0x100, 0x1FF), (0x180, 0x23F)])
+        self.assertTrue(manager.exact)
+        self.assertEqual(manager.overhead, 0)
+        self.assertLessEqual(len(manager.filters), 4)
+        device, host = self.received(manager)
+        wanted = {0x7E8, 0x7E9, 0x7EA, 0x7EB} | set(range(0x100, 0x240))
+        self.assertEqual(device, wanted)
+        self.assertEqual(host, wanted)
+
+    def test_spill(self):
+        manager = FilterManager(self.rx, self.rxch, slots=4)
+        wanted = {0x101, 0x123, 0x1A0, 0x2F0, 0x310, 0x5FF, 0x600, 0x7DF, 0x7E8}
+        manager.update(ids=wanted)
+        self.assertFalse(manager.exact)
+        self.assertEqual(len(manager.filters), 4)
+        device, host = self.received(manager)
+        self.assertLessEqual(wanted, device)
+        self.assertEqual(len(device) - len(wanted), manager.overhead)
+        self.assertEqual(host, wanted)
+        self.assertTrue(manager.accepts_id(0x7E8))
+        self.assertFalse(manager.accepts_id(0x7E9))
+
+    def test_diff(self):
+        manager = FilterManager(self.rx, self.rxch)
+        manager.update(ids=[0x101, 0x202, 0x304])
+        calls = []
+        start, stop = self.rx.set_filter, self.rx.stop_msg_filter
+        self.rx.set_filter = lambda *args: calls.append('start') or start(*args)
+        self.rx.stop_msg_filter = lambda *args: calls.append('stop') or stop(*args)
+        manager.update(ids=[0x101, 0x202, 0x408])
+        self.assertEqual(calls, ['start', 'stop'])
+        calls.clear()
+        manager.update(ids=[0x101, 0x202, 0x408])
+        self.assertEqual(calls, [])
+        manager.clear()
+        self.assertEqual(calls, ['stop'] * 3)
+        self.assertEqual(manager.filters, [])
+
+    def test_device_limit(self):
+        manager = FilterManager(self.rx, self.rxch, slots=MAX_FILTERS + 4)
+        wanted = {i * 0x3B7 % 0x800 for i in range(1, 40)}
+        manager.update(ids=wanted)
+        self.assertEqual(manager.slots, MAX_FILTERS)
+        self.assertEqual(len(manager.filters), MAX_FILTERS)
+        device, host = self.received(manager)
+        self.assertEqual(host, wanted)
+
+    def test_invalid(self):
+        manager = FilterManager(self.rx, self.rxch)
+        with self.assertRaises(ValueError):
+            manager.update(ids=[0x800])
+        with self.assertRaises(ValueError):
+            manager.update(ranges=[(0x200, 0x100)])
+        with self.assertRaises(ValueError):
+            FilterManager(self.rx, self.rxch, slots=0)
+
+if __name__ == "__main__":
+    unittest.main()
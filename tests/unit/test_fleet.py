@@ -0,0 +1,81 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.fleet import Fleet
+from j2534.simulated import SimulatedPassThruLibrary
+from j2534.protocols import Protocol
+from j2534.filter import PassFilter
+from j2534.enums import ErrorCode, ProtocolId
+from j2534.errors import FleetException, PassThruInterfaceException, PassThruLibraryException
+from j2534.selector import ChannelSelector
+import os
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_fleet``
+"""
+
+class TestFleet(unittest.TestCase):
+    """ Unit tests for the ``j2534.fleet``"""
+
+    def setUp(self):
+        self.fleet = Fleet(depth=2, slot_size=64)
+
+    def tearDown(self):
+        self.fleet.close()
+
+    def loopback(self, name: str):
+        """ A worker with two devices on its private simulated bus """
+        proxy = self.fleet.spawn(name, SimulatedPassThruLibrary)
+        txdev, rxdev = proxy.open('tx'), proxy.open('rx')
+        txch = proxy.connect(txdev, Protocol.CAN(500000))
+        rxch = proxy.connect(rxdev, Protocol.CAN(500000))
+        return proxy, txch, rxch
+
+    def test_roundtrip(self):
+        proxy, txch, rxch = self.loopback('rig1')
+        self.assertEqual(proxy.readversion(1), ('1.0.0', '1.0.0', '04.04'))
+        proxy.set_filter(rxch, PassFilter(ProtocolId.CAN, 0x700, 0x700))
+        payloads = [(0x7E0 + i % 2).to_bytes(4, 'big') + bytes([i]) for i in range(100)]
+        self.assertEqual(proxy.write(txch, payloads + [b'\x00\x00\x01\x00']), 101)
+        first = proxy.read(rxch, 100, 100)
+        self.assertEqual(len(first), 64)
+        second = proxy.poll(rxch, 36, 100)
+        self.assertEqual([bytes(p) for p in first.payloads] + [bytes(p) for p in second.messages.payloads], payloads)
+        self.assertEqual(second.status, ErrorCode.Status_NoError)
+        self.assertFalse(proxy.poll(rxch, 10).messages)
+        with self.assertRaises(PassThruInterfaceException) as cm:
+            proxy.read(rxch, 1, 0)
+        self.assertEqual(cm.exception.code, ErrorCode.Err_BufferEmpty)
+
+        metrics = proxy.metrics()
+        self.assertTrue(metrics.alive)
+        self.assertNotEqual(metrics.pid, os.getpid())
+        self.assertEqual(metrics.frames_read, 100)
+        self.assertEqual(metrics.frames_written, 101)
+        self.assertEqual(metrics.errors, 1)
+        self.assertGreater(metrics.rpc_mean_us, 0)
+
+    def test_workers(self):
+        proxies = [self.loopback(f'rig{i}') for i in range(3)]
+        self.assertEqual(len({proxy.metrics().pid for proxy, _, _ in proxies}), 3)
+        # the proxies work with the helpers written for ``PassThru``
+        proxy, txch, rxch = proxies[1]
+        proxy.set_filter(rxch, PassFilter(ProtocolId.CAN, 0, 0))
+        proxy.write(txch, [b'\x00\x00\x01\x00\x01'])
+        ready = ChannelSelector(proxy, [rxch]).wait(100)
+        self.assertEqual([(channel, len(result)) for channel, result in ready], [(rxch, 1)])
+        self.assertEqual(sorted(self.fleet.metrics()), ['rig0', 'rig1', 'rig2'])
+        with self.assertRaises(FleetException):
+            self.fleet.spawn('rig0', SimulatedPassThruLibrary)
+
+    def test_dead_worker(self):
+        proxy, txch, _ = self.loopback('rig')
+        proxy.shutdown()
+        self.assertFalse(proxy.alive)
+        with self.assertRaises(FleetException):
+            proxy.write(txch, [b'\x00\x00\x01\x00'])
+        with self.assertRaises(PassThruLibraryException):
+            self.fleet.spawn('bad', SimulatedPassThruLibrary, apiversion='05.00')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.instrument import Instrumentation, LATENCY_BUCKETS
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+from j2534.errors import PassThruInterfaceException
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_instrument``
+"""
+
+class TestInstrumentation(unittest.TestCase):
+    """ Unit tests for the ``j2534.instrument``"""
+
+    def setUp(self):
+        bus = SimulatedBus(frame_timing=False, filters=False)
+        self.shared = Instrumentation()
+        self.tx = PassThru(SimulatedPassThruLibrary, bus=bus, instrument=self.shared)
+        self.rx = PassThru(SimulatedPassThruLibrary, bus=bus, instrument=self.shared)
+        self.txdev = self.tx.open('tx')
+        self.rxdev = self.rx.open('rx')
+        self.txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        self.rxch = self.rx.connect(self.rxdev, Protocol.CAN(500000))
+
+    def tearDown(self) -> None:
+        self.tx.close(self.txdev)
+        self.rx.close(self.rxdev)
+
+    def test_counters(self):
+        self.tx.write(self.txch, [b'\x00\x00\x01\x00\x01'] * 3)
+        self.assertEqual(len(self.rx.read(self.rxch, 3, 0)), 3)
+        with self.assertRaises(PassThruInterfaceException):
+            self.rx.read(self.rxch, 1, 0)
+        stats = self.tx.instrumentation.snapshot()
+        self.assertEqual(stats['PassThruOpen'].calls, 2)
+        self.assertEqual(stats['PassThruWriteMsgs'].calls, 1)
+        read = stats['PassThruReadMsgs']
+        self.assertEqual((read.calls, read.errors), (2, 1))
+        self.assertEqual(read.error_codes, {'Err_BufferEmpty': 1})
+        self.assertEqual(len(read.latency), LATENCY_BUCKETS)
+        self.assertEqual(sum(read.latency), 2)
+        self.assertGreater(read.mean_ns, 0)
+        self.assertGreaterEqual(read.max_ns, read.mean_ns)
+        self.assertNotIn('PassThruIoctl', stats)
+        self.shared.reset()
+        self.assertEqual(self.shared.snapshot(), {})
+
+    def test_hooks(self):
+        calls = []
+
+        def hook(name, args, start, end, rv):
+            calls.append((name, rv))
+            self.assertLessEqual(start, end)
+
+        def broken(*args):
+            raise RuntimeError('hook failure must not break the call')
+
+        self.shared.add_hook(hook)
+        self.shared.add_hook(broken)
+        with self.assertLogs('j2534.instrument', 'ERROR'):
+            self.tx.write(self.txch, [b'\x00\x00\x01\x00'])
+        self.shared.remove_hook(hook)
+        self.shared.remove_hook(broken)
+        self.rx.read(self.rxch, 1, 0)
+        self.assertEqual(calls, [('PassThruWriteMsgs', 0)])
+        with self.assertRaises(ValueError):
+            self.shared.remove_hook(hook)
+
+    def test_unnamed_codes(self):
+        instrumentation = Instrumentation()
+        codes = iter((0x30, 0x31, 0x200, 0x09))
+        read = instrumentation.wrap('PassThruReadMsgs', lambda *args: next(codes))
+        for _ in range(4):
+            read()
+        stats = instrumentation.snapshot()['PassThruReadMsgs']
+        self.assertEqual(stats.errors, 4)
+        self.assertEqual(stats.error_codes, {'Err_Timeout': 1, 'other': 3})
+
+    def test_disabled(self):
+        self.assertIsNone(PassThru(SimulatedPassThruLibrary).instrumentation)
+
+if __name__=="__main__":
+    unittest.main()
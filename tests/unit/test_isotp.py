@@ -0,0 +1,85 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.interface import PassThru
+from j2534.isotp import IsoTpTransport
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+from j2534.errors import IsoTpException
+import concurrent.futures
+import time
+import unittest
+
+class _SerializedLibrary(SimulatedPassThruLibrary):
+    """ Simulated library serializing all calls of a device, like most vendor DLLs """
+
+    CONCURRENT_CHANNELS = False
+
+class TestIsoTpTransport(unittest.TestCase):
+    """ Unit tests for the ``j2534.isotp``"""
+
+    def setUp(self):
+        bus = SimulatedBus(frame_timing=False, filters=False)
+        self.a = PassThru(SimulatedPassThruLibrary, bus=bus)
+        self.b = PassThru(SimulatedPassThruLibrary, bus=bus)
+        self.adev = self.a.open('a')
+        self.bdev = self.b.open('b')
+        self.ach = self.a.connect(self.adev, Protocol.CAN(500000))
+        self.bch = self.b.connect(self.bdev, Protocol.CAN(500000))
+        self.pool = concurrent.futures.ThreadPoolExecutor(1)
+
+    def tearDown(self) -> None:
+        self.pool.shutdown()
+        self.a.close(self.adev)
+        self.b.close(self.bdev)
+
+    def _transfer(self, payload: bytes, **kwargs) -> bytes:
+        tx = IsoTpTransport(self.a, self.ach, 0x7e0, 0x7e8)
+        rx = IsoTpTransport(self.b, self.bch, 0x7e8, 0x7e0, **kwargs)
+        received = self.pool.submit(rx.recv, 2000)
+        tx.send(payload)
+        return bytes(received.result())
+
+    def test_single_frame(self):
+        self.assertEqual(self._transfer(b'\x3e\x00'), b'\x3e\x00')
+
+    def test_segmented_with_blocks(self):
+        payload = bytes(range(256)) * 4
+        self.assertEqual(self._transfer(payload, bs=8), payload)
+
+    def test_stmin(self):
+        payload = bytes(range(40))
+        self.assertEqual(self._transfer(payload, bs=2, stmin=0xF5), payload)
+
+    def test_escape_sequence(self):
+        payload = bytes(range(256)) * 20
+        self.assertEqual(self._transfer(payload), payload)
+
+    def test_flow_control_timeout(self):
+        tx = IsoTpTransport(self.a, self.ach, 0x7e0, 0x7e8, timeout=20)
+        self.assertRaises(IsoTpException, tx.send, bytes(20))
+
+    def test_recv_leaves_device_free(self):
+        pt = PassThru(_SerializedLibrary, bus=SimulatedBus(frame_timing=False, filters=False))
+        device = pt.open('serialized')
+        channel = pt.connect(device, Protocol.CAN(500000))
+        other = pt.connect(device, Protocol.CAN(500000))
+        rx = IsoTpTransport(pt, channel, 0x7e8, 0x7e0)
+        try:
+            # nothing arrives, the receive waits out its timeout
+            received = self.pool.submit(self.assertRaises, IsoTpException, rx.recv, 200)
+            time.sleep(0.01)
+            slowest = 0
+            for _ in range(20):
+                start = time.perf_counter()
+                pt.write(other, [b'\x00\x00\x01\x00'])
+                slowest = max(slowest, time.perf_counter() - start)
+                time.sleep(0.005)
+            received.result()
+        finally:
+            pt.close(device)
+        # a read blocking for the whole receive timeout would hold the device lock
+        self.assertLess(slowest, 0.02)
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.library import LibraryRegistry, SharedLibrary, registry
+from j2534.interface import PassThru
+from j2534.errors import PassThruApiNotSupportedException, PassThruInterfaceException, PassThruLibraryException
+from j2534 import api
+import ctypes.util
+import gc
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_library``
+"""
+
+# any shared library will do for the loader, it just exports no PassThru function
+LIBM = ctypes.util.find_library('m') or ctypes.util.find_library('c')
+
+# minimal library exporting two entry points, to check the prototypes of the shared handle
+STUB = '''
+long PassThruOpen(void *name, unsigned long *device) { *device = 1; return 0; }
+long PassThruClose(unsigned long device) { return device == 1 ? 0 : 0x1A; }
+'''
+
+@unittest.skipIf(LIBM is None, 'no shared library to load')
+class TestLibraryRegistry(unittest.TestCase):
+    """ Unit tests for the ``j2534.library``"""
+
+    def test_refcount(self):
+        libraries = LibraryRegistry()
+        a = libraries.acquire(LIBM, api.V4)
+        b = libraries.acquire(LIBM, api.V4)
+        self.assertIs(a, b)
+        self.assertEqual(libraries.loaded(), {(LIBM, api.V4): 2})
+        # prototypes are per API version, so is the handle
+        c = libraries.acquire(LIBM, api.V5)
+        self.assertIsNot(c, a)
+        libraries.release(a)
+        self.assertIsNotNone(b.dll)
+        libraries.release(b)
+        libraries.release(b)
+        self.assertIsNone(a.dll)
+        self.assertEqual(libraries.loaded(), {(LIBM, api.V5): 1})
+        libraries.release(c)
+        self.assertEqual(libraries.loaded(), {})
+        with self.assertRaises(PassThruLibraryException):
+            libraries.acquire('/nonexistent/libj2534.so')
+        self.assertEqual(libraries.loaded(), {})
+
+    @unittest.skipIf(shutil.which('cc') is None, 'no C compiler')
+    def test_prototypes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'stub.c')
+            path = os.path.join(tmp, 'libstub.so')
+            with open(source, 'w') as f:
+                f.write(STUB)
+            subprocess.run(['cc', '-shared', '-fPIC', '-o', path, source], check=True)
+            libraries = LibraryRegistry()
+            handle = libraries.acquire(path, api.V4)
+            defs = {proc: (args, res) for proc, args, res in api.get_defs_for_version(api.V4)}
+            for proc in ('PassThruOpen', 'PassThruClose'):
+                func = getattr(handle.dll, proc)
+                self.assertEqual((tuple(func.argtypes), func.restype), (tuple(defs[proc][0]), defs[proc][1]))
+            # the prototypes hold across PassThru instances sharing the handle
+            pt = PassThru(path)
+            device = pt.open('stub')
+            pt.close(device)
+            libraries.release(handle)
+
+    def test_shared_library(self):
+        first = SharedLibrary(dll=LIBM)
+        second = SharedLibrary(dll=LIBM)
+        self.assertIs(first.dll, second.dll)
+        self.assertEqual(registry.loaded()[(LIBM, api.V4)], 2)
+        first.release()
+        self.assertIsNone(first.dll)
+        del second
+        gc.collect()
+        self.assertNotIn((LIBM, api.V4), registry.loaded())
+        with self.assertRaises(PassThruLibraryException):
+            SharedLibrary()
+
+    def test_passthru_path(self):
+        pt = PassThru(LIBM)
+        self.assertEqual(pt.dll, LIBM)
+        with self.assertRaises(PassThruApiNotSupportedException):
+            pt.open()
+        with self.assertRaises(PassThruInterfaceException):
+            PassThru(object)
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.periodic import PeriodicScheduler
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus, MAX_PERIODIC_MSGS
+from j2534.protocols import Protocol
+import collections
+import time
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_periodic``
+"""
+
+class TestPeriodicScheduler(unittest.TestCase):
+    """ Unit tests for the ``j2534.periodic``"""
+
+    def setUp(self):
+        self.bus = SimulatedBus(frame_timing=False, filters=False, rx_depth=1 << 16)
+        self.tx = PassThru(SimulatedPassThruLibrary, bus=self.bus)
+        self.rx = PassThru(SimulatedPassThruLibrary, bus=self.bus)
+        self.txdev, self.rxdev = self.tx.open('tx'), self.rx.open('rx')
+        self.txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        self.rxch = self.rx.connect(self.rxdev, Protocol.CAN(500000))
+
+    def tearDown(self):
+        self.tx.close(self.txdev)
+        self.rx.close(self.rxdev)
+
+    def received(self) -> list[bytes]:
+        frames = []
+        while True:
+            result = self.rx.poll(self.rxch, 1024)
+            if not result.messages:
+                return frames
+            frames.extend(bytes(payload) for payload in result.messages.payloads)
+
+    def test_hybrid(self):
+        scheduler = PeriodicScheduler(self.tx, self.txch, hardware=MAX_PERIODIC_MSGS + 2)
+        messages = [scheduler.add(arbid.to_bytes(4, 'big') + bytes(8), 10 if arbid % 2 else 20)
+                    for arbid in range(0x100, 0x100 + 30)]
+        self.assertEqual(sum(m.hardware for m in messages), MAX_PERIODIC_MSGS + 2)
+        with scheduler:
+            time.sleep(0.2)
+            stats = scheduler.stats()
+        # the device has fewer slots than configured, the rest moved to the host
+        self.assertEqual(scheduler.hardware, MAX_PERIODIC_MSGS)
+        self.assertEqual((stats.hardware, stats.software), (MAX_PERIODIC_MSGS, 30 - MAX_PERIODIC_MSGS))
+        counts = collections.Counter(int.from_bytes(frame[:4], 'big') for frame in self.received())
+        for message in messages:
+            expected = 200 / message.period
+            self.assertAlmostEqual(counts[int.from_bytes(message.data[:4], 'big')], expected, delta=expected * 0.25)
+        # due messages share a write
+        self.assertLess(stats.writes, stats.frames / 5)
+        self.assertEqual(stats.errors, 0)
+        self.assertEqual(self.received(), [])
+
+    def test_update(self):
+        def rolling_counter(message):
+            message.data[4] = (message.data[4] + 1) & 0xFF
+            message.data[5] = sum(message.data[:5]) & 0xFF
+
+        scheduler = PeriodicScheduler(self.tx, self.txch)
+        counter = scheduler.add(b'\x00\x00\x02\x00\xFF\x00', 5, update=rolling_counter)
+        static = scheduler.add(b'\x00\x00\x03\x00\x01', 5, hardware=False)
+        self.assertFalse(counter.hardware or static.hardware)
+        with scheduler:
+            time.sleep(0.05)
+            scheduler.set_payload(static, b'\x00\x00\x03\x00\x02')
+            time.sleep(0.05)
+        frames = self.received()
+        counters = [frame[4] for frame in frames if frame[:4] == b'\x00\x00\x02\x00']
+        self.assertEqual(counters, list(range(len(counters))))
+        self.assertTrue(all(frame[5] == sum(frame[:5]) & 0xFF for frame in frames if frame[:4] == b'\x00\x00\x02\x00'))
+        statics = [frame[4] for frame in frames if frame[:4] == b'\x00\x00\x03\x00']
+        self.assertEqual(statics, sorted(statics))
+        self.assertEqual({statics[0], statics[-1]}, {1, 2})
+        self.assertEqual(counter.count, len(counters))
+
+    def test_jitter(self):
+        scheduler = PeriodicScheduler(self.tx, self.txch, hardware=0)
+        periods = (10, 20, 50, 100)
+        for i in range(160):
+            scheduler.add((0x400 + i).to_bytes(4, 'big') + bytes(8), periods[i % 4], offset=i % 7)
+        with scheduler:
+            time.sleep(0.5)
+            stats = scheduler.stats()
+        self.assertEqual(stats.software, 160)
+        self.assertAlmostEqual(stats.frames, sum(500 / periods[i % 4] for i in range(160)), delta=200)
+        self.assertLess(stats.jitter_mean_us, 1000)
+        self.assertEqual(stats.missed, 0)
+
+    def test_remove(self):
+        scheduler = PeriodicScheduler(self.tx, self.txch)
+        hardware = scheduler.add(b'\x00\x00\x05\x00', 10)
+        software = scheduler.add(b'\x00\x00\x06\x00', 10, hardware=False)
+        with scheduler:
+            time.sleep(0.03)
+            scheduler.remove(hardware)
+            scheduler.remove(software)
+            # a write of the last tick may still be in flight
+            time.sleep(0.005)
+            self.received()
+            time.sleep(0.03)
+            self.assertEqual(self.received(), [])
+            with self.assertRaises(ValueError):
+                scheduler.remove(software)
+        with self.assertRaises(ValueError):
+            scheduler.add(b'\x00\x00\x06\x00', 0)
+
+if __name__ == "__main__":
+    unittest.main()
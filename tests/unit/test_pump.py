@@ -0,0 +1,126 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.pump import ReceivePump
+from j2534.buffer import ReadResult
+from j2534.enums import ErrorCode
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+from j2534 import api
+import ctypes
+import threading
+import time
+import unittest
+
+class _SerializedLibrary(SimulatedPassThruLibrary):
+    """ Simulated library serializing all calls of a device, like most vendor DLLs """
+
+    CONCURRENT_CHANNELS = False
+
+class _FakePassThru(object):
+    """ Delivers ``frames`` CAN IDs once, then reports an empty queue """
+
+    apiversion = api.V4
+    concurrent_channels = False
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def poll(self, channel, msgs, timeout, batch):
+        count = 0
+        while self.frames and count < msgs:
+            msg = batch.array[count]
+            msg.DataSize = 4
+            ctypes.memmove(msg.Data, self.frames.pop(0).to_bytes(4, 'big'), 4)
+            count += 1
+        batch.count = count
+        return ReadResult(ErrorCode.Status_NoError if count else ErrorCode.Err_Timeout, batch)
+
+class TestReceivePump(unittest.TestCase):
+    """ Unit tests for the ``j2534.pump``"""
+
+    def test_dispatch_with_predicate(self):
+        pt = _FakePassThru([0x7e0, 0x7e8, 0x100, 0x7e8])
+        everything, diag = [], []
+        done = threading.Event()
+
+        def on_diag(batch, indices):
+            diag.extend(batch.arbid(i) for i in indices)
+            done.set()
+
+        pump = ReceivePump(pt, 1, msgs=8, idle_wait=1)
+        pump.subscribe(lambda batch, indices: everything.extend(indices))
+        pump.subscribe(on_diag, lambda arbid: arbid == 0x7e8)
+        with pump:
+            self.assertTrue(done.wait(2))
+        self.assertEqual(diag, [0x7e8, 0x7e8])
+        self.assertEqual(everything, [0, 1, 2, 3])
+        stats = pump.stats
+        self.assertEqual((stats.batches, stats.frames, stats.dropped_frames), (1, 4, 0))
+        self.assertEqual(stats.batch_sizes[3], 1)
+
+    def test_drops_when_queue_full(self):
+        pt = _FakePassThru(range(0x100, 0x105))
+        release = threading.Event()
+        pump = ReceivePump(pt, 1, msgs=1, maxsize=1, idle_wait=1)
+        pump.subscribe(lambda batch, indices: release.wait(2))
+        with pump:
+            deadline = time.monotonic() + 2
+            while pump.stats.batches + pump.stats.dropped_batches < 5 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            stats = pump.stats
+            release.set()
+        # one batch in the subscriber, at most one in the queue, the rest is dropped
+        self.assertEqual(stats.batches + stats.dropped_batches, 5)
+        self.assertGreaterEqual(stats.dropped_batches, 3)
+        self.assertEqual(stats.dropped_frames, stats.dropped_batches)
+        self.assertLessEqual(stats.max_queue_depth, 1)
+
+    def test_idle_pump_leaves_device_free(self):
+        pt = PassThru(_SerializedLibrary, bus=SimulatedBus(frame_timing=False, filters=False))
+        device = pt.open('sim')
+        # different protocols, the pumped channel stays idle
+        idle = pt.connect(device, Protocol.ISO15765(500000, Protocol.CAN.STANDARD_ID))
+        busy = pt.connect(device, Protocol.CAN(500000))
+        try:
+            with ReceivePump(pt, idle, idle_wait=20):
+                time.sleep(0.01)
+                slowest = 0
+                for _ in range(50):
+                    start = time.perf_counter()
+                    pt.write(busy, [b'\x00\x00\x01\x00'])
+                    slowest = max(slowest, time.perf_counter() - start)
+        finally:
+            pt.close(device)
+        # a blocking read in the pump would hold the device lock for most of its timeout
+        self.assertLess(slowest, 0.015)
+        self.assertEqual(pt.lock_stats['device'].timeouts, 0)
+
+    def test_blocking_read_on_concurrent_channels(self):
+        bus = SimulatedBus(frame_timing=False, filters=False)
+        pt = PassThru(SimulatedPassThruLibrary, bus=bus, instrument=True)
+        tx = PassThru(SimulatedPassThruLibrary, bus=bus)
+        device, txdev = pt.open('rx'), tx.open('tx')
+        channel = pt.connect(device, Protocol.CAN(500000))
+        txch = tx.connect(txdev, Protocol.CAN(500000))
+        received = threading.Event()
+        try:
+            with ReceivePump(pt, channel, timeout=1000) as pump:
+                pump.subscribe(lambda batch, indices: received.set())
+                time.sleep(0.1)
+                # idle: one drain and one blocking read, not a poll per millisecond
+                reads = pt.instrumentation.snapshot()['PassThruReadMsgs'].calls
+                sent = time.perf_counter()
+                tx.write(txch, [b'\x00\x00\x01\x00'])
+                self.assertTrue(received.wait(1))
+                latency = time.perf_counter() - sent
+        finally:
+            pt.close(device)
+            tx.close(txdev)
+        self.assertLessEqual(reads, 4)
+        # the blocking read returns with the frame, not at its timeout
+        self.assertLess(latency, 0.1)
+
+if __name__=="__main__":
+    unittest.main()
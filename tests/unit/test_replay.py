@@ -0,0 +1,74 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.interface import PassThru
+from j2534.capture import CaptureWriter, CaptureReader
+from j2534.replay import Replayer
+from j2534.structs import PASSTHRU_HDR
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+from j2534.enums import ProtocolId
+import os
+import tempfile
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_replay``
+"""
+
+class TestReplayer(unittest.TestCase):
+    """ Unit tests for the ``j2534.replay``"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'run.cap')
+        with CaptureWriter(self.path) as writer:
+            for i in range(40):
+                header = PASSTHRU_HDR(ProtocolID=ProtocolId.CAN, Timestamp=i * 2000)
+                writer.write(header, (0x100 + i % 4).to_bytes(4, 'big') + bytes((i, )))
+        bus = SimulatedBus(frame_timing=False, filters=False)
+        self.tx = PassThru(SimulatedPassThruLibrary, bus=bus)
+        self.rx = PassThru(SimulatedPassThruLibrary, bus=bus)
+        self.txdev = self.tx.open('tx')
+        self.rxdev = self.rx.open('rx')
+        self.txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        self.rxch = self.rx.connect(self.rxdev, Protocol.CAN(500000))
+
+    def tearDown(self) -> None:
+        self.tx.close(self.txdev)
+        self.rx.close(self.rxdev)
+        self.tmp.cleanup()
+
+    def received(self) -> list[bytes]:
+        result = self.rx.poll(self.rxch, 100)
+        return [bytes(p) for p in result.messages.payloads]
+
+    def test_bulk_remap_and_filter(self):
+        replayer = Replayer(self.tx, self.txch, realtime=False, chunk=8, remap={0x101: 0x7ff},
+                            predicate=lambda arbid: arbid != 0x103)
+        with CaptureReader(self.path) as reader:
+            stats = replayer.replay(reader)
+        self.assertEqual((stats.frames, stats.sent, stats.skipped, stats.writes), (40, 30, 10, 4))
+        frames = self.received()
+        self.assertEqual(len(frames), 30)
+        self.assertEqual(frames[1], b'\x00\x00\x07\xff\x01')
+        self.assertEqual(sum(1 for f in frames if f[:4] == b'\x00\x00\x01\x01'), 0)
+
+    def test_realtime(self):
+        replayer = Replayer(self.tx, self.txch)
+        with CaptureReader(self.path) as reader:
+            stats = replayer.replay(reader.frames(reader.start_time + 20000))
+        self.assertEqual(stats.sent, 30)
+        self.assertGreaterEqual(stats.duration, 0.058)
+        self.assertLess(stats.duration, 0.5)
+        self.assertEqual(sum(stats.jitter_histogram), 30)
+        self.assertEqual(self.received()[0][4], 10)
+
+    def test_speed(self):
+        replayer = Replayer(self.tx, self.txch, speed=4.0)
+        with CaptureReader(self.path) as reader:
+            stats = replayer.replay(reader)
+        self.assertLess(stats.duration, 0.06)
+        self.assertEqual(len(self.received()), 40)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.selector import ChannelSelector
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+from j2534.errors import PassThruInterfaceException
+from j2534.filter import PassFilter
+from j2534.enums import ProtocolId, ErrorCode
+from j2534.buffer import MessagePool, ReadResult
+from j2534 import api
+import threading
+import time
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_selector``
+"""
+
+class _SerializedLibrary(SimulatedPassThruLibrary):
+    """ Simulated library serializing all calls of a device, like most vendor DLLs """
+
+    CONCURRENT_CHANNELS = False
+
+class _SelectPassThru(object):
+    """ v05.00 stand-in: channel 2 becomes readable after ``calls`` selects """
+
+    apiversion = api.V5
+
+    def __init__(self, calls):
+        self.calls = calls
+        self.timeouts = []
+        self.pool = MessagePool()
+
+    def select(self, channels, timeout):
+        self.timeouts.append(timeout)
+        return [2] if len(self.timeouts) > self.calls and 2 in channels else []
+
+    def poll(self, channel, msgs, timeout):
+        batch = self.pool.batch(channel, msgs)
+        batch.count = 1 if channel == 2 and len(self.timeouts) > self.calls else 0
+        return ReadResult(ErrorCode.Status_NoError if batch.count else ErrorCode.Err_BufferEmpty, batch)
+
+class TestChannelSelector(unittest.TestCase):
+    """ Unit tests for the ``j2534.selector``"""
+
+    def setUp(self):
+        self.bus = SimulatedBus(frame_timing=False)
+        self.tx = PassThru(SimulatedPassThruLibrary, bus=self.bus)
+        self.rx = PassThru(SimulatedPassThruLibrary, bus=self.bus)
+        self.txdev, self.rxdev = self.tx.open('tx'), self.rx.open('rx')
+        self.txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        # one channel per identifier, like a logger watching several buses
+        self.rxchs = []
+        for arbid in range(0x100, 0x106):
+            channel = self.rx.connect(self.rxdev, Protocol.CAN(500000))
+            self.rx.set_filter(channel, PassFilter(ProtocolId.CAN, 0x7FF, arbid))
+            self.rxchs.append(channel)
+
+    def tearDown(self):
+        self.tx.close(self.txdev)
+        self.rx.close(self.rxdev)
+
+    def test_idle(self):
+        selector = ChannelSelector(self.rx, self.rxchs)
+        start, cpu = time.perf_counter(), time.process_time()
+        self.assertEqual(selector.wait(200), [])
+        elapsed = time.perf_counter() - start
+        self.assertGreaterEqual(elapsed, 0.19)
+        # blocked in the DLL rather than spinning
+        self.assertLess(time.process_time() - cpu, elapsed / 2)
+
+    def test_ready(self):
+        selector = ChannelSelector(self.rx, self.rxchs)
+        self.tx.write(self.txch, [b'\x00\x00\x01\x02\x01', b'\x00\x00\x01\x05\x02', b'\x00\x00\x01\x05\x03'])
+        ready = selector.wait(100)
+        self.assertEqual(sorted((channel, len(result)) for channel, result in ready),
+                         [(self.rxchs[2], 1), (self.rxchs[5], 2)])
+        self.assertEqual(selector.wait(0), [])
+
+    def test_latency(self):
+        selector = ChannelSelector(self.rx, self.rxchs, max_backoff=8)
+        # make channel 3 the busiest one
+        self.tx.write(self.txch, [b'\x00\x00\x01\x03\x00'] * 4)
+        selector.wait(10)
+        self.assertEqual(selector.wait(30), [])
+        latency = {}
+        for arbid in (0x103, 0x101):
+            sent = []
+            timer = threading.Timer(0.05, lambda: sent.append(time.perf_counter()) or
+                                    self.tx.write(self.txch, [arbid.to_bytes(4, 'big')]))
+            timer.start()
+            ready = selector.wait(1000)
+            latency[arbid] = time.perf_counter() - sent[0]
+            timer.join()
+            self.assertEqual([channel for channel, _ in ready], [self.rxchs[arbid - 0x100]])
+        # the busy channel wakes the wait, the others are seen within the longest backoff
+        self.assertLess(latency[0x103], 0.005)
+        self.assertLess(latency[0x101], 0.015)
+
+    def test_device_free(self):
+        rx = PassThru(_SerializedLibrary, bus=self.bus)
+        device = rx.open('serialized')
+        channel = rx.connect(device, Protocol.CAN(500000))
+        selector = ChannelSelector(rx, [channel], min_backoff=64, max_backoff=64)
+        waiter = threading.Thread(target=selector.wait, args=(300, ))
+        waiter.start()
+        time.sleep(0.02)
+        slowest = 0
+        for _ in range(10):
+            start = time.perf_counter()
+            rx.readversion(device)
+            slowest = max(slowest, time.perf_counter() - start)
+            time.sleep(0.005)
+        waiter.join()
+        rx.close(device)
+        # the idle wait blocks in reads of ``max_block`` milliseconds, not for the whole backoff
+        self.assertLess(slowest, 0.02)
+
+    def test_select(self):
+        pt = _SelectPassThru(calls=5)
+        selector = ChannelSelector(pt, [1, 2, 3], max_block=2)
+        ready = selector.wait(1000)
+        self.assertEqual([(channel, len(result)) for channel, result in ready], [(2, 1)])
+        # ``PassThruSelect`` is called in slices of ``max_block``
+        self.assertEqual(len(pt.timeouts), 6)
+        self.assertTrue(all(timeout <= 2 for timeout in pt.timeouts))
+        self.assertEqual(ChannelSelector(_SelectPassThru(calls=10 ** 6), [1]).wait(20), [])
+
+    def test_channels(self):
+        selector = ChannelSelector(self.rx)
+        with self.assertRaises(PassThruInterfaceException):
+            selector.wait(0)
+        selector.add(self.rxchs[0])
+        selector.add(self.rxchs[0])
+        self.assertEqual(selector.channels, [self.rxchs[0]])
+        selector.remove(self.rxchs[0])
+        with self.assertRaises(ValueError):
+            selector.remove(self.rxchs[0])
+
+if __name__ == "__main__":
+    unittest.main()
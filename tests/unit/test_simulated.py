@@ -0,0 +1,92 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus, can_frame_bits
+from j2534.protocols import Protocol
+from j2534.filter import FlowCtrlFilter
+from j2534.enums import ErrorCode
+from j2534.errors import PassThruInterfaceException
+from j2534.buffer import MessagePool
+import time
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_simulated``
+"""
+
+def can(id: int, payload: bytes = b'') -> bytes:
+    return id.to_bytes(4, 'big') + payload
+
+class TestSimulatedPassThru(unittest.TestCase):
+    """ Unit tests for the ``j2534.simulated``"""
+
+    def setUp(self):
+        self.bus = SimulatedBus(frame_timing=False)
+        self.tx = PassThru(SimulatedPassThruLibrary, bus=self.bus)
+        self.rx = PassThru(SimulatedPassThruLibrary, bus=self.bus)
+        self.txdev = self.tx.open('tx')
+        self.rxdev = self.rx.open('rx')
+
+    def tearDown(self) -> None:
+        self.tx.close(self.txdev)
+        self.rx.close(self.rxdev)
+
+    def test_readversion(self):
+        self.assertEqual(self.tx.readversion(self.txdev)[2], '04.04')
+
+    def test_filtered_loopback(self):
+        iso = Protocol.ISO15765(500000, Protocol.CAN.STANDARD_ID)
+        txch = self.tx.connect(self.txdev, iso)
+        rxch = self.rx.connect(self.rxdev, iso)
+        self.assertRaises(PassThruInterfaceException, self.rx.read, rxch, 1, 0)
+        self.rx.set_filter(rxch, FlowCtrlFilter(pattern=0x7e8, mask=0xFFFFFFFF, flow=0x7e0))
+        self.assertEqual(self.tx.write(txch, [can(0x7e8, b'\x02\x10\x03'), can(0x7e9, b'\x01')]), 2)
+        result = self.rx.poll(rxch, 4, 10)
+        self.assertEqual(result.status, ErrorCode.Err_Timeout)
+        self.assertEqual([bytes(p) for p in result.messages.payloads], [can(0x7e8, b'\x02\x10\x03')])
+
+    def test_can_ids_and_payloads(self):
+        self.bus.filters = False
+        txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        rxch = self.rx.connect(self.rxdev, Protocol.CAN(500000))
+        self.tx.write(txch, [b'\x01', b'\x02\x03'], ids=[0x100, 0x200])
+        batch = self.rx.read(rxch, 2, 10)
+        self.assertEqual([batch.arbid(i) for i in range(2)], [0x100, 0x200])
+        self.assertEqual(bytes(batch.payload(1)), can(0x200, b'\x02\x03'))
+        # nothing is sent when the ids do not pair up with the payloads
+        self.assertRaises(ValueError, self.tx.write, txch, [b'\x01', b'\x02'], ids=iter([0x100]))
+        self.assertEqual(self.rx.poll(rxch, 2).count, 0)
+
+    def test_rx_overflow(self):
+        self.bus.filters = False
+        self.bus.rx_depth = 4
+        txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        rxch = self.rx.connect(self.rxdev, Protocol.CAN(500000))
+        self.tx.write(txch, [can(0x100)] * 6)
+        result = self.rx.poll(rxch, 8)
+        self.assertTrue(result.overflow)
+        self.assertEqual(result.count, 4)
+
+    def test_short_batch(self):
+        self.bus.filters = False
+        txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        rxch = self.rx.connect(self.rxdev, Protocol.CAN(500000))
+        self.tx.write(txch, [can(0x100)] * 4)
+        batch = MessagePool().batch(rxch, 2)
+        # the DLL must never be asked for more messages than the batch holds
+        for read in (self.rx.read, self.rx.poll):
+            with self.assertRaises(ValueError):
+                read(rxch, len(batch.array) + 1, 0, batch)
+        self.assertEqual(self.rx.poll(rxch, len(batch.array), 0, batch).count, min(len(batch.array), 4))
+
+    def test_frame_timing(self):
+        self.bus.frame_timing = True
+        self.bus.filters = False
+        txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        start = time.perf_counter()
+        self.tx.write(txch, [can(0x100, bytes(8))] * 100, timeout=1000)
+        elapsed = time.perf_counter() - start
+        self.assertGreaterEqual(elapsed, 100 * can_frame_bits(8) / 500000)
+
+if __name__=="__main__":
+    unittest.main()
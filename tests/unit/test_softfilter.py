@@ -0,0 +1,106 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.softfilter import FilterEngine
+from j2534.filter import BlockFilter, PassFilter
+from j2534.enums import FilterType, ProtocolId
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_softfilter``
+"""
+
+def frame(arbid: int, *data: int) -> bytes:
+    return arbid.to_bytes(4, 'big') + bytes(data)
+
+class TestSoftFilter(unittest.TestCase):
+    """ Unit tests for the ``j2534.softfilter``"""
+
+    def test_filters(self):
+        self.assertEqual(PassFilter(ProtocolId.CAN, 0x7FF, 0x7E8).type, FilterType.PASS_FILTER)
+        self.assertEqual(BlockFilter(ProtocolId.CAN, 0x7FF, 0x7E8).type, FilterType.BLOCK_FILTER)
+        self.assertEqual(bytes(PassFilter(ProtocolId.CAN, b'\xFF\xFF', b'\x12\x34').mask), b'\xFF\xFF')
+        with self.assertRaises(ValueError):
+            PassFilter(ProtocolId.CAN, b'\xFF\xFF', b'\x12')
+
+    def test_semantics(self):
+        engine = FilterEngine()
+        # nothing passes without a pass rule
+        self.assertFalse(engine.matches(frame(0x7E8)))
+        engine.add(PassFilter(ProtocolId.CAN, 0x700, 0x700))
+        block = engine.add(BlockFilter(ProtocolId.CAN, 0x7FF, 0x7DF))
+        self.assertTrue(engine.matches(frame(0x7E8, 1, 2)))
+        self.assertFalse(engine.matches(frame(0x7DF)))
+        self.assertFalse(engine.matches(frame(0x6E8)))
+        self.assertTrue(engine.accepts_id(0x7E8))
+        self.assertFalse(engine.accepts_id(0x7DF))
+        engine.remove(block)
+        self.assertTrue(engine.accepts_id(0x7DF))
+        self.assertEqual(len(engine), 1)
+        with self.assertRaises(KeyError):
+            engine.remove(block)
+        engine.clear()
+        self.assertFalse(engine.matches(frame(0x7E8)))
+
+    def test_long_masks(self):
+        # pass positive responses to ReadDataByIdentifier of 0x7E8 only
+        engine = FilterEngine([PassFilter(ProtocolId.CAN, b'\x00\x00\x07\xFF\x00\xFF', b'\x00\x00\x07\xE8\x00\x62')])
+        self.assertTrue(engine.matches(frame(0x7E8, 0x04, 0x62, 0xF1, 0x90)))
+        self.assertFalse(engine.matches(frame(0x7E8, 0x03, 0x7F, 0x22, 0x31)))
+        # shorter than the mask
+        self.assertFalse(engine.matches(frame(0x7E8, 0x04)))
+
+    def test_many_rules(self):
+        engine = FilterEngine(PassFilter(ProtocolId.CAN, 0x1FFFFFFF, arbid) for arbid in range(0x100, 0x500))
+        engine.add(BlockFilter(ProtocolId.CAN, 0x1FFFFF00, 0x200))
+        self.assertEqual(len(engine), 0x401)
+        accepted = [arbid for arbid in range(0x600) if engine.accepts_id(arbid)]
+        self.assertEqual(accepted, list(range(0x100, 0x200)) + list(range(0x300, 0x500)))
+
+    def test_apply(self):
+        bus = SimulatedBus(frame_timing=False, filters=False)
+        tx = PassThru(SimulatedPassThruLibrary, bus=bus)
+        rx = PassThru(SimulatedPassThruLibrary, bus=bus)
+        txdev, rxdev = tx.open('tx'), rx.open('rx')
+        try:
+            txch = tx.connect(txdev, Protocol.CAN(500000))
+            rxch = rx.connect(rxdev, Protocol.CAN(500000))
+            msgs = [frame(0x700 + i % 0x20, i & 0xFF) for i in range(64)]
+            tx.write(txch, msgs)
+            batch = rx.read(rxch, len(msgs), 100)
+            self.assertEqual(len(batch), len(msgs))
+            engine = FilterEngine([PassFilter(ProtocolId.CAN, 0x7F0, 0x700), PassFilter(ProtocolId.CAN, 0x7FF, 0x71F)])
+            engine.add(BlockFilter(ProtocolId.CAN, 0x7FF, 0x705))
+            expected = [i for i, msg in enumerate(msgs) if engine.matches(msg)]
+            self.assertEqual(engine.apply(batch), expected)
+            self.assertNotIn(5, expected)
+            self.assertEqual(engine.apply(batch, range(0, len(msgs), 2)), [i for i in expected if i % 2 == 0])
+            engine.add(PassFilter(ProtocolId.CAN, b'\x00\x00\x00\x00\xFF', b'\x00\x00\x00\x00\x3F'))
+            self.assertEqual(engine.apply(batch), [i for i, msg in enumerate(msgs) if engine.matches(msg)])
+        finally:
+            tx.close(txdev)
+            rx.close(rxdev)
+
+    def test_device_filters(self):
+        bus = SimulatedBus(frame_timing=False)
+        tx = PassThru(SimulatedPassThruLibrary, bus=bus)
+        rx = PassThru(SimulatedPassThruLibrary, bus=bus)
+        txdev, rxdev = tx.open('tx'), rx.open('rx')
+        try:
+            txch = tx.connect(txdev, Protocol.CAN(500000))
+            rxch = rx.connect(rxdev, Protocol.CAN(500000))
+            filters = [PassFilter(ProtocolId.CAN, 0x700, 0x700), BlockFilter(ProtocolId.CAN, 0x7FF, 0x7DF)]
+            rx.set_filters(rxch, filters)
+            msgs = [frame(0x7E8, 1), frame(0x7DF, 2), frame(0x123, 3), frame(0x7E0, 4)]
+            tx.write(txch, msgs)
+            received = [bytes(payload) for payload in rx.read(rxch, 2, 50).payloads]
+            # the host engine agrees with the device
+            self.assertEqual(received, [msg for msg in msgs if FilterEngine(filters).matches(msg)])
+        finally:
+            tx.close(txdev)
+            rx.close(rxdev)
+
+if __name__ == "__main__":
+    unittest.main()
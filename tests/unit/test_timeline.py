@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.timeline import Timeline
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+import time
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_timeline``
+"""
+
+class TestTimeline(unittest.TestCase):
+    """ Unit tests for the ``j2534.timeline``"""
+
+    def test_unwrap(self):
+        timeline = Timeline()
+        self.assertEqual(timeline.unwrap(0xFFFFFF00), 0xFFFFFF00)
+        self.assertEqual(timeline.unwrap(0x10), 0x100000010)
+        # late message from before the wrap
+        self.assertEqual(timeline.unwrap(0xFFFFFFF0), 0xFFFFFFF0)
+        self.assertEqual(timeline.unwrap(0x20), 0x100000020)
+        self.assertEqual(timeline.relative(0xFFFFFFFF, 0x100000020), 0xFFFFFFFF)
+
+    def test_drift(self):
+        timeline = Timeline(alpha=0.05)
+        # device clock 50 ppm fast, wrapping, with host jitter of a few microseconds
+        for i in range(2000):
+            device = 0xF0000000 + i * 100000
+            host = 5_000_000_000 + int(i * 100000 * 1000 / 1.00005) + (i * 7919) % 5000
+            self.assertEqual(timeline.observe(device & 0xFFFFFFFF, host), device)
+        self.assertAlmostEqual(timeline.drift_ppm, -50, delta=2)
+        expected = 5_000_000_000 + int(1999 * 100000 * 1000 / 1.00005)
+        self.assertAlmostEqual(timeline.host_ns(0xF0000000 + 1999 * 100000), expected, delta=10000)
+
+    def test_receive_path(self):
+        bus = SimulatedBus(frame_timing=False, filters=False)
+        tx = PassThru(SimulatedPassThruLibrary, bus=bus)
+        rx = PassThru(SimulatedPassThruLibrary, bus=bus)
+        txdev, rxdev = tx.open('tx'), rx.open('rx')
+        try:
+            txch = tx.connect(txdev, Protocol.CAN(500000))
+            rxch = rx.connect(rxdev, Protocol.CAN(500000))
+            for _ in range(5):
+                tx.write(txch, [b'\x00\x00\x01\x00\x01'] * 3)
+                sent = time.monotonic_ns()
+                batch = rx.read(rxch, 3, 100)
+                self.assertIs(batch.timeline, rx.timeline(rxch))
+                self.assertEqual(batch.device_time(0) & 0xFFFFFFFF, batch[0].Timestamp)
+                self.assertAlmostEqual(batch.host_time(2), sent, delta=50_000_000)
+            self.assertEqual(rx.timeline(rxch).samples, 5)
+        finally:
+            tx.close(txdev)
+            rx.close(rxdev)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.tracing import CallTracer
+from j2534.interface import PassThru
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+import io
+import time
+import json
+import threading
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_tracing``
+"""
+
+class _SerializedLibrary(SimulatedPassThruLibrary):
+    """ Simulated library serializing all calls of a device, like most vendor DLLs """
+
+    CONCURRENT_CHANNELS = False
+
+class TestCallTracer(unittest.TestCase):
+    """ Unit tests for the ``j2534.tracing``"""
+
+    def setUp(self):
+        bus = SimulatedBus(frame_timing=False, filters=False)
+        self.tx = PassThru(SimulatedPassThruLibrary, bus=bus, instrument=True)
+        self.rx = PassThru(SimulatedPassThruLibrary, bus=bus, instrument=self.tx.instrumentation)
+        self.txdev = self.tx.open('tx')
+        self.rxdev = self.rx.open('rx')
+        self.txch = self.tx.connect(self.txdev, Protocol.CAN(500000))
+        self.rxch = self.rx.connect(self.rxdev, Protocol.CAN(500000))
+
+    def tearDown(self) -> None:
+        self.tx.close(self.txdev)
+        self.rx.close(self.rxdev)
+
+    def test_records(self):
+        with CallTracer(self.tx.instrumentation) as tracer:
+            self.tx.write(self.txch, [b'\x00\x00\x01\x00\x01'] * 3)
+            self.rx.poll(self.rxch, 8, 0)
+        self.tx.write(self.txch, [b'\x00\x00\x01\x00'])
+        write, read = tracer.records()
+        self.assertEqual((write.name, write.channel, write.msgs, write.rv), ('PassThruWriteMsgs', self.txch, 3, 0))
+        self.assertEqual((read.name, read.channel, read.msgs), ('PassThruReadMsgs', self.rxch, 3))
+        self.assertEqual(read.thread, threading.get_ident())
+        self.assertLessEqual(write.start_ns, write.end_ns)
+        self.assertLessEqual(write.end_ns, read.start_ns)
+        tracer.clear()
+        self.assertEqual(tracer.records(), [])
+
+    def test_ring(self):
+        tracer = CallTracer(self.tx.instrumentation, capacity=4)
+        for _ in range(10):
+            self.tx.poll(self.txch, 1, 0)
+        self.tx.close(self.txdev)
+        self.txdev = self.tx.open('tx')
+        tracer.detach()
+        records = tracer.records()
+        self.assertEqual([r.name for r in records], ['PassThruReadMsgs'] * 2 + ['PassThruClose', 'PassThruOpen'])
+        self.assertEqual(records[-1].channel, -1)
+        self.assertEqual(records[0].rv, 0x10)
+
+    def test_export(self):
+        tracer = CallTracer(self.tx.instrumentation)
+        worker = threading.Thread(target=self.rx.poll, args=(self.rxch, 1, 0), name='reader')
+        worker.start()
+        worker.join()
+        self.tx.write(self.txch, [b'\x00\x00\x01\x00'])
+        out = io.StringIO()
+        tracer.export(out)
+        events = json.loads(out.getvalue())['traceEvents']
+        calls = [e for e in events if e['ph'] == 'X']
+        self.assertEqual([e['name'] for e in calls], ['PassThruReadMsgs', 'PassThruWriteMsgs'])
+        self.assertEqual(calls[0]['args'], {'rv': 'Err_BufferEmpty', 'channel': self.rxch, 'msgs': 0})
+        self.assertGreaterEqual(calls[1]['dur'], 0)
+        names = {e['tid']: e['args']['name'] for e in events if e['ph'] == 'M'}
+        self.assertEqual(names[threading.get_ident()], threading.current_thread().name)
+        self.assertEqual(len(names), 2)
+
+    def test_lock_wait(self):
+        pt = PassThru(_SerializedLibrary, bus=SimulatedBus(frame_timing=False, filters=False), instrument=True,
+                      call_latency=0.005)
+        device = pt.open('slow')
+        channel = pt.connect(device, Protocol.CAN(500000))
+        tracer = CallTracer(pt.instrumentation)
+        worker = threading.Thread(target=lambda: [pt.poll(channel, 1, 0) for _ in range(10)], name='busy')
+        worker.start()
+        time.sleep(0.01)
+        for _ in range(3):
+            pt.write(channel, [b'\x00\x00\x01\x00'])
+        worker.join()
+        pt.close(device)
+        waits = [r for r in tracer.records() if r.wait]
+        self.assertTrue(waits)
+        mine = [r for r in waits if r.thread == threading.get_ident()]
+        # ``write`` holds the channel for all of its chunks
+        self.assertEqual({r.name for r in mine}, {'write'})
+        self.assertTrue(all(r.end_ns > r.start_ns and r.channel == -1 and r.rv == 0 for r in mine))
+        slices = [e for e in tracer.events() if e['name'] == 'lock wait']
+        self.assertEqual(len(slices), len(waits))
+        self.assertEqual(slices[0]['args']['lock'], 'device')
+        # the waiting thread gets the lock only after the holder's DLL call returned
+        calls = [r for r in tracer.records() if not r.wait and r.thread == worker.ident]
+        self.assertTrue(any(c.start_ns <= mine[0].start_ns < c.end_ns <= mine[0].end_ns for c in calls))
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from j2534.interface import PassThru
+from j2534.isotp import Iso15765Transport
+from j2534.uds import UdsClient
+from j2534.simulated import SimulatedPassThruLibrary, SimulatedBus
+from j2534.protocols import Protocol
+from j2534.filter import FlowCtrlFilter
+from j2534.enums import ProtocolId
+from j2534.errors import UdsNegativeResponseException
+import os
+import tempfile
+import time
+import unittest
+
+""" Run using ``python -m unittest tests.unit.test_uds``
+"""
+
+TESTER, ECU = 0x7e0, 0x7e8
+
+class Ecu(object):
+    """ Bus node answering UDS requests addressed to ``TESTER`` """
+
+    def __init__(self, block_length: int = 0x102) -> None:
+        self.block_length = block_length
+        self.memory = bytearray()
+        self.requests = []
+        self.pending = 0
+
+    def __call__(self, protocol: int, data: bytes):
+        if protocol != ProtocolId.ISO15765 or int.from_bytes(data[:4], 'big') != TESTER:
+            return ()
+        request = data[4:]
+        self.requests.append(request)
+        sid = request[0]
+        responses = []
+        if self.pending:
+            self.pending -= 1
+            responses.append(bytes((0x7F, sid, 0x78)))
+        if sid == 0x3E:
+            return ()
+        if sid == 0x22:
+            responses.append(b'\x62' + request[1:3] + b'VIN')
+        elif sid == 0x34:
+            responses.append(b'\x74\x20' + self.block_length.to_bytes(2, 'big'))
+        elif sid == 0x36:
+            self.memory += request[2:]
+            responses.append(b'\x76' + request[1:2])
+        elif sid == 0x37:
+            responses.append(b'\x77')
+        else:
+            responses.append(bytes((0x7F, sid, 0x11)))
+        return [ECU.to_bytes(4, 'big') + response for response in responses]
+
+class TestUdsClient(unittest.TestCase):
+    """ Unit tests for the ``j2534.uds``"""
+
+    def setUp(self):
+        self.ecu = Ecu()
+        bus = SimulatedBus(frame_timing=False)
+        bus.attach(self.ecu)
+        self.pt = PassThru(SimulatedPassThruLibrary, bus=bus)
+        self.dev = self.pt.open('tester')
+        self.ch = self.pt.connect(self.dev, Protocol.ISO15765(500000, Protocol.CAN.STANDARD_ID))
+        self.pt.set_filter(self.ch, FlowCtrlFilter(pattern=ECU, mask=0xFFFFFFFF, flow=TESTER))
+        self.uds = UdsClient(Iso15765Transport(self.pt, self.ch, TESTER, ECU), p2=200)
+
+    def tearDown(self) -> None:
+        self.uds.stop_keepalive()
+        self.pt.close(self.dev)
+
+    def test_response_pending(self):
+        self.ecu.pending = 2
+        self.assertEqual(self.uds.read_data_by_identifier(0xF190), b'VIN')
+
+    def test_negative_response(self):
+        with self.assertRaises(UdsNegativeResponseException) as cm:
+            self.uds.ecu_reset()
+        self.assertEqual((cm.exception.service, cm.exception.nrc), (0x11, 0x11))
+
+    def test_download_follows_block_length(self):
+        image = bytes(range(256)) * 5
+        progress = []
+        blocks = self.uds.download(image, 0x8000, progress=lambda done, total: progress.append(done))
+        self.assertEqual(blocks, 5)
+        self.assertEqual(bytes(self.ecu.memory), image)
+        self.assertEqual([len(r) for r in self.ecu.requests if r[0] == 0x36], [0x102] * 5)
+        self.assertEqual([r[1] for r in self.ecu.requests if r[0] == 0x36], [1, 2, 3, 4, 5])
+        self.assertEqual(progress[-1], len(image))
+
+    def test_download_file(self):
+        image = os.urandom(3000)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'image.bin')
+            with open(path, 'wb') as f:
+                f.write(image)
+            self.uds.download_file(path, 0)
+        self.assertEqual(bytes(self.ecu.memory), image)
+
+    def test_keepalive(self):
+        self.uds.start_keepalive(0.02)
+        time.sleep(0.1)
+        self.uds.stop_keepalive()
+        self.assertIn(b'\x3e\x80', self.ecu.requests)
+
+if __name__ == "__main__":
+    unittest.main()